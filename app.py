@@ -1,388 +1,129 @@
-from flask import Flask, render_template, request, flash, redirect, url_for, send_file
-from collections import defaultdict
+from flask import Flask, Request, current_app, render_template, stream_template, stream_with_context, request, flash, redirect, url_for, jsonify
 from io import BytesIO
+from markupsafe import Markup
+from tempfile import SpooledTemporaryFile
 import datetime
+import hashlib
 import logging
-
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+import math
+import os
+import re
+import shutil
+import tempfile
+
+from nacha import (build_batch_header, build_entry, build_file_header, format_cents,
+                   group_nacha_records, iter_nacha_bytes, iter_nacha_records, validate_batch_header, validate_entry, validate_file_header)
+from nacha_bulk import BulkInputError, build_bulk_batches, load_bulk_csv, load_bulk_json
+from nacha_diagnostics import ParseDiagnostics
+from nacha_diff import iter_nacha_diff
+from nacha_index import NachaIndex, build_index, cleanup_index_dir, index_path, touch_index
+from nacha_jobs import JobQueue, JobQueueFull
+from nacha_json import iter_json_records, to_ndjson
+from nacha_multi import expand_sources, iter_file_summaries, merge_summary, new_combined_summary
+from nacha_summary import aggregate_nacha
+from nacha_validate import NachaValidator, validate_events, validate_nacha
+from parse_cache import cache_from_env
+from metrics import REGISTRY
+
+# Configure logging (NACHA_LOG_LEVEL=DEBUG for verbose output, plus NACHA_TRACE_RECORDS=1 to log every record)
+logging.basicConfig(level=os.environ.get('NACHA_LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
+class NachaRequest(Request):
+    """Request whose file uploads spill to disk past UPLOAD_SPOOL_BYTES (werkzeug's default is a fixed 500 KB)."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledTemporaryFile(max_size=current_app.config['UPLOAD_SPOOL_BYTES'], mode='rb+')
+
 app = Flask(__name__)
+app.request_class = NachaRequest
 app.secret_key = 'your_super_secret_key_here_replace_in_prod_12345'
-
-NACHA_RECORD_LENGTH = 94
-
-def determine_transaction_type(transaction_code):
-    """Determine if transaction is debit/credit and Bank-to-Card/Card-to-Bank/Direct Deposit"""
-    transaction_code = str(transaction_code)
-
-    # Determine debit/credit
-    if transaction_code in ['22', '23', '24', '27', '28', '29', '32', '33', '34', '37', '38', '39']:
-        transaction_type = 'Debit'
-    elif transaction_code in ['21', '26', '31', '36']:
-        transaction_type = 'Credit'
-    else:
-        transaction_type = 'Unknown'
-
-    # Determine transaction class
-    if transaction_code in ['22', '23', '24', '27', '28', '29']:
-        entry_class = 'Bank to Card' if transaction_type == 'Credit' else 'Card to Bank'
-    elif transaction_code in ['32', '33', '34', '37', '38', '39']:
-        entry_class = 'Card to Bank' if transaction_type == 'Debit' else 'Bank to Card'
-    elif transaction_code in ['21', '26', '31', '36']:
-        entry_class = 'Direct Deposit'
-    else:
-        entry_class = 'Unknown'
-
-    return transaction_type, entry_class
-
-def parse_nacha_grouped(nacha_content):
-    """Parses NACHA file content and groups records by type and batch."""
+# Uploads are held in memory up to this size and spooled to a temporary file beyond it
+app.config['UPLOAD_SPOOL_BYTES'] = int(os.environ.get('NACHA_UPLOAD_SPOOL_BYTES', 8 * 1024 * 1024))
+# Requests larger than this are rejected with 413 before they are read
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('NACHA_MAX_UPLOAD_BYTES', 1024 * 1024 * 1024))
+# Keep parsed entries in compact slot objects instead of dicts (lower memory on large files)
+app.config['COMPACT_ENTRIES'] = os.environ.get('NACHA_COMPACT_ENTRIES') == '1'
+# Parsing stops after this many record errors; warnings and errors are summarized per kind (0 = never stop)
+app.config['MAX_PARSE_ERRORS'] = int(os.environ.get('NACHA_MAX_PARSE_ERRORS', 1000))
+# Files with more entries than this get a batch summary page with entry tables paged in on demand
+app.config['PAGINATE_ENTRIES_OVER'] = int(os.environ.get('NACHA_PAGINATE_ENTRIES_OVER', 1000))
+app.config['ENTRY_PAGE_SIZE'] = int(os.environ.get('NACHA_ENTRY_PAGE_SIZE', 100))
+# Where indexed files and their offset sidecars are kept for /api/lookup
+app.config['INDEX_DIR'] = os.environ.get('NACHA_INDEX_DIR', os.path.join(tempfile.gettempdir(), 'nacha_index'))
+# Indexed files not looked up for this long are removed on the next upload to /api/index
+app.config['INDEX_TTL_SECONDS'] = int(os.environ.get('NACHA_INDEX_TTL_SECONDS', 24 * 3600))
+# Worker processes for multi-file uploads (/parse-multi); defaults to the CPU count
+app.config['PARSE_WORKERS'] = int(os.environ.get('NACHA_PARSE_WORKERS', 0)) or None
+# File diffs index at most this many entries in memory before partitioning to disk; the view lists this many rows
+app.config['DIFF_MAX_MEMORY_ENTRIES'] = int(os.environ.get('NACHA_DIFF_MAX_MEMORY_ENTRIES', 500000))
+app.config['DIFF_VIEW_MAX_ROWS'] = int(os.environ.get('NACHA_DIFF_VIEW_MAX_ROWS', 2000))
+# Background parse jobs for large uploads (/api/jobs): spool directory, worker threads, queue bound, result lifetime
+app.config['JOBS_DIR'] = os.environ.get('NACHA_JOBS_DIR', os.path.join(tempfile.gettempdir(), 'nacha_jobs'))
+app.config['JOB_WORKERS'] = int(os.environ.get('NACHA_JOB_WORKERS', 2))
+app.config['JOB_MAX_PENDING'] = int(os.environ.get('NACHA_JOB_MAX_PENDING', 8))
+app.config['JOB_TTL_SECONDS'] = int(os.environ.get('NACHA_JOB_TTL_SECONDS', 3600))
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+FILE_HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# Parse results and rendered pages keyed by upload content hash (see NACHA_CACHE_* env vars)
+parse_cache = cache_from_env()
+# Rough in-memory size of parsed data relative to the raw file, for cache accounting
+PARSED_SIZE_FACTOR = 6
+
+job_queue = JobQueue(app.config['JOBS_DIR'], workers=app.config['JOB_WORKERS'], max_pending=app.config['JOB_MAX_PENDING'],
+                     ttl_seconds=app.config['JOB_TTL_SECONDS'], compact=app.config['COMPACT_ENTRIES'],
+                     max_errors=app.config['MAX_PARSE_ERRORS'])
+
+def parse_nacha_grouped(nacha_content, compact=False, validator=None, diagnostics=None):
+    """Parses NACHA file content and groups records by type and batch.
+
+    Accepts the decoded file content or a binary file-like object, which is
+    consumed incrementally through iter_nacha_records. With compact=True the
+    entries are slot-based EntryDetail objects rather than dicts. A
+    NachaValidator passed as validator checks the records in the same pass.
+    Warnings and errors go to a ParseDiagnostics passed as diagnostics, or
+    else are flashed one by one.
+    """
     logger.debug("Starting NACHA file parsing")
-    lines = nacha_content.splitlines()
-    data = defaultdict(list)
-    current_batch = None
-    batch_index = -1
-    current_batch_entries = []
-
-    # Initialize totals for file control
-    total_debit_amount = 0
-    total_credit_amount = 0
-    total_entry_count = 0
-
-    for i, line in enumerate(lines):
-        if not line or len(line.strip()) < 2:
-            logger.debug(f"Skipping empty/short line {i+1}")
-            continue
-
-        if len(line) < NACHA_RECORD_LENGTH:
-            logger.warning(f"Line {i+1} is too short ({len(line)} chars)")
-        elif len(line) > NACHA_RECORD_LENGTH:
-            logger.warning(f"Line {i+1} is too long ({len(line)} chars)")
-            line = line[:NACHA_RECORD_LENGTH]
-
-        record_type = line[0]
-
-        try:
-            if record_type == '1':
-                logger.debug("Found File Header record")
-                data['File Header'] = {
-                    'record_type_code': line[0],
-                    'priority_code': line[1:3],
-                    'immediate_destination': line[3:13].strip(),
-                    'immediate_origin': line[13:23].strip(),
-                    'file_creation_date': line[23:29],
-                    'file_creation_time': line[29:33],
-                    'file_id_modifier': line[33],
-                    'record_size': line[34:37],
-                    'blocking_factor': line[37:40],
-                    'format_code': line[40],
-                    'immediate_destination_name': line[41:64].strip(),
-                    'immediate_origin_name': line[64:87].strip(),
-                    'reference_code': line[87:95].strip()
-                }
-
-            elif record_type == '5':
-                logger.debug(f"Found Batch Header record (Batch {batch_index + 1})")
-                if current_batch and current_batch_entries:
-                    current_batch['Entries'] = current_batch_entries
-                    data['Batches'].append(current_batch)
-
-                batch_index += 1
-                current_batch = {
-                    'Batch Header': {
-                        'record_type_code': line[0],
-                        'service_class_code': line[1:4],
-                        'company_name': line[4:20].strip(),
-                        'company_discretionary_data': line[20:40].strip(),
-                        'company_identification': line[40:50].strip(),
-                        'standard_entry_class_code': line[50:53],
-                        'company_entry_description': line[53:63].strip(),
-                        'descriptive_date': line[63:69],
-                        'effective_entry_date': line[69:75],
-                        'settlement_date': line[75:78],
-                        'originator_status_code': line[78],
-                        'originating_dfi_identification': line[79:87],
-                        'batch_number': line[87:94]
-                    },
-                    'Entries': [],
-                    'Batch Control': {}
-                }
-                current_batch_entries = []
-
-            elif record_type == '6':
-                logger.debug(f"Found Entry Detail record in batch {batch_index}")
-                transaction_code = line[1:3]
-                amount = int(line[29:39]) / 100.0
-                transaction_type, entry_class = determine_transaction_type(transaction_code)
-
-                # Update file-level totals
-                if transaction_type == 'Debit':
-                    total_debit_amount += amount
-                else:
-                    total_credit_amount += amount
-                total_entry_count += 1
-
-                entry_detail = {
-                    'record_type_code': line[0],
-                    'transaction_code': transaction_code,
-                    'transaction_type': transaction_type,
-                    'entry_class': entry_class,
-                    'receiving_dfi_identification': line[3:11],
-                    'check_digit': line[11],
-                    'dfi_account_number': line[12:29].strip(),
-                    'amount': "{:.2f}".format(abs(amount)),
-                    'individual_identification_number': line[39:54].strip(),
-                    'individual_name': line[54:76].strip(),
-                    'discretionary_data': line[76:78].strip(),
-                    'addenda_record_indicator': line[78],
-                    'trace_number': line[79:94].strip(),
-                    'raw_amount': amount
-                }
-                current_batch_entries.append(entry_detail)
-
-            elif record_type == '7':
-                logger.debug("Found Addenda record")
-                if current_batch_entries:
-                    addenda_detail = {
-                        'record_type_code': line[0],
-                        'type_code': line[1:3],
-                        'payment_related_info': line[3:83].strip(),
-                        'addenda_sequence_number': line[83:87],
-                        'entry_detail_sequence_number': line[87:94]
-                    }
-                    if 'Addenda' not in current_batch_entries[-1]:
-                        current_batch_entries[-1]['Addenda'] = []
-                    current_batch_entries[-1]['Addenda'].append(addenda_detail)
-                else:
-                    logger.warning(f"Addenda record without preceding Entry Detail at line {i+1}")
-                    flash(f"Warning: Addenda record (line {i+1}) found without a preceding Entry Detail record. Skipping.", 'warning')
-
-            elif record_type == '8':
-                logger.debug(f"Found Batch Control record for batch {batch_index}")
-                if current_batch:
-                    current_batch['Batch Control'] = {
-                        'record_type_code': line[0],
-                        'service_class_code': line[1:4],
-                        'entry_addenda_count': line[4:10],
-                        'entry_hash': line[10:20],
-                        'total_debit_amount': "{:.2f}".format(abs(int(line[20:32])) / 100.0),
-                        'total_credit_amount': "{:.2f}".format(abs(int(line[32:44])) / 100.0),
-                        'company_identification': line[44:54].strip(),
-                        'message_authentication_code': line[54:73].strip(),
-                        'reserved': line[73:79].strip(),
-                        'originating_dfi_identification': line[79:87],
-                        'batch_number': line[87:94]
-                    }
-                    current_batch['Entries'] = current_batch_entries
-                    data['Batches'].append(current_batch)
-                    current_batch = None
-                    current_batch_entries = []
-                else:
-                    logger.warning(f"Batch Control without Batch Header at line {i+1}")
-                    flash(f"Warning: Batch Control record (line {i+1}) found without a preceding Batch Header record. Skipping.", 'warning')
-
-            elif record_type == '9':
-                logger.debug("Found File Control record")
-                if line.strip() == '9' * NACHA_RECORD_LENGTH:
-                    data['File Padding Count'] = data.get('File Padding Count', 0) + 1
-                    continue
-
-                # Use our calculated totals instead of the values from the file
-                data['File Control'] = {
-                    'record_type_code': line[0],
-                    'batch_count': line[1:7],
-                    'block_count': line[7:13],
-                    'entry_addenda_count': line[13:21],
-                    'entry_hash': line[21:31],
-                    'total_debit_amount': "{:.2f}".format(total_debit_amount),
-                    'total_credit_amount': "{:.2f}".format(total_credit_amount),
-                    'reserved': line[55:94].strip()
-                }
-
-        except Exception as e:
-            logger.error(f"Error parsing line {i+1}: {str(e)}")
-            flash(f"Error parsing line {i+1}: {str(e)}", 'error')
-
-    if current_batch and 'Batch Control' not in current_batch:
-        logger.warning("Final batch missing Batch Control record")
-        current_batch['Entries'] = current_batch_entries
-        data['Batches'].append(current_batch)
-        flash("Warning: Last batch found without a Batch Control Record.", 'warning')
-
+    if isinstance(nacha_content, str):
+        nacha_content = nacha_content.encode('utf-8')
+    if isinstance(nacha_content, bytes):
+        nacha_content = BytesIO(nacha_content)
+
+    events = iter_nacha_records(nacha_content, compact=compact, diagnostics=diagnostics)
+    if validator is not None:
+        events = validate_events(events, validator)
+    data = group_nacha_records(events, on_message=diagnostics.add if diagnostics is not None else _report_parse_message)
     logger.debug(f"Parsing complete. Found {len(data.get('Batches', []))} batches")
-    return dict(data)
-
-# Modified to accept a list of batches, where each batch contains its header and entries
-def generate_nacha_file(file_header_data, all_batches_data):
-    """Generate NACHA file content from form data and dummy entries."""
-    logger.debug("Generating NACHA file content")
-    nacha_lines = []
-
-    # File Header Record
-    imm_dest = file_header_data['immediate_destination'].rjust(10, ' ')
-    imm_origin = file_header_data['immediate_origin'].rjust(10, ' ')
-    file_id_modifier = file_header_data['file_id_modifier'].ljust(1)
-
-    file_header_line = (
-        f"1"
-        f"{file_header_data['priority_code'].ljust(2)}"
-        f"{imm_dest}"
-        f"{imm_origin}"
-        f"{file_header_data['file_creation_date'].ljust(6)}"
-        f"{file_header_data['file_creation_time'].ljust(4)}"
-        f"{file_header_data['file_id_modifier'].ljust(1)}"
-        f"{file_header_data['record_size'].zfill(3)}"
-        f"{file_header_data['blocking_factor'].zfill(3)}"
-        f"{file_header_data['format_code'].ljust(1)}"
-        f"{file_header_data['immediate_destination_name'].ljust(23)}"
-        f"{file_header_data['immediate_origin_name'].ljust(23)}"
-        f"{file_header_data['reference_code'].ljust(8)}"
-    )
-    nacha_lines.append(file_header_line)
-
-    total_file_debit_amount = 0
-    total_file_credit_amount = 0
-    total_file_entry_addenda_count = 0
-    total_file_entry_hash = 0
-    total_batch_count = 0
-    current_line_count = 1
-
-    # Loop through each batch
-    for batch_data in all_batches_data:
-        total_batch_count += 1
-        batch_debit_amount = 0
-        batch_credit_amount = 0
-        batch_entry_addenda_count = 0
-        batch_entry_hash = 0
-
-        batch_header = batch_data['batch_header']
-        entries = batch_data['entries']
-
-        settlement_date = batch_header['settlement_date'].ljust(3)
-        batch_number = str(batch_header['batch_number']).zfill(7)
-
-        # Batch Header Record
-        batch_header_line = (
-            f"5"
-            f"{batch_header['service_class_code'].ljust(3)}"
-            f"{batch_header['company_name'].ljust(16)}"
-            f"{batch_header['company_discretionary_data'].ljust(20)}"
-            f"{batch_header['company_identification'].ljust(10)}"
-            f"{batch_header['standard_entry_class_code'].ljust(3)}"
-            f"{batch_header['company_entry_description'].ljust(10)}"
-            f"{batch_header['descriptive_date'].ljust(6)}"
-            f"{batch_header['effective_entry_date'].ljust(6)}"
-            f"{settlement_date}"
-            f"{batch_header['originator_status_code'].ljust(1)}"
-            f"{batch_header['originating_dfi_identification'].ljust(8)}"
-            f"{batch_number}"
-        )
-        nacha_lines.append(batch_header_line)
-        current_line_count += 1
-
-        # Entry Detail Records for the current batch
-        for entry in entries:
-            transaction_code = entry['transaction_code'].ljust(2)
-            receiving_dfi_id = entry['receiving_dfi_identification'].ljust(8)
-            check_digit = entry['check_digit'].ljust(1)
-            dfi_account_number = entry['dfi_account_number'].ljust(17)
-
-            try:
-                amount_cents = int(float(entry['amount']) * 100)
-                amount_str = str(amount_cents).zfill(10)
-            except ValueError:
-                logger.warning(f"Invalid amount '{entry['amount']}' for an entry. Using 0.")
-                amount_str = "0000000000"
-
-            individual_id_number = entry['individual_identification_number'].ljust(15)
-            individual_name = entry['individual_name'].ljust(22)
-            discretionary_data = entry['discretionary_data'].ljust(2)
-            addenda_indicator = entry['addenda_record_indicator'].ljust(1)
-            trace_number = entry['trace_number'].ljust(15)
-
-            entry_detail_line = (
-                f"6"
-                f"{transaction_code}"
-                f"{receiving_dfi_id}"
-                f"{check_digit}"
-                f"{dfi_account_number}"
-                f"{amount_str}"
-                f"{individual_id_number}"
-                f"{individual_name}"
-                f"{discretionary_data}"
-                f"{addenda_indicator}"
-                f"{trace_number}"
-            )
-            nacha_lines.append(entry_detail_line)
-            current_line_count += 1
-            batch_entry_addenda_count += 1
-
-            # Update batch totals
-            transaction_type, _ = determine_transaction_type(entry['transaction_code'])
-            if transaction_type == 'Debit':
-                batch_debit_amount += float(entry['amount'])
-            elif transaction_type == 'Credit':
-                batch_credit_amount += float(entry['amount'])
-
-            try:
-                batch_entry_hash += int(receiving_dfi_id[:8])
-            except ValueError:
-                logger.warning(f"Could not add DFI ID '{receiving_dfi_id[:8]}' to batch hash")
-
-        # Batch Control Record for the current batch
-        batch_control_line = (
-            f"8"
-            f"{batch_header['service_class_code'].ljust(3)}"
-            f"{str(batch_entry_addenda_count).zfill(6)}"
-            f"{str(batch_entry_hash % 10000000000).zfill(10)}"
-            f"{str(int(batch_debit_amount * 100)).zfill(12)}"
-            f"{str(int(batch_credit_amount * 100)).zfill(12)}"
-            f"{batch_header['company_identification'].ljust(10)}"
-            f"{' ' * 19}"
-            f"{' ' * 6}"
-            f"{batch_header['originating_dfi_identification'].ljust(8)}"
-            f"{batch_number}"
-        )
-        nacha_lines.append(batch_control_line)
-        current_line_count += 1
-
-        # Accumulate file totals
-        total_file_debit_amount += batch_debit_amount
-        total_file_credit_amount += batch_credit_amount
-        total_file_entry_addenda_count += batch_entry_addenda_count
-        total_file_entry_hash += batch_entry_hash
-
-    # File Control Record
-    blocking_factor = int(file_header_data.get('blocking_factor', '10'))
-    temp_line_count = current_line_count + 1 # +1 for the file control record itself
-    padding_needed = 0
-    if blocking_factor > 0:
-        padding_needed = (blocking_factor - (temp_line_count % blocking_factor)) % blocking_factor
-
-    file_block_count_calc = (temp_line_count + padding_needed) // blocking_factor
-
-    file_control_line = (
-        f"9"
-        f"{str(total_batch_count).zfill(6)}"
-        f"{str(file_block_count_calc).zfill(6)}"
-        f"{str(total_file_entry_addenda_count).zfill(8)}"
-        f"{str(total_file_entry_hash % 10000000000).zfill(10)}"
-        f"{str(int(total_file_debit_amount * 100)).zfill(12)}"
-        f"{str(int(total_file_credit_amount * 100)).zfill(12)}"
-        f"{' ' * 39}"
-    )
-    nacha_lines.append(file_control_line)
-    current_line_count += 1
-
-    # File Padding Records
-    for _ in range(padding_needed):
-        nacha_lines.append('9' * NACHA_RECORD_LENGTH)
-        current_line_count += 1
-
-    logger.debug(f"Generated {current_line_count} NACHA records")
-    return "\n".join(nacha_lines)
+    return data
+
+def _report_parse_message(category, message):
+    """Log a parser warning/error and surface it to the user."""
+    logger.log(logging.ERROR if category == 'error' else logging.WARNING, message)
+    flash(message, category)
+
+def _report_diagnostics(diagnostics):
+    """Log and flash one summary of a parse's warnings and errors, if there were any."""
+    if not diagnostics['warning_count'] and not diagnostics['error_count']:
+        return
+    message = (f"Parsing reported {diagnostics['error_count']} error(s) and {diagnostics['warning_count']} warning(s); "
+               f"see Parse Diagnostics below.")
+    if diagnostics['stopped_early']:
+        message += f" Parsing stopped after {diagnostics['max_errors']} errors."
+    logger.warning(message)
+    flash(message, 'error' if diagnostics['error_count'] else 'warning')
+
+@app.errorhandler(413)
+def handle_upload_too_large(e):
+    message = f"The upload is larger than the {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)} MB limit."
+    logger.error(message)
+    if request.path.startswith('/api/'):
+        return jsonify({'error': message}), 413
+    flash(message, 'error')
+    return redirect(url_for('index'))
 
 @app.route("/", methods=["GET"], endpoint='index')
 def home():
@@ -411,34 +152,435 @@ def handle_parse_request():
         return redirect(url_for('index'))
 
     try:
-        content = file.read().decode("utf-8")
-        logger.debug("File read successfully")
-
-        if not content.strip():
+        # The upload is already spooled (to disk past UPLOAD_SPOOL_BYTES); hash it in chunks,
+        # then parse it from the start, decoding one record at a time
+        with REGISTRY.timed('nacha_phase_seconds', phase='read'):
+            digest = hashlib.sha256()
+            upload_size = 0
+            has_content = False
+            for chunk in iter(lambda: file.stream.read(UPLOAD_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                upload_size += len(chunk)
+                has_content = has_content or bool(chunk.strip())
+            file.stream.seek(0)
+        file_hash = digest.hexdigest()
+        cache_key = f"{file_hash}-html"
+        cached = parse_cache.get(cache_key)
+        if cached is not None:
+            logger.debug("Serving parse results from cache")
+            return _render_parse_results(cached, file_hash)
+        logger.debug(f"File read successfully ({upload_size} bytes)")
+
+        if not has_content:
             logger.error("Empty file content")
             flash('The uploaded file is empty.', 'warning')
             return redirect(url_for('index'))
 
-        data = parse_nacha_grouped(content)
-        logger.debug(f"Parsed data structure: {bool(data)}")
-
-        if not data or not data.get('File Header'):
-            logger.error("Invalid NACHA format")
-            flash('Invalid or unsupported NACHA file format detected.', 'error')
-            return redirect(url_for('index'))
+        data = parse_cache.get(f"{file_hash}-data")
+        if data is not None:
+            logger.debug("Rendering parse results from cached data")
+            paginated = _entry_count(data) > app.config['PAGINATE_ENTRIES_OVER']
+        else:
+            validator = NachaValidator()
+            diagnostics = ParseDiagnostics(max_errors=app.config['MAX_PARSE_ERRORS'])
+            with REGISTRY.timed('nacha_phase_seconds', phase='parse'):
+                data = parse_nacha_grouped(file.stream, compact=app.config['COMPACT_ENTRIES'], validator=validator,
+                                           diagnostics=diagnostics)
+            logger.debug(f"Parsed data structure: {bool(data)}")
+
+            if not data or not data.get('File Header'):
+                logger.error("Invalid NACHA format")
+                flash('Invalid or unsupported NACHA file format detected.', 'error')
+                return redirect(url_for('index'))
+            data['Diagnostics'] = diagnostics.report()
+            data['Validation'] = validator.report(truncated=diagnostics.stopped)
+            paginated = _cache_parse_data(data, file_hash, upload_size)
+        _report_diagnostics(data['Diagnostics'])
 
         logger.debug("Rendering parse results template")
-        return render_template("parse_results.html", data=data)
-
-    except UnicodeDecodeError:
-        logger.error("Unicode decode error")
-        flash('Failed to decode file. Please ensure it is a plain text (UTF-8) file.', 'error')
+        with REGISTRY.timed('nacha_phase_seconds', phase='render'):
+            content = render_template("_parse_content.html", data=data, paginated=paginated, file_hash=file_hash)
+        cached = {'content': content, 'paginated': paginated, 'diagnostics': data['Diagnostics']}
+        # A paginated page is cheap to render again and only works while the data is cached, so only full pages are kept
+        if not paginated:
+            parse_cache.set(cache_key, cached, len(content))
+        return _render_parse_results(cached, file_hash, report=False)
+
+    except UnicodeDecodeError as e:
+        logger.error(f"Unicode decode error: {e}")
+        flash(f'Failed to decode file: {e}. Please ensure it is a plain text (UTF-8) file.', 'error')
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}", exc_info=True)
         flash(f'An unexpected error occurred while processing the file: {str(e)}', 'error')
 
     return redirect(url_for('index'))
 
+def _entry_count(data):
+    return sum(len(batch['Entries']) for batch in data.get('Batches', []))
+
+def _cache_parse_data(data, file_hash, upload_size):
+    """Cache parsed data for the entry page requests; return whether the results page should page its entries.
+
+    Entries are only paged when the data was actually stored: a file too
+    large for the cache gets every entry on the results page instead.
+    """
+    stored = parse_cache.set(f"{file_hash}-data", data, upload_size * PARSED_SIZE_FACTOR)
+    entry_count = _entry_count(data)
+    if entry_count <= app.config['PAGINATE_ENTRIES_OVER']:
+        return False
+    if not stored:
+        logger.warning(f"Parsed data of {file_hash} is too large for the parse cache; listing all {entry_count} entries")
+    return stored
+
+def _render_parse_results(cached, file_hash, report=True):
+    """Wrap cached parse results content in the results page, with this request's flash messages."""
+    if report:
+        _report_diagnostics(cached['diagnostics'])
+    return render_template("parse_results.html", content=Markup(cached['content']), paginated=cached['paginated'],
+                           file_hash=file_hash)
+
+@app.route("/parse-multi", methods=["POST"])
+def handle_multi_parse_request():
+    """Summarize several NACHA files, or the files in ZIP archives, in parallel on one dashboard.
+
+    Uploads are spooled to a temporary directory and each file is summarized
+    in a worker process; the dashboard streams a row per file as it finishes
+    and the combined totals at the end.
+    """
+    files = [f for f in request.files.getlist('nacha_files') if f.filename]
+    if not files:
+        flash('No selected files.', 'error')
+        return redirect(url_for('index'))
+
+    spool_dir = tempfile.mkdtemp(prefix='nacha_multi_')
+    saved_files = []
+    for i, file in enumerate(files):
+        path = os.path.join(spool_dir, f"{i}.upload")
+        file.save(path, buffer_size=UPLOAD_CHUNK_SIZE)
+        saved_files.append((file.filename, path))
+    sources = expand_sources(saved_files)
+    logger.info(f"Summarizing {len(sources)} NACHA files from {len(files)} uploads")
+
+    combined = new_combined_summary()
+
+    def summaries():
+        try:
+            with REGISTRY.timed('nacha_phase_seconds', phase='parse'):
+                for summary in iter_file_summaries(sources, app.config['PARSE_WORKERS']):
+                    merge_summary(combined, summary)
+                    yield summary
+        finally:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+
+    return app.response_class(stream_template("multi_results.html", summaries=summaries(), combined=combined,
+                                              file_count=len(sources), format_cents=format_cents))
+
+def _spool_diff_uploads():
+    """Save the original_file and corrected_file uploads to a temporary directory.
+
+    Returns (spool_dir, original_path, corrected_path), or None if either file is missing.
+    """
+    files = [request.files.get(name) for name in ('original_file', 'corrected_file')]
+    if not all(file and file.filename for file in files):
+        return None
+    spool_dir = tempfile.mkdtemp(prefix='nacha_diff_upload_')
+    paths = []
+    for name, file in zip(('original', 'corrected'), files):
+        path = os.path.join(spool_dir, f"{name}.ach")
+        file.save(path, buffer_size=UPLOAD_CHUNK_SIZE)
+        paths.append(path)
+    return spool_dir, paths[0], paths[1]
+
+@app.route("/api/diff", methods=["POST"])
+def handle_api_diff_request():
+    """Stream the differences between original_file and corrected_file as NDJSON."""
+    spooled = _spool_diff_uploads()
+    if spooled is None:
+        return jsonify({'error': 'Upload both original_file and corrected_file.'}), 400
+    spool_dir, original_path, corrected_path = spooled
+
+    def generate():
+        try:
+            for item in iter_nacha_diff(original_path, corrected_path, app.config['DIFF_MAX_MEMORY_ENTRIES']):
+                yield to_ndjson(item)
+        except UnicodeDecodeError as e:
+            logger.error(f"Unicode decode error in diff: {e}")
+            yield to_ndjson({'type': 'error', 'message': f'Failed to decode file: {e}. Please ensure it is a plain text (UTF-8) file.'})
+        finally:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+
+    return app.response_class(generate(), mimetype='application/x-ndjson')
+
+@app.route("/diff", methods=["POST"])
+def handle_diff_request():
+    """Show the differences between an original and a corrected NACHA file."""
+    spooled = _spool_diff_uploads()
+    if spooled is None:
+        flash('Please choose both the original and the corrected file.', 'error')
+        return redirect(url_for('index'))
+    spool_dir, original_path, corrected_path = spooled
+    # Batch deltas and the summary arrive after the entry differences; the template reads them after its loop
+    tail = {'batches': [], 'summary': None, 'hidden': 0, 'error': None}
+    max_rows = app.config['DIFF_VIEW_MAX_ROWS']
+
+    def differences():
+        shown = 0
+        try:
+            for item in iter_nacha_diff(original_path, corrected_path, app.config['DIFF_MAX_MEMORY_ENTRIES']):
+                if item['type'] == 'batch':
+                    tail['batches'].append(item)
+                elif item['type'] == 'summary':
+                    tail['summary'] = item
+                elif shown < max_rows:
+                    shown += 1
+                    yield item
+                else:
+                    tail['hidden'] += 1
+        except UnicodeDecodeError as e:
+            tail['error'] = f'Failed to decode file: {e}. Please ensure it is a plain text (UTF-8) file.'
+        finally:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+
+    return app.response_class(stream_template("diff_results.html", differences=differences(), tail=tail,
+                                              original_name=request.files['original_file'].filename,
+                                              corrected_name=request.files['corrected_file'].filename))
+
+def _cached_parse_result(file_hash):
+    if not FILE_HASH_PATTERN.match(file_hash):
+        return None
+    return parse_cache.get(f"{file_hash}-data")
+
+@app.route("/parse/<file_hash>/batches/<int:batch_index>/entries", methods=["GET"])
+def show_entry_page(file_hash, batch_index):
+    """Render one page of a batch's entry table for the paginated results view."""
+    data = _cached_parse_result(file_hash)
+    if data is None:
+        return jsonify({'error': 'These parse results have expired. Please upload the file again.'}), 404
+
+    batches = data.get('Batches', [])
+    if batch_index >= len(batches):
+        return jsonify({'error': 'No such batch.'}), 404
+
+    entries = batches[batch_index]['Entries']
+    page_size = app.config['ENTRY_PAGE_SIZE']
+    pages = max(1, math.ceil(len(entries) / page_size))
+    page = min(max(request.args.get('page', 1, type=int), 1), pages)
+    html = render_template("_entry_rows.html", entries=entries[(page - 1) * page_size:page * page_size])
+    return jsonify({'html': html, 'page': page, 'pages': pages, 'total': len(entries)})
+
+@app.route("/parse/<file_hash>/full", methods=["GET"])
+def show_full_results(file_hash):
+    """Stream the complete results page, every entry included, as it renders."""
+    data = _cached_parse_result(file_hash)
+    if data is None:
+        flash('These parse results have expired. Please upload the file again.', 'warning')
+        return redirect(url_for('index'))
+    return app.response_class(stream_template("parse_results.html", data=data, paginated=False, file_hash=file_hash))
+
+@app.route("/api/parse", methods=["POST"])
+def handle_api_parse_request():
+    """Stream the parsed upload back as NDJSON, one record per line, while it is parsed.
+
+    ?summary=1 limits the output to headers, controls and the totals line.
+    Warnings and errors are summarized per kind in the totals line's
+    'diagnostics', and parsing stops after MAX_PARSE_ERRORS errors.
+    """
+    file = request.files.get('nacha_file')
+    if file is None or file.filename == '':
+        return jsonify({'error': 'No file uploaded (expected form field nacha_file).'}), 400
+    summary = request.args.get('summary') == '1'
+
+    # Request teardown closes uploaded files before a streamed body is consumed,
+    # so hand the upload to the generator and leave a placeholder behind
+    upload = file.stream
+    file.stream = BytesIO()
+
+    def generate():
+        try:
+            diagnostics = ParseDiagnostics(max_errors=app.config['MAX_PARSE_ERRORS'])
+            for item in iter_json_records(upload, summary=summary, diagnostics=diagnostics):
+                if item['type'] == 'summary':
+                    logger.info(f"API parse of {file.filename}: {item['bytes']} bytes at {item['mb_per_s']} MB/s")
+                yield to_ndjson(item)
+        except UnicodeDecodeError as e:
+            logger.error(f"Unicode decode error in API parse: {e}")
+            yield to_ndjson({'type': 'error', 'message': f'Failed to decode file: {e}. Please ensure it is a plain text (UTF-8) file.'})
+        finally:
+            upload.close()
+
+    return app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route("/api/jobs", methods=["POST"])
+def handle_job_submit_request():
+    """Spool a large upload to disk and parse it in the background; returns the job id right away."""
+    file = request.files.get('nacha_file')
+    if not file or not file.filename:
+        return jsonify({'error': 'No file uploaded (expected form field nacha_file).'}), 400
+    try:
+        job_id = job_queue.submit(file.stream, file.filename)
+    except JobQueueFull:
+        return jsonify({'error': 'Too many parse jobs are in progress. Please try again later.'}), 503
+    return jsonify({
+        'job_id': job_id,
+        'status_url': url_for('show_job_status', job_id=job_id),
+        'result_url': url_for('show_job_result', job_id=job_id)
+    }), 202
+
+def _job_status(job_id):
+    if not JOB_ID_PATTERN.match(job_id):
+        return None
+    return job_queue.status(job_id)
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def show_job_status(job_id):
+    """Report a job's state and progress (records processed, bytes processed of total bytes)."""
+    status = _job_status(job_id)
+    if status is None:
+        return jsonify({'error': 'Unknown or expired job.'}), 404
+    return jsonify(status)
+
+@app.route("/api/jobs/<job_id>/result", methods=["GET"])
+def show_job_result(job_id):
+    """Render a finished job's results the same way /parse does."""
+    status = _job_status(job_id)
+    if status is None:
+        return jsonify({'error': 'Unknown or expired job.'}), 404
+    if status['state'] == 'failed':
+        return jsonify({'error': f"Parsing failed: {status.get('error')}", 'state': status['state']}), 500
+    if status['state'] != 'done':
+        return jsonify({'error': 'The job has not finished yet.', 'state': status['state']}), 409
+
+    result = job_queue.result(job_id)
+    if result is None:
+        # Expired and removed since the status check
+        return jsonify({'error': 'Unknown or expired job.'}), 404
+    data = result['data']
+    if not data.get('File Header'):
+        return jsonify({'error': 'Invalid or unsupported NACHA file format detected.', 'state': status['state']}), 400
+    _report_diagnostics(data['Diagnostics'])
+
+    # Seed the parse cache so the paginated view can page entries in from it
+    file_hash = status['file_hash']
+    paginated = _cache_parse_data(data, file_hash, status['total_bytes'])
+    with REGISTRY.timed('nacha_phase_seconds', phase='render'):
+        return render_template("parse_results.html", data=data, paginated=paginated, file_hash=file_hash)
+
+@app.route("/api/summary", methods=["POST"])
+def handle_summary_request():
+    """Return counts and totals per batch, company, SEC code and transaction code without parsing entries."""
+    file = request.files.get('nacha_file')
+    if not file or not file.filename:
+        return jsonify({'error': 'No file uploaded.'}), 400
+    with REGISTRY.timed('nacha_phase_seconds', phase='summary'):
+        summary = aggregate_nacha(file.stream)
+    return jsonify(summary)
+
+@app.route("/api/validate", methods=["POST"])
+def handle_validate_request():
+    """Check an uploaded NACHA file's control totals, hashes and counts without building the parsed structure."""
+    file = request.files.get('nacha_file')
+    if not file or not file.filename:
+        return jsonify({'error': 'No file uploaded.'}), 400
+    try:
+        with REGISTRY.timed('nacha_phase_seconds', phase='validate'):
+            report = validate_nacha(file.stream)
+    except UnicodeDecodeError as e:
+        return jsonify({'error': f'Failed to decode file: {e}. Please ensure it is a plain text (UTF-8) file.'}), 400
+    return jsonify(report)
+
+@app.route("/api/index", methods=["POST"])
+def handle_index_request():
+    """Store an uploaded NACHA file and build its batch/trace-number offset index."""
+    file = request.files.get('nacha_file')
+    if file is None or file.filename == '':
+        return jsonify({'error': 'No file uploaded (expected form field nacha_file).'}), 400
+
+    index_dir = app.config['INDEX_DIR']
+    os.makedirs(index_dir, exist_ok=True)
+    cleanup_index_dir(index_dir, app.config['INDEX_TTL_SECONDS'])
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=index_dir, suffix='.upload')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in iter(lambda: file.stream.read(UPLOAD_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                out.write(chunk)
+        file_hash = digest.hexdigest()
+        data_path = os.path.join(index_dir, f"{file_hash}.ach")
+        os.replace(tmp_path, data_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    try:
+        build_index(data_path, index_dir, file_hash=file_hash)
+    except UnicodeDecodeError as e:
+        logger.error(f"Unicode decode error while indexing {file.filename}: {e}")
+        if os.path.exists(data_path):
+            os.remove(data_path)
+        return jsonify({'error': f'Failed to decode file: {e}. Please ensure it is a plain text (UTF-8) file.'}), 400
+    touch_index(data_path, index_dir, file_hash)
+    with NachaIndex.open(data_path, index_dir, file_hash) as index:
+        logger.debug(f"Indexed {file.filename} as {file_hash}")
+        return jsonify({
+            'file_hash': file_hash,
+            'batch_count': index.batch_count,
+            'entry_count': index.entry_count
+        })
+
+@app.route("/api/lookup/<file_hash>", methods=["GET"])
+def handle_lookup_request(file_hash):
+    """Look up entries by ?trace_number= or batches by ?batch_number= in an indexed file."""
+    index_dir = app.config['INDEX_DIR']
+    data_path = os.path.join(index_dir, f"{file_hash}.ach")
+    if not FILE_HASH_PATTERN.match(file_hash) or not os.path.exists(index_path(index_dir, file_hash)):
+        return jsonify({'error': 'Unknown file hash. Upload the file to /api/index first.'}), 404
+
+    trace_number = request.args.get('trace_number', '').strip()
+    batch_number = request.args.get('batch_number', '').strip()
+    if not (trace_number.isdigit() or batch_number.isdigit()):
+        return jsonify({'error': 'Provide a numeric trace_number or batch_number.'}), 400
+
+    try:
+        with NachaIndex.open(data_path, index_dir, file_hash) as index:
+            if trace_number.isdigit():
+                results = index.find_entries(trace_number)
+            else:
+                results = index.find_batches(batch_number)
+    except FileNotFoundError:
+        # Expired and removed since the check above
+        return jsonify({'error': 'Unknown file hash. Upload the file to /api/index first.'}), 404
+    touch_index(data_path, index_dir, file_hash)
+    if not results:
+        return jsonify({'error': 'No matching record found.'}), 404
+    return jsonify({'file_hash': file_hash, 'results': results})
+
+def _cache_metrics():
+    stats = parse_cache.stats()
+    return [
+        ('nacha_cache_hits_total', {}, stats['hits']),
+        ('nacha_cache_misses_total', {}, stats['misses']),
+        ('nacha_cache_evictions_total', {}, stats['evictions']),
+        ('nacha_cache_entries', {}, stats['entries']),
+        ('nacha_cache_bytes', {}, stats['bytes']),
+    ]
+
+REGISTRY.describe('nacha_cache_hits_total', 'counter', 'Parse cache hits.')
+REGISTRY.describe('nacha_cache_misses_total', 'counter', 'Parse cache misses.')
+REGISTRY.describe('nacha_cache_evictions_total', 'counter', 'Parse cache evictions.')
+REGISTRY.describe('nacha_cache_entries', 'gauge', 'Entries currently in the parse cache.')
+REGISTRY.describe('nacha_cache_bytes', 'gauge', 'Approximate size of the parse cache in bytes.')
+REGISTRY.register_collector(_cache_metrics)
+
+@app.route("/metrics", methods=["GET"])
+def show_metrics():
+    return app.response_class(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route("/api/cache-stats", methods=["GET"])
+def show_cache_stats():
+    return jsonify(parse_cache.stats())
+
 @app.route("/create", methods=["GET"])
 def show_create_form():
     now = datetime.datetime.now()
@@ -452,43 +594,31 @@ def show_create_form():
                            current_time=current_time_hh_mm,
                            tomorrow_date=tomorrow_yy_mm_dd)
 
+def _nacha_download(file_header, all_batches_data, now):
+    """Stream a generated NACHA file as an attachment instead of building it in memory first."""
+    def generate():
+        with REGISTRY.timed('nacha_phase_seconds', phase='generate'):
+            yield from iter_nacha_bytes(file_header, all_batches_data)
+
+    return app.response_class(
+        generate(),
+        mimetype='text/plain',
+        headers={'Content-Disposition': f'attachment; filename=NACHA_{now.strftime("%Y%m%d_%H%M%S")}.txt'}
+    )
+
 @app.route("/generate", methods=["POST"])
 def handle_create_request():
     try:
         now_gen = datetime.datetime.now()
-        file_date_yy_mm_dd_gen = now_gen.strftime('%y%m%d')
-        file_time_hh_mm_gen = now_gen.strftime('%H%M')
         effective_entry_date_gen = (now_gen + datetime.timedelta(days=1)).strftime('%y%m%d')
 
-        # File Header Data (remains the same)
-        file_header = {
-            'priority_code': request.form.get('priority_code', '01'),
-            'immediate_destination': request.form.get('immediate_destination', '').strip(),
-            'immediate_origin': request.form.get('immediate_origin', '').strip(),
-            'file_creation_date': request.form.get('file_creation_date') or file_date_yy_mm_dd_gen,
-            'file_creation_time': request.form.get('file_creation_time') or file_time_hh_mm_gen,
-            'file_id_modifier': request.form.get('file_id_modifier', 'A').upper(),
-            'record_size': request.form.get('record_size', '094'),
-            'blocking_factor': request.form.get('blocking_factor', '10'),
-            'format_code': request.form.get('format_code', '1'),
-            'immediate_destination_name': request.form.get('immediate_destination_name', '').ljust(23)[:23],
-            'immediate_origin_name': request.form.get('immediate_origin_name', '').ljust(23)[:23],
-            'reference_code': request.form.get('reference_code', '').ljust(8)[:8]
-        }
+        # File Header Data
+        file_header = build_file_header(request.form.get, now_gen)
 
         # Validate File Header
-        if not file_header['immediate_destination'] or not file_header['immediate_destination'].isdigit() or len(file_header['immediate_destination']) != 9:
-            flash('File Header: Immediate Destination (Routing #) must be 9 digits.', 'error')
-            return redirect(url_for('show_create_form'))
-        if not file_header['immediate_origin'] or not file_header['immediate_origin'].isdigit() or len(file_header['immediate_origin']) != 9:
-            flash('File Header: Immediate Origin (Company ID) must be 9 digits.', 'error')
-            return redirect(url_for('show_create_form'))
-        try:
-            bf = int(file_header['blocking_factor'])
-            if bf <= 0:
-                raise ValueError("Blocking factor must be positive.")
-        except ValueError:
-            flash('File Header: Blocking Factor must be a positive number.', 'error')
+        error = validate_file_header(file_header)
+        if error:
+            flash(f'File Header: {error}', 'error')
             return redirect(url_for('show_create_form'))
 
         all_batches_data = [] # List to hold data for all batches
@@ -506,27 +636,14 @@ def handle_create_request():
 
         for batch_idx in range(num_batches):
             # Batch Header Data for current batch
-            batch_header = {
-                'service_class_code': request.form.get(f'batch_{batch_idx}_service_class_code', '200'),
-                'company_name': request.form.get(f'batch_{batch_idx}_company_name', '').ljust(16)[:16],
-                'company_discretionary_data': request.form.get(f'batch_{batch_idx}_company_discretionary_data', '').ljust(20)[:20],
-                'company_identification': request.form.get(f'batch_{batch_idx}_company_identification', '').ljust(10)[:10],
-                'standard_entry_class_code': request.form.get(f'batch_{batch_idx}_standard_entry_class_code', 'PPD').ljust(3)[:3],
-                'company_entry_description': request.form.get(f'batch_{batch_idx}_company_entry_description', '').ljust(10)[:10],
-                'descriptive_date': request.form.get(f'batch_{batch_idx}_descriptive_date', '').ljust(6)[:6],
-                'effective_entry_date': request.form.get(f'batch_{batch_idx}_effective_entry_date', effective_entry_date_gen),
-                'settlement_date': request.form.get(f'batch_{batch_idx}_settlement_date', '   ').ljust(3)[:3],
-                'originator_status_code': request.form.get(f'batch_{batch_idx}_originator_status_code', '1'),
-                'originating_dfi_identification': request.form.get(f'batch_{batch_idx}_originating_dfi_identification', '').ljust(8)[:8],
-                'batch_number': request.form.get(f'batch_{batch_idx}_batch_number', str(batch_idx + 1)).zfill(7)
-            }
+            batch_header = build_batch_header(
+                lambda key, default: request.form.get(f'batch_{batch_idx}_{key}', default),
+                batch_idx, effective_entry_date_gen)
 
             # Validate Batch Header
-            if not batch_header['company_identification'] or len(batch_header['company_identification']) != 10:
-                flash(f'Batch {batch_idx + 1}: Company Identification must be 10 characters (can include leading zero for 9-digit EIN).', 'error')
-                return redirect(url_for('show_create_form'))
-            if not batch_header['originating_dfi_identification'] or not batch_header['originating_dfi_identification'].isdigit() or len(batch_header['originating_dfi_identification']) != 8:
-                flash(f'Batch {batch_idx + 1}: Originating DFI Identification must be 8 digits.', 'error')
+            error = validate_batch_header(batch_header)
+            if error:
+                flash(f'Batch {batch_idx + 1}: {error}', 'error')
                 return redirect(url_for('show_create_form'))
 
             # Entry Details for current batch
@@ -542,42 +659,13 @@ def handle_create_request():
                 return redirect(url_for('show_create_form'))
 
             for entry_idx in range(num_entries_for_batch):
-                entry_data = {
-                    'transaction_code': request.form.get(f'entry_{batch_idx}_{entry_idx}_transaction_code', '27').strip(),
-                    'receiving_dfi_identification': request.form.get(f'entry_{batch_idx}_{entry_idx}_receiving_dfi_identification', '').strip(),
-                    'check_digit': request.form.get(f'entry_{batch_idx}_{entry_idx}_check_digit', '').strip(),
-                    'dfi_account_number': request.form.get(f'entry_{batch_idx}_{entry_idx}_dfi_account_number', '').strip(),
-                    'amount': request.form.get(f'entry_{batch_idx}_{entry_idx}_amount', '0.00').strip(),
-                    'individual_identification_number': request.form.get(f'entry_{batch_idx}_{entry_idx}_individual_identification_number', '').strip(),
-                    'individual_name': request.form.get(f'entry_{batch_idx}_{entry_idx}_individual_name', '').strip(),
-                    'discretionary_data': request.form.get(f'entry_{batch_idx}_{entry_idx}_discretionary_data', '').strip(),
-                    'addenda_record_indicator': request.form.get(f'entry_{batch_idx}_{entry_idx}_addenda_record_indicator', '0').strip(),
-                    'trace_number': request.form.get(f'entry_{batch_idx}_{entry_idx}_trace_number', '').strip()
-                }
+                entry_data = build_entry(
+                    lambda key, default: request.form.get(f'entry_{batch_idx}_{entry_idx}_{key}', default))
 
                 # Server-side validation for each entry
-                if not entry_data['transaction_code'] or not entry_data['transaction_code'].isdigit() or len(entry_data['transaction_code']) != 2:
-                    flash(f'Batch {batch_idx + 1}, Entry {entry_idx + 1}: Transaction Code must be 2 digits.', 'error')
-                    return redirect(url_for('show_create_form'))
-                if not entry_data['receiving_dfi_identification'] or not entry_data['receiving_dfi_identification'].isdigit() or len(entry_data['receiving_dfi_identification']) != 8:
-                    flash(f'Batch {batch_idx + 1}, Entry {entry_idx + 1}: Receiving DFI Identification must be 8 digits.', 'error')
-                    return redirect(url_for('show_create_form'))
-                if not entry_data['check_digit'] or not entry_data['check_digit'].isdigit() or len(entry_data['check_digit']) != 1:
-                    flash(f'Batch {batch_idx + 1}, Entry {entry_idx + 1}: Check Digit must be a single digit.', 'error')
-                    return redirect(url_for('show_create_form'))
-                if not entry_data['dfi_account_number'] or len(entry_data['dfi_account_number']) > 17:
-                    flash(f'Batch {batch_idx + 1}, Entry {entry_idx + 1}: DFI Account Number is required and max 17 characters.', 'error')
-                    return redirect(url_for('show_create_form'))
-                try:
-                    float(entry_data['amount'])
-                except ValueError:
-                    flash(f'Batch {batch_idx + 1}, Entry {entry_idx + 1}: Amount must be a valid number (e.g., 123.45).', 'error')
-                    return redirect(url_for('show_create_form'))
-                if not entry_data['individual_name'] or len(entry_data['individual_name']) > 22:
-                    flash(f'Batch {batch_idx + 1}, Entry {entry_idx + 1}: Individual Name is required and max 22 characters.', 'error')
-                    return redirect(url_for('show_create_form'))
-                if not entry_data['trace_number'] or not entry_data['trace_number'].isdigit() or len(entry_data['trace_number']) != 15:
-                    flash(f'Batch {batch_idx + 1}, Entry {entry_idx + 1}: Trace Number must be 15 digits.', 'error')
+                error = validate_entry(entry_data)
+                if error:
+                    flash(f'Batch {batch_idx + 1}, Entry {entry_idx + 1}: {error}', 'error')
                     return redirect(url_for('show_create_form'))
 
                 current_batch_entries.append(entry_data)
@@ -589,23 +677,43 @@ def handle_create_request():
             })
 
 
-        nacha_content = generate_nacha_file(file_header, all_batches_data)
-
-        file_obj = BytesIO()
-        file_obj.write(nacha_content.encode('utf-8'))
-        file_obj.seek(0)
-
         flash('NACHA file generated successfully!', 'success')
-        return send_file(
-            file_obj,
-            as_attachment=True,
-            download_name=f'NACHA_{now_gen.strftime("%Y%m%d_%H%M%S")}.txt',
-            mimetype='text/plain'
-        )
+        return _nacha_download(file_header, all_batches_data, now_gen)
     except Exception as e:
         logger.error(f"Error generating NACHA file: {str(e)}", exc_info=True)
         flash(f'An unexpected error occurred while creating the file: {str(e)}', 'error')
         return redirect(url_for('show_create_form'))
 
+@app.route("/api/generate", methods=["POST"])
+def handle_bulk_generate_request():
+    """Generate a NACHA file from a CSV or JSON upload of batches and entries.
+
+    The format is taken from ?format= / the 'format' form field or the file
+    extension. CSV uploads take the file header from the form fields used by
+    /generate. Validation problems are returned together as JSON.
+    """
+    file = request.files.get('bulk_file')
+    if not file or not file.filename:
+        return jsonify({'error': 'No file uploaded. Send a CSV or JSON file as bulk_file.'}), 400
+    bulk_format = (request.values.get('format') or os.path.splitext(file.filename)[1].lstrip('.')).lower()
+
+    now = datetime.datetime.now()
+    effective_entry_date = (now + datetime.timedelta(days=1)).strftime('%y%m%d')
+    try:
+        if bulk_format == 'json':
+            raw_file_header, raw_batches = load_bulk_json(file.stream)
+        elif bulk_format == 'csv':
+            raw_file_header, raw_batches = request.form, load_bulk_csv(file.stream)
+        else:
+            return jsonify({'error': 'Unsupported format. Upload a .csv or .json file.'}), 400
+    except BulkInputError as e:
+        return jsonify({'error': str(e)}), 400
+
+    file_header, all_batches_data, errors = build_bulk_batches(raw_file_header, raw_batches, now, effective_entry_date)
+    if errors:
+        return jsonify({'errors': errors}), 400
+    logger.info(f"Bulk generating {sum(len(b['entries']) for b in all_batches_data)} entries in {len(all_batches_data)} batches")
+    return _nacha_download(file_header, all_batches_data, now)
+
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1 @@
+"""Benchmarks for the NACHA parser and generator (run with python -m benchmarks.run)."""
@@ -0,0 +1,177 @@
+"""Benchmark the parse, parallel parse, summary, columnar (with NumPy), generate, round-trip and /parse render paths.
+
+    python -m benchmarks.run --batches 20 --entries 5000 --addenda-ratio 0.1 --output results.json
+    python -m benchmarks.run --baseline results.json --max-regression 10
+
+Each benchmark is timed over --repeat runs (best and mean are reported) and
+then run once more under tracemalloc for peak memory. Results are printed and
+optionally written as JSON; with --baseline the run is compared against a
+stored result file and the exit code is 1 if any benchmark slowed down by
+more than --max-regression percent.
+"""
+import argparse
+import atexit
+import datetime
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+
+os.environ.setdefault('NACHA_LOG_LEVEL', 'WARNING')
+
+import app as nacha_app
+import nacha_parallel
+from benchmarks.synthetic import DEFAULT_TRANSACTION_CODES, synthetic_batches, synthetic_file_header, synthetic_nacha
+from nacha import generate_nacha_file
+from nacha_columnar import HAVE_NUMPY, analyze_nacha
+from nacha_summary import aggregate_nacha
+
+def _parse(content, compact=False):
+    with nacha_app.app.test_request_context():
+        return nacha_app.parse_nacha_grouped(content, compact=compact)
+
+def _entry_count(data):
+    return sum(len(batch['Entries']) for batch in data.get('Batches', []))
+
+def build_benchmarks(args):
+    """Return {name: (callable, records, bytes)} for the configured synthetic file."""
+    content = synthetic_nacha(args.batches, args.entries, args.addenda_ratio, args.codes, args.malformed_rate, args.seed)
+    raw = content.encode('utf-8')
+    records = content.count('\n') + 1
+    file_header = synthetic_file_header()
+    batches = synthetic_batches(args.batches, args.entries, args.codes, args.seed)
+    client = nacha_app.app.test_client()
+
+    # parse_nacha_parallel reads from a path; the file is removed when the run exits
+    with tempfile.NamedTemporaryFile(suffix='.ach', delete=False) as f:
+        f.write(raw)
+    atexit.register(os.remove, f.name)
+    # Always go through the process pool, even for files below the in-process threshold
+    nacha_parallel.MIN_PARALLEL_SIZE = 0
+
+    def render():
+        nacha_app.parse_cache.clear()
+        response = client.post('/parse', data={'nacha_file': (BytesIO(raw), 'bench.txt')})
+        assert response.status_code == 200, response.status_code
+
+    def round_trip():
+        generated = generate_nacha_file(file_header, batches)
+        assert _entry_count(_parse(generated)) == args.batches * args.entries
+
+    benchmarks = {
+        'parse': (lambda: _parse(content), records, len(raw)),
+        'parse_compact': (lambda: _parse(content, compact=True), records, len(raw)),
+        'parallel': (lambda: nacha_parallel.parse_nacha_parallel(f.name), records, len(raw)),
+        'summary': (lambda: aggregate_nacha(BytesIO(raw)), records, len(raw)),
+        'generate': (lambda: generate_nacha_file(file_header, batches), records, len(raw)),
+        'round_trip': (round_trip, records, len(raw)),
+        'render': (render, records, len(raw)),
+    }
+    if HAVE_NUMPY:
+        benchmarks['columnar'] = (lambda: analyze_nacha(raw), records, len(raw))
+    return benchmarks
+
+def measure(func, records, size, repeat):
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    retained_blocks = sys.getallocatedblocks() - blocks_before
+    del result
+
+    best = min(timings)
+    return {
+        'best_seconds': round(best, 6),
+        'mean_seconds': round(statistics.mean(timings), 6),
+        'records_per_second': round(records / best, 1),
+        'mb_per_second': round(size / best / 1e6, 3),
+        'peak_memory_bytes': peak,
+        'retained_blocks': retained_blocks,
+        'records': records,
+        'bytes': size
+    }
+
+def compare(results, baseline, max_regression):
+    """Print the change against a baseline; return the names that regressed too far."""
+    regressed = []
+    print(f"\n{'benchmark':<16}{'baseline s':>12}{'current s':>12}{'change':>10}")
+    for name, current in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            print(f"{name:<16}{'-':>12}{current['best_seconds']:>12.4f}{'new':>10}")
+            continue
+        change = (current['best_seconds'] - previous['best_seconds']) / previous['best_seconds'] * 100
+        flag = ' !' if change > max_regression else ''
+        print(f"{name:<16}{previous['best_seconds']:>12.4f}{current['best_seconds']:>12.4f}{change:>+9.1f}%{flag}")
+        if change > max_regression:
+            regressed.append(name)
+    return regressed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batches', type=int, default=10)
+    parser.add_argument('--entries', type=int, default=1000, help='entries per batch')
+    parser.add_argument('--addenda-ratio', type=float, default=0.1)
+    parser.add_argument('--malformed-rate', type=float, default=0.0)
+    parser.add_argument('--codes', type=lambda s: tuple(s.split(',')), default=DEFAULT_TRANSACTION_CODES,
+                        help='comma-separated transaction codes to draw from')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', help='comma-separated benchmark names to run')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--baseline', help='compare against a previous results file')
+    parser.add_argument('--max-regression', type=float, default=10.0, help='allowed slowdown in percent')
+    args = parser.parse_args(argv)
+
+    # Per-line warnings and errors for malformed records would otherwise dominate the timings
+    logging.disable(logging.ERROR)
+
+    benchmarks = build_benchmarks(args)
+    selected = args.only.split(',') if args.only else list(benchmarks)
+    results = {}
+    for name in selected:
+        func, records, size = benchmarks[name]
+        results[name] = measure(func, records, size, args.repeat)
+        r = results[name]
+        print(f"{name:<16}{r['best_seconds']:>10.4f}s {r['records_per_second']:>12,.0f} rec/s "
+              f"{r['mb_per_second']:>8.2f} MB/s  peak {r['peak_memory_bytes'] / 2 ** 20:8.1f} MiB")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'params': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')}
+        },
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressed = compare(results, json.load(f), args.max_regression)
+        if regressed:
+            print(f"\nRegressed by more than {args.max_regression}%: {', '.join(regressed)}")
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""Synthetic NACHA files for benchmarks.
+
+Files are built with generate_nacha_file from generated batches and entries,
+then optionally salted with addenda records and malformed lines.
+"""
+import random
+
+from nacha import NACHA_RECORD_LENGTH, RECORD_LAYOUTS, generate_nacha_file
+from nacha_validate import routing_check_digit
+
+DEFAULT_TRANSACTION_CODES = ('22', '23', '27', '28', '32', '37', '21', '26')
+SEC_CODES = ('PPD', 'CCD', 'WEB', 'TEL')
+
+def synthetic_file_header(blocking_factor='10'):
+    return {
+        'priority_code': '01',
+        'immediate_destination': '091000019',
+        'immediate_origin': '123456789',
+        'file_creation_date': '240101',
+        'file_creation_time': '1200',
+        'file_id_modifier': 'A',
+        'record_size': '094',
+        'blocking_factor': blocking_factor,
+        'format_code': '1',
+        'immediate_destination_name': 'SYNTHETIC DEST BANK',
+        'immediate_origin_name': 'SYNTHETIC ORIGINATOR',
+        'reference_code': 'BENCH'
+    }
+
+def synthetic_batches(batches=10, entries_per_batch=100, transaction_codes=DEFAULT_TRANSACTION_CODES, seed=0):
+    """Return batches in the form generate_nacha_file takes."""
+    rng = random.Random(seed)
+    all_batches = []
+    for b in range(batches):
+        batch_header = {
+            'service_class_code': '200',
+            'company_name': f'COMPANY {b:05d}',
+            'company_discretionary_data': '',
+            'company_identification': f'{1000000000 + b:010d}',
+            'standard_entry_class_code': rng.choice(SEC_CODES),
+            'company_entry_description': 'PAYROLL',
+            'descriptive_date': '240101',
+            'effective_entry_date': '240102',
+            'settlement_date': '   ',
+            'originator_status_code': '1',
+            'originating_dfi_identification': '12345678',
+            'batch_number': str(b + 1).zfill(7)
+        }
+        entries = []
+        for e in range(entries_per_batch):
+            transaction_code = rng.choice(transaction_codes)
+            rdfi = f'{rng.randint(1000000, 99999999):08d}'
+            entries.append({
+                'transaction_code': transaction_code,
+                'receiving_dfi_identification': rdfi,
+                'check_digit': str(routing_check_digit(rdfi)),
+                'dfi_account_number': str(rng.randint(10 ** 6, 10 ** 15)),
+                'amount': f'{rng.randint(1, 10 ** 7) / 100:.2f}',
+                'individual_identification_number': f'ID{e:08d}',
+                'individual_name': f'RECEIVER {b}-{e}',
+                'discretionary_data': '',
+                'addenda_record_indicator': '0',
+                'trace_number': f'12345678{b * entries_per_batch + e:07d}'
+            })
+        all_batches.append({'batch_header': batch_header, 'entries': entries})
+    return all_batches
+
+def synthetic_nacha(batches=10, entries_per_batch=100, addenda_ratio=0.0, transaction_codes=DEFAULT_TRANSACTION_CODES,
+                    malformed_rate=0.0, seed=0):
+    """Return the text of a synthetic NACHA file.
+
+    addenda_ratio is the share of entries followed by an addenda record;
+    malformed_rate is the share of lines replaced by truncated or garbled ones.
+    Addenda are inserted after generation, so control counts exclude them.
+    """
+    content = generate_nacha_file(
+        synthetic_file_header(),
+        synthetic_batches(batches, entries_per_batch, transaction_codes, seed)
+    )
+    if not addenda_ratio and not malformed_rate:
+        return content
+
+    rng = random.Random(seed + 1)
+    addenda_layout = RECORD_LAYOUTS['7']
+    lines = []
+    for line in content.split('\n'):
+        if malformed_rate and line[0] in '5678' and rng.random() < malformed_rate:
+            lines.append(rng.choice((line[:rng.randint(2, NACHA_RECORD_LENGTH - 1)], line[0] + 'X' * 60, line + 'EXTRA')))
+            continue
+        lines.append(line)
+        if line.startswith('6') and addenda_ratio and rng.random() < addenda_ratio:
+            lines.append(addenda_layout.encode({
+                'type_code': '05',
+                'payment_related_info': f'SYNTHETIC PAYMENT INFO {len(lines)}',
+                'addenda_sequence_number': 1,
+                'entry_detail_sequence_number': line[87:94]
+            }))
+    return '\n'.join(lines)
@@ -0,0 +1,83 @@
+"""In-process metrics with Prometheus text exposition.
+
+Counters and timing summaries are kept per process (each gunicorn worker has
+its own). Hot loops should count into local variables and publish once at
+the end, e.g. with add_counts(), rather than calling inc() per record.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._values = {}
+        self._collectors = []
+
+    def describe(self, name, kind, help_text):
+        """Declare a metric; kind is 'counter', 'gauge' or 'summary'."""
+        self._meta[name] = (kind, help_text)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def add_counts(self, name, label, counts):
+        """Add a {label_value: count} mapping to a counter in one locked step."""
+        with self._lock:
+            for label_value, value in counts.items():
+                key = (name, ((label, str(label_value)),))
+                self._values[key] = self._values.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Record one observation of a summary metric (exposed as _sum and _count)."""
+        labels = tuple(sorted(labels.items()))
+        with self._lock:
+            for suffix, amount in (('_sum', value), ('_count', 1)):
+                key = (name + suffix, labels)
+                self._values[key] = self._values.get(key, 0) + amount
+
+    @contextmanager
+    def timed(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def register_collector(self, collector):
+        """Add a callable returning [(name, labels_dict, value)] sampled at render time."""
+        self._collectors.append(collector)
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            samples = [(name, dict(labels), value) for (name, labels), value in self._values.items()]
+        for collector in self._collectors:
+            samples.extend(collector())
+
+        by_metric = {}
+        for name, labels, value in samples:
+            base = name
+            for suffix in ('_sum', '_count'):
+                if name.endswith(suffix) and name[:-len(suffix)] in self._meta:
+                    base = name[:-len(suffix)]
+            by_metric.setdefault(base, []).append((name, labels, value))
+
+        lines = []
+        for base in sorted(by_metric):
+            kind, help_text = self._meta.get(base, ('untyped', ''))
+            lines.append(f"# HELP {base} {help_text}")
+            lines.append(f"# TYPE {base} {kind}")
+            for name, labels, value in sorted(by_metric[base], key=lambda s: (s[0], sorted(s[1].items()))):
+                label_text = ','.join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe('nacha_records_parsed_total', 'counter', 'NACHA records parsed, by record type.')
+REGISTRY.describe('nacha_records_generated_total', 'counter', 'NACHA records generated, by record type.')
+REGISTRY.describe('nacha_bytes_processed_total', 'counter', 'Bytes of NACHA content parsed or generated.')
+REGISTRY.describe('nacha_phase_seconds', 'summary', 'Time spent per processing phase (read, parse, validate, summary, render, generate).')
@@ -0,0 +1,894 @@
+"""Core NACHA record handling shared by the web app and offline tools.
+
+Nothing in this module depends on Flask, so it can be imported by scripts
+and worker processes without pulling in the web stack.
+"""
+import logging
+import os
+import sys
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from operator import itemgetter
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+NACHA_RECORD_LENGTH = 94
+# Largest amount the 10-digit Entry Detail amount field holds
+MAX_ENTRY_AMOUNT_CENTS = 10 ** 10 - 1
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# A file is only read as blocked 94-byte records when this much of it (or all of it) has no line break
+BLOCKED_PROBE_SIZE = 4096
+# Log every parsed record at DEBUG level; off by default because it costs per record
+TRACE_RECORDS = os.environ.get('NACHA_TRACE_RECORDS') == '1'
+
+def _classify_transaction_code(transaction_code):
+    # Determine debit/credit
+    if transaction_code in ['22', '23', '24', '27', '28', '29', '32', '33', '34', '37', '38', '39']:
+        transaction_type = 'Debit'
+    elif transaction_code in ['21', '26', '31', '36']:
+        transaction_type = 'Credit'
+    else:
+        transaction_type = 'Unknown'
+
+    # Determine transaction class
+    if transaction_code in ['22', '23', '24', '27', '28', '29']:
+        entry_class = 'Bank to Card' if transaction_type == 'Credit' else 'Card to Bank'
+    elif transaction_code in ['32', '33', '34', '37', '38', '39']:
+        entry_class = 'Card to Bank' if transaction_type == 'Debit' else 'Bank to Card'
+    elif transaction_code in ['21', '26', '31', '36']:
+        entry_class = 'Direct Deposit'
+    else:
+        entry_class = 'Unknown'
+
+    return transaction_type, entry_class
+
+# (transaction_type, entry_class) for every two-digit transaction code, so lookups are a single dict access
+TRANSACTION_TYPES = {f"{code:02d}": _classify_transaction_code(f"{code:02d}") for code in range(100)}
+_UNKNOWN_TRANSACTION = ('Unknown', 'Unknown')
+
+def determine_transaction_type(transaction_code):
+    """Determine if transaction is debit/credit and Bank-to-Card/Card-to-Bank/Direct Deposit"""
+    return TRANSACTION_TYPES.get(str(transaction_code), _UNKNOWN_TRANSACTION)
+
+def is_blocked(prefix, complete):
+    """Return whether a file starting with prefix holds consecutive 94-byte records rather than lines.
+
+    prefix is the first BLOCKED_PROBE_SIZE bytes of the file, or the whole
+    file when complete is true. A line break anywhere in it means the file is
+    line-based, however long its lines are; a whole file must also be a
+    multiple of the record length, ignoring a final line break.
+    """
+    if complete:
+        prefix = prefix.rstrip(b'\r\n')
+    if len(prefix) <= NACHA_RECORD_LENGTH or b'\n' in prefix or b'\r' in prefix:
+        return False
+    return not complete or len(prefix) % NACHA_RECORD_LENGTH == 0
+
+def iter_raw_lines(stream, chunk_size=DEFAULT_CHUNK_SIZE, first_line=1):
+    """Yield (line_number, raw_bytes) from a binary file-like object, reading fixed-size chunks.
+
+    Line endings (LF, CRLF or CR) are stripped. A stream that is_blocked
+    is read as consecutive 94-byte records, as MappedNachaFile reads blocked
+    files. Only one chunk plus a partial line is held in memory at any time.
+    Numbering starts at first_line.
+    """
+    head = b''
+    complete = False
+    while len(head) < BLOCKED_PROBE_SIZE:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            complete = True
+            break
+        head += chunk
+    if is_blocked(head[:BLOCKED_PROBE_SIZE], complete):
+        return _iter_blocked_lines(stream, head, chunk_size, first_line)
+    return _iter_split_lines(stream, head, chunk_size, first_line)
+
+def _iter_split_lines(stream, head, chunk_size, first_line):
+    line_number = first_line - 1
+    # Pieces of a line cut across chunks, joined once its line break arrives
+    pending = []
+    chunk = head
+    while chunk:
+        if b'\n' not in chunk and b'\r' not in chunk:
+            pending.append(chunk)
+            chunk = stream.read(chunk_size)
+            continue
+        if pending:
+            pending.append(chunk)
+            chunk = b''.join(pending)
+            pending = []
+        lines = chunk.splitlines(True)
+        # The last piece may be cut mid-line (or between '\r' and '\n'), keep it for the next chunk
+        if lines and not lines[-1].endswith(b'\n'):
+            pending.append(lines.pop())
+        for raw in lines:
+            line_number += 1
+            yield line_number, raw.rstrip(b'\r\n')
+        chunk = stream.read(chunk_size)
+    if pending:
+        line_number += 1
+        yield line_number, b''.join(pending).rstrip(b'\r\n')
+
+def _iter_blocked_lines(stream, head, chunk_size, first_line):
+    line_number = first_line - 1
+    buffered = bytearray(head)
+    while True:
+        usable = len(buffered) - len(buffered) % NACHA_RECORD_LENGTH
+        for offset in range(0, usable, NACHA_RECORD_LENGTH):
+            line_number += 1
+            yield line_number, bytes(buffered[offset:offset + NACHA_RECORD_LENGTH])
+        del buffered[:usable]
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        buffered += chunk
+    if buffered.rstrip(b'\r\n'):
+        line_number += 1
+        yield line_number, bytes(buffered).rstrip(b'\r\n')
+
+# Record layouts, one entry per field: (name, first position, last position, kind).
+# Positions are 1-based and inclusive, as printed in the NACHA specification.
+# Field kinds:
+#   'A' alphanumeric, left-justified and space-filled, stripped when read
+#   'X' fixed code, left-justified and space-filled, read as-is
+#   'R' routing/origin, right-justified and space-filled, stripped when read
+#   'N' numeric, right-justified and zero-filled, read as-is
+#   'M' amount in cents, zero-filled, read as a dollar string
+FILE_HEADER_FIELDS = (
+    ('record_type_code', 1, 1, 'X'),
+    ('priority_code', 2, 3, 'X'),
+    ('immediate_destination', 4, 13, 'R'),
+    ('immediate_origin', 14, 23, 'R'),
+    ('file_creation_date', 24, 29, 'X'),
+    ('file_creation_time', 30, 33, 'X'),
+    ('file_id_modifier', 34, 34, 'X'),
+    ('record_size', 35, 37, 'N'),
+    ('blocking_factor', 38, 39, 'N'),
+    ('format_code', 40, 40, 'X'),
+    ('immediate_destination_name', 41, 63, 'A'),
+    ('immediate_origin_name', 64, 86, 'A'),
+    ('reference_code', 87, 94, 'A'),
+)
+
+BATCH_HEADER_FIELDS = (
+    ('record_type_code', 1, 1, 'X'),
+    ('service_class_code', 2, 4, 'X'),
+    ('company_name', 5, 20, 'A'),
+    ('company_discretionary_data', 21, 40, 'A'),
+    ('company_identification', 41, 50, 'A'),
+    ('standard_entry_class_code', 51, 53, 'X'),
+    ('company_entry_description', 54, 63, 'A'),
+    ('descriptive_date', 64, 69, 'X'),
+    ('effective_entry_date', 70, 75, 'X'),
+    ('settlement_date', 76, 78, 'X'),
+    ('originator_status_code', 79, 79, 'X'),
+    ('originating_dfi_identification', 80, 87, 'X'),
+    ('batch_number', 88, 94, 'N'),
+)
+
+ENTRY_DETAIL_FIELDS = (
+    ('record_type_code', 1, 1, 'X'),
+    ('transaction_code', 2, 3, 'X'),
+    ('receiving_dfi_identification', 4, 11, 'X'),
+    ('check_digit', 12, 12, 'X'),
+    ('dfi_account_number', 13, 29, 'A'),
+    ('amount', 30, 39, 'M'),
+    ('individual_identification_number', 40, 54, 'A'),
+    ('individual_name', 55, 76, 'A'),
+    ('discretionary_data', 77, 78, 'A'),
+    ('addenda_record_indicator', 79, 79, 'X'),
+    ('trace_number', 80, 94, 'A'),
+)
+
+ADDENDA_FIELDS = (
+    ('record_type_code', 1, 1, 'X'),
+    ('type_code', 2, 3, 'X'),
+    ('payment_related_info', 4, 83, 'A'),
+    ('addenda_sequence_number', 84, 87, 'N'),
+    ('entry_detail_sequence_number', 88, 94, 'N'),
+)
+
+BATCH_CONTROL_FIELDS = (
+    ('record_type_code', 1, 1, 'X'),
+    ('service_class_code', 2, 4, 'X'),
+    ('entry_addenda_count', 5, 10, 'N'),
+    ('entry_hash', 11, 20, 'N'),
+    ('total_debit_amount', 21, 32, 'M'),
+    ('total_credit_amount', 33, 44, 'M'),
+    ('company_identification', 45, 54, 'A'),
+    ('message_authentication_code', 55, 73, 'A'),
+    ('reserved', 74, 79, 'A'),
+    ('originating_dfi_identification', 80, 87, 'X'),
+    ('batch_number', 88, 94, 'N'),
+)
+
+FILE_CONTROL_FIELDS = (
+    ('record_type_code', 1, 1, 'X'),
+    ('batch_count', 2, 7, 'N'),
+    ('block_count', 8, 13, 'N'),
+    ('entry_addenda_count', 14, 21, 'N'),
+    ('entry_hash', 22, 31, 'N'),
+    ('total_debit_amount', 32, 43, 'M'),
+    ('total_credit_amount', 44, 55, 'M'),
+    ('reserved', 56, 94, 'A'),
+)
+
+_ENCODE_SPECS = {'A': '<', 'X': '<', 'R': '>', 'N': '0>', 'M': '0>'}
+
+def format_cents(cents):
+    """Format integer cents as a dollar string, e.g. 12345 -> '123.45'."""
+    sign = '-' if cents < 0 else ''
+    cents = abs(cents)
+    return f"{sign}{cents // 100}.{cents % 100:02d}"
+
+def dollars_to_cents(amount):
+    """Convert a dollar amount ('12.34', 12.34 or Decimal) to integer cents without float rounding."""
+    return int((Decimal(str(amount)) * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+def _format_declared_amount(field):
+    """Format a declared cents field as dollars, leaving non-numeric content as-is."""
+    try:
+        return "{:.2f}".format(abs(int(field)) / 100.0)
+    except ValueError:
+        return field.strip()
+
+class RecordLayout:
+    """Fixed-width layout for one record type, compiled into a decoder and an encoder."""
+
+    def __init__(self, record_type, fields):
+        self.record_type = record_type
+        self.fields = fields
+        self.names = tuple(name for name, _, _, _ in fields)
+        self.slices = {name: slice(start - 1, end) for name, start, end, _ in fields}
+        self.split = itemgetter(*self.slices.values())
+        self._strip_names = tuple(name for name, _, _, kind in fields if kind in ('A', 'R'))
+        self._amount_names = tuple(name for name, _, _, kind in fields if kind == 'M')
+        self._numeric_names = frozenset(name for name, _, _, kind in fields if kind in ('N', 'M'))
+        self.kinds = {name: kind for name, _, _, kind in fields}
+        self._format = ''.join(
+            f"{{:{_ENCODE_SPECS[kind]}{end - start + 1}.{end - start + 1}}}"
+            for _, start, end, kind in fields
+        )
+
+    def decode(self, line):
+        """Split a record line into a dict of field values."""
+        record = dict(zip(self.names, self.split(line)))
+        for name in self._strip_names:
+            record[name] = record[name].strip()
+        for name in self._amount_names:
+            record[name] = _format_declared_amount(record[name])
+        return record
+
+    def decode_field(self, name, raw):
+        """Convert the raw text of a single field the same way decode() does."""
+        kind = self.kinds[name]
+        if kind in ('A', 'R'):
+            return raw.strip()
+        if kind == 'M':
+            return _format_declared_amount(raw)
+        return raw
+
+    def encode(self, values):
+        """Build a 94-character record line from a dict of field values.
+
+        Missing fields are blank (or zero for numeric fields). Amount fields take
+        integer cents or a dollar string such as '12.34'.
+        """
+        args = []
+        for name in self.names:
+            value = values.get(name)
+            if name == 'record_type_code':
+                value = self.record_type
+            elif name in self._amount_names:
+                if isinstance(value, str) and '.' in value:
+                    value = dollars_to_cents(value)
+                value = abs(int(value or 0))
+            elif value is None:
+                value = '0' if name in self._numeric_names else ''
+            args.append(str(value))
+        return self._format.format(*args)
+
+RECORD_LAYOUTS = {
+    '1': RecordLayout('1', FILE_HEADER_FIELDS),
+    '5': RecordLayout('5', BATCH_HEADER_FIELDS),
+    '6': RecordLayout('6', ENTRY_DETAIL_FIELDS),
+    '7': RecordLayout('7', ADDENDA_FIELDS),
+    '8': RecordLayout('8', BATCH_CONTROL_FIELDS),
+    '9': RecordLayout('9', FILE_CONTROL_FIELDS),
+}
+
+_ENTRY_AMOUNT = RECORD_LAYOUTS['6'].slices['amount']
+
+def parse_entry_detail(line):
+    """Decode an Entry Detail line into a dict, including the derived transaction fields."""
+    record = RECORD_LAYOUTS['6'].decode(line)
+    amount = int(line[_ENTRY_AMOUNT]) / 100.0
+    record['transaction_type'], record['entry_class'] = determine_transaction_type(record['transaction_code'])
+    record['raw_amount'] = amount
+    return record
+
+class EntryDetail:
+    """Compact Entry Detail record for the opt-in compact parsing mode.
+
+    Stores the amount as integer cents, the RDFI routing number as an int and
+    interned codes, and computes the formatted and derived fields on access.
+    Supports the dict-style reads (entry['amount'], 'Addenda' in entry) used by
+    the templates and by parse_nacha_grouped.
+    """
+    __slots__ = (
+        'transaction_code', 'rdfi', 'check_digit', 'dfi_account_number', 'amount_cents',
+        'individual_identification_number', 'individual_name', 'discretionary_data',
+        'addenda_record_indicator', 'trace_number', 'addenda'
+    )
+
+    FIELD_NAMES = (
+        'record_type_code', 'transaction_code', 'transaction_type', 'entry_class',
+        'receiving_dfi_identification', 'check_digit', 'dfi_account_number', 'amount',
+        'individual_identification_number', 'individual_name', 'discretionary_data',
+        'addenda_record_indicator', 'trace_number', 'raw_amount'
+    )
+
+    record_type_code = '6'
+
+    @classmethod
+    def from_line(cls, line):
+        (_, transaction_code, rdfi, check_digit, account, amount, id_number, name,
+         discretionary, addenda_indicator, trace) = RECORD_LAYOUTS['6'].split(line)
+        entry = cls()
+        entry.transaction_code = sys.intern(transaction_code)
+        entry.rdfi = int(rdfi) if rdfi.isdigit() else rdfi
+        entry.check_digit = sys.intern(check_digit)
+        entry.dfi_account_number = account.strip()
+        entry.amount_cents = int(amount)
+        entry.individual_identification_number = id_number.strip()
+        entry.individual_name = name.strip()
+        entry.discretionary_data = sys.intern(discretionary.strip())
+        entry.addenda_record_indicator = sys.intern(addenda_indicator)
+        entry.trace_number = trace.strip()
+        entry.addenda = None
+        return entry
+
+    @property
+    def transaction_type(self):
+        return determine_transaction_type(self.transaction_code)[0]
+
+    @property
+    def entry_class(self):
+        return determine_transaction_type(self.transaction_code)[1]
+
+    @property
+    def receiving_dfi_identification(self):
+        return f"{self.rdfi:08d}" if isinstance(self.rdfi, int) else self.rdfi
+
+    @property
+    def amount(self):
+        return "{:.2f}".format(abs(self.amount_cents) / 100.0)
+
+    @property
+    def raw_amount(self):
+        return self.amount_cents / 100.0
+
+    def keys(self):
+        if self.addenda is None:
+            return self.FIELD_NAMES
+        return self.FIELD_NAMES + ('Addenda',)
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __getitem__(self, key):
+        if key not in self.keys():
+            raise KeyError(key)
+        return self.addenda if key == 'Addenda' else getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key != 'Addenda':
+            raise KeyError(key)
+        self.addenda = value
+
+    def get(self, key, default=None):
+        return self[key] if key in self.keys() else default
+
+    def to_dict(self):
+        """Return the same dict a non-compact parse would have produced."""
+        return {key: self[key] for key in self.keys()}
+
+    def __repr__(self):
+        return f"EntryDetail(trace_number={self.trace_number!r}, amount={self.amount!r})"
+
+def entry_amount_cents(entry):
+    """Return an entry's amount in integer cents, for dict and EntryDetail entries alike."""
+    if isinstance(entry, EntryDetail):
+        return entry.amount_cents
+    return int(entry['amount'].replace('.', ''))
+
+class ParseMessage(str):
+    """A parser warning or error message, tagged with its kind and line number."""
+
+    def __new__(cls, text, kind=None, line_number=None):
+        message = super().__new__(cls, text)
+        message.kind = kind
+        message.line_number = line_number
+        return message
+
+class NachaDecodeError(UnicodeDecodeError):
+    """A record line that is not valid UTF-8, reported with its line number."""
+
+    def __init__(self, line_number, error):
+        super().__init__(error.encoding, error.object, error.start, error.end, error.reason)
+        self.line_number = line_number
+
+    def __str__(self):
+        return f"line {self.line_number} is not valid UTF-8 (byte 0x{self.object[self.start]:02x} at position {self.start + 1})"
+
+class CountingReader:
+    """Wrap a binary stream and count the bytes read through it."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        self.bytes_read += len(data)
+        return data
+
+def iter_nacha_records(stream, chunk_size=DEFAULT_CHUNK_SIZE, compact=False, first_line=1, diagnostics=None):
+    """Parse a NACHA file from a binary file-like object one record at a time.
+
+    Yields (event, line_number, payload) tuples where event is one of
+    'file_header', 'batch_header', 'entry', 'addenda', 'batch_control',
+    'file_control', 'padding', 'warning' or 'error'. Record events carry the
+    decoded record dict; 'warning' and 'error' carry a ParseMessage string.
+    Batch boundaries are the 'batch_header' and 'batch_control' events.
+    With compact=True, entries are EntryDetail objects instead of dicts.
+    Line numbers start at first_line, for callers parsing part of a file.
+    With a ParseDiagnostics as diagnostics, short and long lines are recorded
+    there instead of logged, and parsing stops once it has seen max_errors.
+
+    Set NACHA_TRACE_RECORDS=1 (with DEBUG logging) to log every record.
+    """
+    events = _iter_nacha_records(stream, chunk_size, compact, first_line, diagnostics)
+    if TRACE_RECORDS and logger.isEnabledFor(logging.DEBUG):
+        return _trace_records(events)
+    return events
+
+def _trace_records(events):
+    for event, line_number, record in events:
+        logger.debug("Line %d: %s", line_number, event)
+        yield event, line_number, record
+
+def _iter_nacha_records(stream, chunk_size, compact, first_line, diagnostics):
+    parse_entry = EntryDetail.from_line if compact else parse_entry_detail
+    reader = CountingReader(stream)
+    record_counts = defaultdict(int)
+    in_batch = False
+    entries_in_scope = 0
+
+    try:
+        for i, raw in iter_raw_lines(reader, chunk_size, first_line):
+            if diagnostics is not None and diagnostics.stopped:
+                logger.warning(f"Stopped parsing after line {diagnostics.stopped_at}: {diagnostics.error_count} errors")
+                break
+            try:
+                line = raw.decode('utf-8')
+            except UnicodeDecodeError as e:
+                raise NachaDecodeError(i, e) from None
+            if not line or len(line.strip()) < 2:
+                continue
+
+            if len(line) < NACHA_RECORD_LENGTH:
+                if diagnostics is None:
+                    logger.warning(f"Line {i} is too short ({len(line)} chars)")
+                else:
+                    diagnostics.add('warning', ParseMessage(f"Line {i} is too short ({len(line)} chars)", 'line_too_short', i))
+            elif len(line) > NACHA_RECORD_LENGTH:
+                if diagnostics is None:
+                    logger.warning(f"Line {i} is too long ({len(line)} chars)")
+                else:
+                    diagnostics.add('warning', ParseMessage(f"Line {i} is too long ({len(line)} chars)", 'line_too_long', i))
+                line = line[:NACHA_RECORD_LENGTH]
+
+            record_type = line[0]
+            record_counts[record_type] += 1
+
+            try:
+                if record_type == '6':
+                    record = parse_entry(line)
+                    entries_in_scope += 1
+                    yield 'entry', i, record
+
+                elif record_type == '7':
+                    if entries_in_scope:
+                        yield 'addenda', i, RECORD_LAYOUTS['7'].decode(line)
+                    else:
+                        yield 'warning', i, ParseMessage(f"Warning: Addenda record (line {i}) found without a preceding Entry Detail record. Skipping.",
+                                                         'addenda_without_entry', i)
+
+                elif record_type == '5':
+                    record = RECORD_LAYOUTS['5'].decode(line)
+                    in_batch = True
+                    entries_in_scope = 0
+                    yield 'batch_header', i, record
+
+                elif record_type == '8':
+                    if in_batch:
+                        record = RECORD_LAYOUTS['8'].decode(line)
+                        in_batch = False
+                        entries_in_scope = 0
+                        yield 'batch_control', i, record
+                    else:
+                        yield 'warning', i, ParseMessage(f"Warning: Batch Control record (line {i}) found without a preceding Batch Header record. Skipping.",
+                                                         'batch_control_without_header', i)
+
+                elif record_type == '1':
+                    yield 'file_header', i, RECORD_LAYOUTS['1'].decode(line)
+
+                elif record_type == '9':
+                    if line.strip() == '9' * NACHA_RECORD_LENGTH:
+                        yield 'padding', i, line
+                    else:
+                        yield 'file_control', i, RECORD_LAYOUTS['9'].decode(line)
+
+            except Exception as e:
+                yield 'error', i, ParseMessage(f"Error parsing line {i}: {str(e)}", 'parse_exception', i)
+    finally:
+        # Published once per parse so the per-record loop stays free of shared state
+        unknown = sum(count for record_type, count in record_counts.items() if record_type not in RECORD_LAYOUTS)
+        record_counts = {record_type: count for record_type, count in record_counts.items() if record_type in RECORD_LAYOUTS}
+        if unknown:
+            record_counts['other'] = unknown
+        REGISTRY.add_counts('nacha_records_parsed_total', 'record_type', record_counts)
+        REGISTRY.inc('nacha_bytes_processed_total', reader.bytes_read, direction='parsed')
+
+def group_nacha_records(events, on_message=None, partial=False):
+    """Group iter_nacha_records events into the File Header / Batches / File Control structure.
+
+    Warnings and errors are passed to on_message(category, message) when given.
+    With partial=True the events are one segment of a longer stream (see
+    nacha_parallel): a last batch without a Batch Control is kept if it has
+    entries, without a warning, as the next segment's Batch Header keeps it.
+    Entries outside a batch are skipped with a warning and left out of the
+    totals; aggregate_nacha and the columnar backend follow the same rule.
+    The grouped File Control is a copy of the record with its debit/credit
+    totals replaced by the totals of the parsed entries, summed in integer
+    cents; the record itself is left as parsed for other consumers of the
+    events, such as a NachaValidator.
+    """
+    data = defaultdict(list)
+    current_batch = None
+    current_batch_entries = []
+
+    # Initialize totals for file control
+    total_debit_cents = 0
+    total_credit_cents = 0
+
+    for event, line_number, record in events:
+        if event == 'entry':
+            if current_batch is None:
+                if on_message:
+                    on_message('warning', ParseMessage(f"Warning: Entry Detail record (line {line_number}) found outside a batch. Skipping.",
+                                                       'entry_outside_batch', line_number))
+                continue
+            # Update file-level totals
+            if record['transaction_type'] == 'Debit':
+                total_debit_cents += entry_amount_cents(record)
+            else:
+                total_credit_cents += entry_amount_cents(record)
+            current_batch_entries.append(record)
+
+        elif event == 'addenda':
+            if current_batch is None:
+                # Addenda of an entry skipped outside a batch
+                continue
+            if 'Addenda' not in current_batch_entries[-1]:
+                current_batch_entries[-1]['Addenda'] = []
+            current_batch_entries[-1]['Addenda'].append(record)
+
+        elif event == 'batch_header':
+            if current_batch and current_batch_entries:
+                current_batch['Entries'] = current_batch_entries
+                data['Batches'].append(current_batch)
+            current_batch = {
+                'Batch Header': record,
+                'Entries': [],
+                'Batch Control': {}
+            }
+            current_batch_entries = []
+
+        elif event == 'batch_control':
+            if current_batch is None:
+                if on_message:
+                    on_message('warning', ParseMessage(f"Warning: Batch Control record (line {line_number}) found without a Batch Header. Skipping.",
+                                                       'batch_control_without_header', line_number))
+                continue
+            current_batch['Batch Control'] = record
+            current_batch['Entries'] = current_batch_entries
+            data['Batches'].append(current_batch)
+            current_batch = None
+            current_batch_entries = []
+
+        elif event == 'file_header':
+            data['File Header'] = record
+
+        elif event == 'file_control':
+            # Use our calculated totals instead of the values from the file
+            data['File Control'] = dict(record, total_debit_amount=format_cents(total_debit_cents),
+                                        total_credit_amount=format_cents(total_credit_cents))
+
+        elif event == 'padding':
+            data['File Padding Count'] = data.get('File Padding Count', 0) + 1
+
+        elif event in ('warning', 'error') and on_message:
+            on_message(event, record)
+
+    if partial:
+        if current_batch and current_batch_entries:
+            current_batch['Entries'] = current_batch_entries
+            data['Batches'].append(current_batch)
+    elif current_batch and not current_batch['Batch Control']:
+        current_batch['Entries'] = current_batch_entries
+        data['Batches'].append(current_batch)
+        if on_message:
+            on_message('warning', ParseMessage("Warning: Last batch found without a Batch Control Record.", 'batch_without_control'))
+
+    return dict(data)
+
+def build_file_header(get, now):
+    """Build File Header data from a get(key, default) lookup, filling the usual defaults."""
+    return {
+        'priority_code': get('priority_code', '01'),
+        'immediate_destination': get('immediate_destination', '').strip(),
+        'immediate_origin': get('immediate_origin', '').strip(),
+        'file_creation_date': get('file_creation_date', '') or now.strftime('%y%m%d'),
+        'file_creation_time': get('file_creation_time', '') or now.strftime('%H%M'),
+        'file_id_modifier': get('file_id_modifier', 'A').upper(),
+        'record_size': get('record_size', '094'),
+        'blocking_factor': get('blocking_factor', '10'),
+        'format_code': get('format_code', '1'),
+        'immediate_destination_name': get('immediate_destination_name', '').ljust(23)[:23],
+        'immediate_origin_name': get('immediate_origin_name', '').ljust(23)[:23],
+        'reference_code': get('reference_code', '').ljust(8)[:8]
+    }
+
+def build_batch_header(get, batch_idx, effective_entry_date):
+    """Build Batch Header data from a get(key, default) lookup, filling the usual defaults."""
+    return {
+        'service_class_code': get('service_class_code', '200'),
+        'company_name': get('company_name', '').ljust(16)[:16],
+        'company_discretionary_data': get('company_discretionary_data', '').ljust(20)[:20],
+        'company_identification': get('company_identification', '').ljust(10)[:10],
+        'standard_entry_class_code': get('standard_entry_class_code', 'PPD').ljust(3)[:3],
+        'company_entry_description': get('company_entry_description', '').ljust(10)[:10],
+        'descriptive_date': get('descriptive_date', '').ljust(6)[:6],
+        'effective_entry_date': get('effective_entry_date', effective_entry_date),
+        'settlement_date': get('settlement_date', '   ').ljust(3)[:3],
+        'originator_status_code': get('originator_status_code', '1'),
+        'originating_dfi_identification': get('originating_dfi_identification', '').ljust(8)[:8],
+        'batch_number': get('batch_number', str(batch_idx + 1)).zfill(7)
+    }
+
+def build_entry(get):
+    """Build Entry Detail data from a get(key, default) lookup, filling the usual defaults."""
+    return {
+        'transaction_code': get('transaction_code', '27').strip(),
+        'receiving_dfi_identification': get('receiving_dfi_identification', '').strip(),
+        'check_digit': get('check_digit', '').strip(),
+        'dfi_account_number': get('dfi_account_number', '').strip(),
+        'amount': get('amount', '0.00').strip(),
+        'individual_identification_number': get('individual_identification_number', '').strip(),
+        'individual_name': get('individual_name', '').strip(),
+        'discretionary_data': get('discretionary_data', '').strip(),
+        'addenda_record_indicator': get('addenda_record_indicator', '0').strip(),
+        'trace_number': get('trace_number', '').strip()
+    }
+
+def validate_file_header(file_header):
+    """Return the first problem with File Header data, or None."""
+    if not file_header['immediate_destination'] or not file_header['immediate_destination'].isdigit() or len(file_header['immediate_destination']) != 9:
+        return 'Immediate Destination (Routing #) must be 9 digits.'
+    if not file_header['immediate_origin'] or not file_header['immediate_origin'].isdigit() or len(file_header['immediate_origin']) != 9:
+        return 'Immediate Origin (Company ID) must be 9 digits.'
+    try:
+        if int(file_header['blocking_factor']) <= 0:
+            raise ValueError("Blocking factor must be positive.")
+    except ValueError:
+        return 'Blocking Factor must be a positive number.'
+    return None
+
+def validate_batch_header(batch_header):
+    """Return the first problem with Batch Header data, or None."""
+    if not batch_header['company_identification'] or len(batch_header['company_identification']) != 10:
+        return 'Company Identification must be 10 characters (can include leading zero for 9-digit EIN).'
+    if not batch_header['originating_dfi_identification'] or not batch_header['originating_dfi_identification'].isdigit() or len(batch_header['originating_dfi_identification']) != 8:
+        return 'Originating DFI Identification must be 8 digits.'
+    return None
+
+def validate_entry(entry_data):
+    """Return the first problem with Entry Detail data, or None."""
+    if not entry_data['transaction_code'] or not entry_data['transaction_code'].isdigit() or len(entry_data['transaction_code']) != 2:
+        return 'Transaction Code must be 2 digits.'
+    if not entry_data['receiving_dfi_identification'] or not entry_data['receiving_dfi_identification'].isdigit() or len(entry_data['receiving_dfi_identification']) != 8:
+        return 'Receiving DFI Identification must be 8 digits.'
+    if not entry_data['check_digit'] or not entry_data['check_digit'].isdigit() or len(entry_data['check_digit']) != 1:
+        return 'Check Digit must be a single digit.'
+    if not entry_data['dfi_account_number'] or len(entry_data['dfi_account_number']) > 17:
+        return 'DFI Account Number is required and max 17 characters.'
+    try:
+        amount_cents = dollars_to_cents(entry_data['amount'])
+    except (InvalidOperation, ValueError, OverflowError):
+        return 'Amount must be a valid number (e.g., 123.45).'
+    if not 0 <= amount_cents <= MAX_ENTRY_AMOUNT_CENTS:
+        return f'Amount must be between 0.00 and {format_cents(MAX_ENTRY_AMOUNT_CENTS)}.'
+    if not entry_data['individual_name'] or len(entry_data['individual_name']) > 22:
+        return 'Individual Name is required and max 22 characters.'
+    if not entry_data['trace_number'] or not entry_data['trace_number'].isdigit() or len(entry_data['trace_number']) != 15:
+        return 'Trace Number must be 15 digits.'
+    return None
+
+def iter_nacha_lines(file_header_data, all_batches_data):
+    """Yield the records of a NACHA file one line at a time.
+
+    all_batches_data may be any iterable of {'batch_header', 'entries'} dicts
+    and each batch's entries any iterable, so batches and entries can be
+    produced lazily. Entries carrying an 'Addenda' list (as parsed entries do)
+    are followed by their addenda records. Only running batch and file totals
+    are kept.
+    """
+    logger.debug("Generating NACHA file content")
+
+    # File Header Record
+    line = RECORD_LAYOUTS['1'].encode(file_header_data)
+    yield line
+
+    total_file_debit_cents = 0
+    total_file_credit_cents = 0
+    total_file_entry_addenda_count = 0
+    total_file_addenda_count = 0
+    total_file_entry_hash = 0
+    total_batch_count = 0
+    current_line_count = 1
+    total_bytes = len(line)
+
+    # Loop through each batch
+    for batch_data in all_batches_data:
+        total_batch_count += 1
+        batch_debit_cents = 0
+        batch_credit_cents = 0
+        batch_entry_addenda_count = 0
+        batch_entry_hash = 0
+
+        batch_header = batch_data['batch_header']
+        entries = batch_data['entries']
+
+        # Batch Header Record
+        line = RECORD_LAYOUTS['5'].encode(batch_header)
+        yield line
+        current_line_count += 1
+        total_bytes += len(line) + 1
+
+        # Entry Detail Records for the current batch
+        for entry in entries:
+            try:
+                amount_cents = dollars_to_cents(entry['amount'])
+            except (InvalidOperation, ValueError, OverflowError):
+                amount_cents = None
+            # Out-of-range amounts would not fit the field; write 0 so the controls match the entry lines
+            if amount_cents is None or not 0 <= amount_cents <= MAX_ENTRY_AMOUNT_CENTS:
+                logger.warning(f"Invalid amount '{entry['amount']}' for an entry. Using 0.")
+                amount_cents = 0
+
+            line = RECORD_LAYOUTS['6'].encode(dict(entry, amount=amount_cents))
+            yield line
+            current_line_count += 1
+            total_bytes += len(line) + 1
+            batch_entry_addenda_count += 1
+
+            for addenda in entry.get('Addenda') or ():
+                line = RECORD_LAYOUTS['7'].encode(addenda)
+                yield line
+                current_line_count += 1
+                total_bytes += len(line) + 1
+                batch_entry_addenda_count += 1
+                total_file_addenda_count += 1
+
+            # Update batch totals
+            transaction_type, _ = determine_transaction_type(entry['transaction_code'])
+            if transaction_type == 'Debit':
+                batch_debit_cents += amount_cents
+            elif transaction_type == 'Credit':
+                batch_credit_cents += amount_cents
+
+            try:
+                batch_entry_hash += int(entry['receiving_dfi_identification'][:8])
+            except ValueError:
+                logger.warning(f"Could not add DFI ID '{entry['receiving_dfi_identification'][:8]}' to batch hash")
+
+        # Batch Control Record for the current batch
+        line = RECORD_LAYOUTS['8'].encode({
+            'service_class_code': batch_header['service_class_code'],
+            'entry_addenda_count': batch_entry_addenda_count,
+            'entry_hash': batch_entry_hash % 10000000000,
+            'total_debit_amount': batch_debit_cents,
+            'total_credit_amount': batch_credit_cents,
+            'company_identification': batch_header['company_identification'],
+            'originating_dfi_identification': batch_header['originating_dfi_identification'],
+            'batch_number': batch_header['batch_number']
+        })
+        yield line
+        current_line_count += 1
+        total_bytes += len(line) + 1
+
+        # Accumulate file totals
+        total_file_debit_cents += batch_debit_cents
+        total_file_credit_cents += batch_credit_cents
+        total_file_entry_addenda_count += batch_entry_addenda_count
+        total_file_entry_hash += batch_entry_hash
+
+    # File Control Record
+    blocking_factor = int(file_header_data.get('blocking_factor', '10'))
+    temp_line_count = current_line_count + 1 # +1 for the file control record itself
+    padding_needed = 0
+    if blocking_factor > 0:
+        padding_needed = (blocking_factor - (temp_line_count % blocking_factor)) % blocking_factor
+
+    file_block_count_calc = (temp_line_count + padding_needed) // blocking_factor
+
+    line = RECORD_LAYOUTS['9'].encode({
+        'batch_count': total_batch_count,
+        'block_count': file_block_count_calc,
+        'entry_addenda_count': total_file_entry_addenda_count,
+        'entry_hash': total_file_entry_hash % 10000000000,
+        'total_debit_amount': total_file_debit_cents,
+        'total_credit_amount': total_file_credit_cents
+    })
+    yield line
+    current_line_count += 1
+    total_bytes += len(line) + 1
+
+    # File Padding Records
+    padding_line = '9' * NACHA_RECORD_LENGTH
+    for _ in range(padding_needed):
+        yield padding_line
+        current_line_count += 1
+        total_bytes += NACHA_RECORD_LENGTH + 1
+
+    REGISTRY.add_counts('nacha_records_generated_total', 'record_type', {
+        '1': 1, '5': total_batch_count, '6': total_file_entry_addenda_count - total_file_addenda_count,
+        '7': total_file_addenda_count, '8': total_batch_count, '9': 1 + padding_needed
+    })
+    REGISTRY.inc('nacha_bytes_processed_total', total_bytes, direction='generated')
+    logger.debug(f"Generated {current_line_count} NACHA records")
+
+def iter_nacha_bytes(file_header_data, all_batches_data, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield a generated NACHA file as UTF-8 chunks of roughly chunk_size bytes.
+
+    Lines are separated by "\n" with no trailing newline, the same bytes
+    generate_nacha_file returns.
+    """
+    lines_per_chunk = max(1, chunk_size // (NACHA_RECORD_LENGTH + 1))
+    buffered = []
+    separator = ''
+    for line in iter_nacha_lines(file_header_data, all_batches_data):
+        buffered.append(line)
+        if len(buffered) >= lines_per_chunk:
+            yield (separator + "\n".join(buffered)).encode('utf-8')
+            separator = "\n"
+            buffered = []
+    if buffered:
+        yield (separator + "\n".join(buffered)).encode('utf-8')
+
+def write_nacha_file(file_header_data, all_batches_data, out, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Write a generated NACHA file to a binary file object; return the bytes written."""
+    written = 0
+    for chunk in iter_nacha_bytes(file_header_data, all_batches_data, chunk_size):
+        out.write(chunk)
+        written += len(chunk)
+    return written
+
+def generate_nacha_file(file_header_data, all_batches_data):
+    """Generate NACHA file content from form data and dummy entries."""
+    return "\n".join(iter_nacha_lines(file_header_data, all_batches_data))
@@ -0,0 +1,114 @@
+"""Bulk generation input: batches and entries from a CSV or JSON upload.
+
+JSON uploads look like
+
+    {"file_header": {...},
+     "batches": [{"batch_header": {...}, "entries": [{...}, ...]}, ...]}
+
+CSV uploads have one row per entry, with the entry columns and the batch
+header columns side by side. Consecutive rows with the same batch header
+values form one batch; the file header comes from the request form instead.
+
+Missing or empty values get the same defaults as the /generate form, and
+every batch and entry is checked with the same rules. All rows are checked in
+one pass and the problems collected (up to a limit), so a large upload is
+reported in one response instead of one error at a time.
+"""
+import csv
+import io
+import itertools
+import json
+
+from nacha import build_batch_header, build_entry, build_file_header, validate_batch_header, validate_entry, validate_file_header
+
+MAX_BULK_ERRORS = 50
+
+BATCH_HEADER_COLUMNS = (
+    'service_class_code', 'company_name', 'company_discretionary_data', 'company_identification',
+    'standard_entry_class_code', 'company_entry_description', 'descriptive_date', 'effective_entry_date',
+    'settlement_date', 'originator_status_code', 'originating_dfi_identification', 'batch_number'
+)
+
+class BulkInputError(ValueError):
+    """Raised when an upload cannot be read as bulk generation input."""
+
+def _getter(values):
+    """Return a get(key, default) over values that treats None and '' as missing."""
+    def get(key, default):
+        value = values.get(key)
+        if value is None or value == '':
+            return default
+        return str(value)
+    return get
+
+def load_bulk_json(stream):
+    """Read raw (file_header, batches) dicts from a JSON upload."""
+    try:
+        payload = json.load(io.TextIOWrapper(stream, encoding='utf-8'))
+    except (UnicodeDecodeError, ValueError) as e:
+        raise BulkInputError(f"Invalid JSON: {e}")
+    if not isinstance(payload, dict) or not isinstance(payload.get('batches'), list):
+        raise BulkInputError("JSON upload must be an object with a 'batches' list")
+    file_header = payload.get('file_header') or {}
+    if not isinstance(file_header, dict):
+        raise BulkInputError("'file_header' must be an object")
+    batches = []
+    for batch in payload['batches']:
+        if not isinstance(batch, dict) or not isinstance(batch.get('entries'), list):
+            raise BulkInputError("Each batch must be an object with an 'entries' list")
+        batch_header = batch.get('batch_header') or {}
+        if not isinstance(batch_header, dict):
+            raise BulkInputError("Each 'batch_header' must be an object")
+        if not all(isinstance(entry, dict) for entry in batch['entries']):
+            raise BulkInputError("Each entry must be an object")
+        batches.append((batch_header, batch['entries']))
+    return file_header, batches
+
+def load_bulk_csv(stream):
+    """Read raw batches from a CSV upload, grouping consecutive rows by their batch header columns."""
+    try:
+        reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8', newline=''))
+        batch_key = lambda row: tuple(row.get(column) or '' for column in BATCH_HEADER_COLUMNS)
+        return [(rows[0], rows) for rows in (list(group) for _, group in itertools.groupby(reader, batch_key))]
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise BulkInputError(f"Invalid CSV: {e}")
+
+def build_bulk_batches(raw_file_header, raw_batches, now, effective_entry_date, max_errors=MAX_BULK_ERRORS):
+    """Normalize and validate raw bulk input in a single pass.
+
+    Returns (file_header, batches, errors); the batches are in the form
+    generate_nacha_file takes and errors lists at most max_errors messages.
+    """
+    errors = []
+    file_header = build_file_header(_getter(raw_file_header), now)
+    error = validate_file_header(file_header)
+    if error:
+        errors.append(f'File Header: {error}')
+
+    if not raw_batches:
+        errors.append("No batches provided. A NACHA file needs at least one batch with entries.")
+
+    batches = []
+    for batch_idx, (raw_header, raw_entries) in enumerate(raw_batches):
+        batch_header = build_batch_header(_getter(raw_header), batch_idx, effective_entry_date)
+        error = validate_batch_header(batch_header)
+        if error:
+            errors.append(f'Batch {batch_idx + 1}: {error}')
+        if not raw_entries:
+            errors.append(f"Batch {batch_idx + 1}: No entries provided. Each batch needs at least one entry.")
+
+        entries = []
+        for entry_idx, raw_entry in enumerate(raw_entries):
+            entry_data = build_entry(_getter(raw_entry))
+            error = validate_entry(entry_data)
+            if error:
+                errors.append(f'Batch {batch_idx + 1}, Entry {entry_idx + 1}: {error}')
+                if len(errors) >= max_errors:
+                    return file_header, batches, errors
+            entries.append(entry_data)
+
+        if len(errors) >= max_errors:
+            break
+        batches.append({'batch_header': batch_header, 'entries': entries})
+
+    return file_header, batches, errors[:max_errors]
@@ -0,0 +1,349 @@
+"""Command-line interface for offline NACHA processing.
+
+    python nacha_cli.py parse FILE... [--workers N] [--compact]
+    python nacha_cli.py validate FILE... [--workers N]
+    python nacha_cli.py summarize FILE_OR_ZIP... [--workers N]
+    python nacha_cli.py generate INPUT.json|INPUT.csv [--header HEADER.json] [-o OUT.ach]
+    python nacha_cli.py export FILE... [-o DIR] [--summary] [--workers N]
+    python nacha_cli.py export FILE... --sqlite DB
+    python nacha_cli.py split FILE -o DIR [--max-entries N] [--max-amount DOLLARS] [--by-batch]
+    python nacha_cli.py merge FILE... -o OUT.ach [--header HEADER.json]
+    python nacha_cli.py analyze FILE... [--bins N] [--outlier-threshold K] [--workers N]   (needs NumPy)
+
+Uses the same parsing, validation, summary and generation code as the web app
+but never imports Flask, so it starts quickly in nightly jobs. Files are
+processed across --workers processes (default: CPU count), and results are
+written to stdout as one JSON object per line, in input order. Logs go to
+stderr (NACHA_LOG_LEVEL, default WARNING).
+
+Exit codes: 0 when every file is clean, 1 when any file has parse or
+validation errors, 2 when an input cannot be read or the arguments are wrong.
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from decimal import InvalidOperation
+
+from nacha import dollars_to_cents, write_nacha_file
+from nacha_bulk import BulkInputError, build_bulk_batches, load_bulk_csv, load_bulk_json
+from nacha_json import iter_json_records, to_ndjson
+from nacha_multi import expand_sources, iter_file_summaries, merge_summary, new_combined_summary
+from nacha_parallel import parse_nacha_parallel
+from nacha_split import merge_nacha, split_nacha
+from nacha_sqlite import connect, export_nacha_file
+from nacha_validate import validate_nacha
+
+logger = logging.getLogger(__name__)
+
+EXIT_OK = 0
+EXIT_INVALID = 1
+EXIT_ERROR = 2
+
+def _json_default(value):
+    # Compact EntryDetail objects
+    return value.to_dict()
+
+def _emit(item):
+    sys.stdout.write(json.dumps(item, separators=(',', ':'), default=_json_default) + '\n')
+    sys.stdout.flush()
+
+def _run_each(func, args_list, workers):
+    """Call func(*args) for each args tuple across a process pool, yielding results in input order."""
+    workers = min(workers or os.cpu_count() or 1, max(len(args_list), 1))
+    if workers == 1:
+        for args in args_list:
+            yield func(*args)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(func, *zip(*args_list))
+
+def _parse_file(path, workers, compact):
+    messages = []
+    try:
+        data = parse_nacha_parallel(path, workers=workers, compact=compact,
+                                    on_message=lambda category, message: messages.append({'category': category, 'message': message}))
+    except (OSError, UnicodeDecodeError) as e:
+        return {'file': path, 'error': str(e)}
+    return {'file': path, 'data': data, 'messages': messages}
+
+def _validate_file(path):
+    try:
+        with open(path, 'rb') as f:
+            return {'file': path, 'report': validate_nacha(f)}
+    except (OSError, UnicodeDecodeError) as e:
+        return {'file': path, 'error': str(e)}
+
+def _export_file(path, output_dir, summary_only):
+    output = os.path.join(output_dir, os.path.basename(path) + '.ndjson')
+    error_count = 0
+    try:
+        with open(path, 'rb') as f, open(output, 'wb') as out:
+            for item in iter_json_records(f, summary=summary_only):
+                if item['type'] == 'error':
+                    error_count += 1
+                out.write(to_ndjson(item))
+    except (OSError, UnicodeDecodeError) as e:
+        return {'file': path, 'error': str(e)}
+    return dict(item, file=path, output=output, error_count=error_count)
+
+def _analyze_file(path, bins, outlier_threshold):
+    from nacha_columnar import analyze_nacha
+    try:
+        with open(path, 'rb') as f:
+            return dict(analyze_nacha(f, histogram_bins=bins, outlier_threshold=outlier_threshold), file=path)
+    except OSError as e:
+        return {'file': path, 'error': str(e)}
+
+def _exit_code(result, invalid):
+    if 'error' in result:
+        return EXIT_ERROR
+    return EXIT_INVALID if invalid else EXIT_OK
+
+def cmd_parse(args):
+    # A single file is split across the workers; several files get one worker each
+    per_file_workers = args.workers if len(args.files) == 1 else 1
+    jobs = [(path, per_file_workers, args.compact) for path in args.files]
+    status = EXIT_OK
+    for result in _run_each(_parse_file, jobs, 1 if len(args.files) == 1 else args.workers):
+        _emit(result)
+        status = max(status, _exit_code(result, any(m['category'] == 'error' for m in result.get('messages', ()))))
+    return status
+
+def cmd_validate(args):
+    status = EXIT_OK
+    for result in _run_each(_validate_file, [(path,) for path in args.files], args.workers):
+        _emit(result)
+        status = max(status, _exit_code(result, 'report' in result and not result['report']['valid']))
+    return status
+
+def cmd_summarize(args):
+    sources = expand_sources([(path, path) for path in args.files])
+    summaries = {}
+    for summary in iter_file_summaries(sources, args.workers):
+        summaries[summary['name']] = summary
+    combined = new_combined_summary()
+    status = EXIT_OK
+    for name, _, _ in sources:
+        summary = summaries[name]
+        merge_summary(combined, summary)
+        _emit(summary)
+        status = max(status, _exit_code(summary, summary.get('error_count')))
+    _emit(combined)
+    return status
+
+def cmd_generate(args):
+    bulk_format = (args.format or os.path.splitext(args.input)[1].lstrip('.')).lower()
+    if bulk_format not in ('json', 'csv'):
+        logger.error("Unsupported input format; use a .csv or .json file or --format")
+        return EXIT_ERROR
+    now = datetime.datetime.now()
+    effective_entry_date = args.effective_date or (now + datetime.timedelta(days=1)).strftime('%y%m%d')
+    try:
+        with open(args.input, 'rb') as f:
+            if bulk_format == 'json':
+                raw_file_header, raw_batches = load_bulk_json(f)
+            else:
+                raw_batches = load_bulk_csv(f)
+                raw_file_header = {}
+        if args.header:
+            with open(args.header) as f:
+                raw_file_header = json.load(f)
+    except (OSError, BulkInputError, json.JSONDecodeError) as e:
+        logger.error(f"Could not read input: {e}")
+        return EXIT_ERROR
+
+    file_header, all_batches_data, errors = build_bulk_batches(raw_file_header, raw_batches, now, effective_entry_date)
+    if errors:
+        _emit({'file': args.input, 'errors': errors})
+        return EXIT_INVALID
+
+    if args.output in (None, '-'):
+        written = write_nacha_file(file_header, all_batches_data, sys.stdout.buffer)
+        sys.stdout.buffer.flush()
+    else:
+        with open(args.output, 'wb') as out:
+            written = write_nacha_file(file_header, all_batches_data, out)
+        _emit({'file': args.input, 'output': args.output, 'bytes': written,
+               'batch_count': len(all_batches_data), 'entry_count': sum(len(b['entries']) for b in all_batches_data)})
+    return EXIT_OK
+
+def _export_sqlite(args):
+    # One writer: files are loaded in turn, each in its own transaction
+    status = EXIT_OK
+    conn = connect(args.sqlite)
+    try:
+        for path in args.files:
+            try:
+                result = export_nacha_file(conn, path)
+            except (OSError, UnicodeDecodeError) as e:
+                result = {'file': path, 'error': str(e)}
+            _emit(result)
+            status = max(status, _exit_code(result, result.get('error_count')))
+    finally:
+        conn.close()
+    return status
+
+def cmd_export(args):
+    if args.sqlite:
+        return _export_sqlite(args)
+    status = EXIT_OK
+    if args.output_dir is None:
+        # Records of every file in turn to stdout, tagged with their file
+        for path in args.files:
+            error_count = 0
+            try:
+                with open(path, 'rb') as f:
+                    for item in iter_json_records(f, summary=args.summary):
+                        if item['type'] == 'error':
+                            error_count += 1
+                        item['file'] = path
+                        _emit(item)
+            except (OSError, UnicodeDecodeError) as e:
+                result = {'file': path, 'error': str(e)}
+                _emit(result)
+                status = max(status, _exit_code(result, False))
+                continue
+            status = max(status, EXIT_INVALID if error_count else EXIT_OK)
+        return status
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    jobs = [(path, args.output_dir, args.summary) for path in args.files]
+    for result in _run_each(_export_file, jobs, args.workers):
+        _emit(result)
+        status = max(status, _exit_code(result, result.get('error_count')))
+    return status
+
+def cmd_analyze(args):
+    # Imported here so that the other subcommands do not pay for importing NumPy
+    from nacha_columnar import HAVE_NUMPY
+    if not HAVE_NUMPY:
+        logger.error("analyze needs NumPy; install it with 'pip install numpy'")
+        return EXIT_ERROR
+    status = EXIT_OK
+    jobs = [(path, args.bins, args.outlier_threshold) for path in args.files]
+    for result in _run_each(_analyze_file, jobs, args.workers):
+        _emit(result)
+        status = max(status, _exit_code(result, 'totals' in result and result['totals']['invalid_count']))
+    return status
+
+def _collect_messages(messages):
+    return lambda category, message: messages.append({'category': category, 'message': message})
+
+def cmd_split(args):
+    if not (args.max_entries or args.max_amount or args.by_batch):
+        logger.error("Give --max-entries, --max-amount or --by-batch")
+        return EXIT_ERROR
+    messages = []
+    os.makedirs(args.output_dir, exist_ok=True)
+    prefix = args.prefix or os.path.splitext(os.path.basename(args.file))[0]
+    try:
+        with open(args.file, 'rb') as f:
+            outputs = split_nacha(f, args.output_dir, prefix, args.max_entries, args.max_amount, args.by_batch,
+                                  on_message=_collect_messages(messages))
+    except (OSError, UnicodeDecodeError) as e:
+        result = {'file': args.file, 'error': str(e)}
+        _emit(result)
+        return _exit_code(result, False)
+    _emit({'file': args.file, 'outputs': outputs, 'messages': messages})
+    return _exit_code({}, any(m['category'] == 'error' for m in messages))
+
+def cmd_merge(args):
+    messages = []
+    file_header = None
+    try:
+        if args.header:
+            with open(args.header) as f:
+                file_header = json.load(f)
+        with open(args.output, 'wb') as out:
+            result = merge_nacha(args.files, out, file_header, on_message=_collect_messages(messages))
+    except (OSError, UnicodeDecodeError, json.JSONDecodeError) as e:
+        result = {'output': args.output, 'error': str(e)}
+        _emit(result)
+        return _exit_code(result, False)
+    _emit(dict(result, output=args.output, files=args.files, messages=messages))
+    return _exit_code({}, any(m['category'] == 'error' for m in messages))
+
+def _positive_cents(value):
+    """argparse type for a dollar amount: returns integer cents, so a bad value is a usage error (exit 2)."""
+    try:
+        cents = dollars_to_cents(value)
+    except (InvalidOperation, ValueError, OverflowError):
+        raise argparse.ArgumentTypeError(f"{value!r} is not a dollar amount")
+    if cents <= 0:
+        raise argparse.ArgumentTypeError(f"{value!r} must be more than 0.00")
+    return cents
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='nacha_cli', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_workers(subparser):
+        subparser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+
+    p = subparsers.add_parser('parse', help='parse files into the grouped File Header / Batches / File Control structure')
+    p.add_argument('files', nargs='+')
+    p.add_argument('--compact', action='store_true', help='hold entries in compact objects while parsing')
+    add_workers(p)
+    p.set_defaults(func=cmd_parse)
+
+    p = subparsers.add_parser('validate', help='check control totals, entry hashes, counts and check digits')
+    p.add_argument('files', nargs='+')
+    add_workers(p)
+    p.set_defaults(func=cmd_validate)
+
+    p = subparsers.add_parser('summarize', help='entry counts and debit/credit totals per file and combined')
+    p.add_argument('files', nargs='+', help='NACHA files or ZIP archives of them')
+    add_workers(p)
+    p.set_defaults(func=cmd_summarize)
+
+    p = subparsers.add_parser('generate', help='generate a NACHA file from bulk CSV or JSON input')
+    p.add_argument('input')
+    p.add_argument('--format', choices=('csv', 'json'), help='input format (default: from the file extension)')
+    p.add_argument('--header', help='JSON file of file header fields (CSV input has no file header of its own)')
+    p.add_argument('--effective-date', help='default effective entry date, YYMMDD (default: tomorrow)')
+    p.add_argument('-o', '--output', help='output file (default: stdout)')
+    p.set_defaults(func=cmd_generate)
+
+    p = subparsers.add_parser('export', help='export records as NDJSON, the same format as /api/parse')
+    p.add_argument('files', nargs='+')
+    destination = p.add_mutually_exclusive_group()
+    destination.add_argument('-o', '--output-dir', help='write <name>.ndjson per file here instead of to stdout')
+    destination.add_argument('--sqlite', metavar='DB', help='load the files into this SQLite database (already loaded files are skipped)')
+    p.add_argument('--summary', action='store_true', help='headers, controls, warnings/errors and the summary only')
+    add_workers(p)
+    p.set_defaults(func=cmd_export)
+
+    p = subparsers.add_parser('split', help='split a file by entry count, amount or batch, recomputing the controls')
+    p.add_argument('file')
+    p.add_argument('-o', '--output-dir', required=True)
+    p.add_argument('--prefix', help='output file name prefix (default: the input name)')
+    p.add_argument('--max-entries', type=int, help='entries per file')
+    p.add_argument('--max-amount', type=_positive_cents, help='debits plus credits per file, in dollars')
+    p.add_argument('--by-batch', action='store_true', help='one file per batch')
+    p.set_defaults(func=cmd_split)
+
+    p = subparsers.add_parser('merge', help='merge files into one, renumbering batches and recomputing the controls')
+    p.add_argument('files', nargs='+')
+    p.add_argument('-o', '--output', required=True)
+    p.add_argument('--header', help='JSON file of file header fields (default: the first file\'s File Header)')
+    p.set_defaults(func=cmd_merge)
+
+    p = subparsers.add_parser('analyze', help='columnar totals, entry hashes, amount histogram and outliers (needs NumPy)')
+    p.add_argument('files', nargs='+')
+    p.add_argument('--bins', type=int, default=20, help='amount histogram bins')
+    p.add_argument('--outlier-threshold', type=float, default=6.0, help='scaled MADs from the median amount')
+    add_workers(p)
+    p.set_defaults(func=cmd_analyze)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=os.environ.get('NACHA_LOG_LEVEL', 'WARNING').upper(), stream=sys.stderr)
+    return args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""Columnar reconciliation analytics over the entries of a NACHA file, using NumPy.
+
+load_entry_columns reads a file into one uint8 array and finds its records
+from the newline positions, or every 94 bytes in a blocked file. The amount, transaction code, RDFI and batch
+index of every Entry Detail record are then gathered into NumPy arrays in
+bulk, straight from the fixed-width bytes, without parsing records one at a
+time in Python. analyze_columns computes these from the arrays with
+vectorized group-bys:
+
+- batch and file totals
+- entry hashes
+- totals by transaction code
+- an amount histogram
+- median/MAD outlier checks
+
+Amounts are int64 cents throughout, so every total is exact.
+
+NumPy is optional (pip install numpy); HAVE_NUMPY tells whether it is
+available, and the functions raise RuntimeError without it.
+"""
+from nacha import BLOCKED_PROBE_SIZE, NACHA_RECORD_LENGTH, RECORD_LAYOUTS, TRANSACTION_TYPES, is_blocked
+from nacha_validate import ENTRY_HASH_MODULUS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAVE_NUMPY = np is not None
+
+DEFAULT_HISTOGRAM_BINS = 20
+# Entries further than this many scaled MADs from the median amount are outliers
+DEFAULT_OUTLIER_THRESHOLD = 6.0
+MAX_REPORTED_OUTLIERS = 100
+# Scales the median absolute deviation to a standard deviation for normally distributed amounts
+_MAD_SCALE = 1.4826
+
+_ENTRY_FIELDS = RECORD_LAYOUTS['6'].slices
+_BATCH_FIELDS = RECORD_LAYOUTS['5'].slices
+# Transaction types by two-digit code: 1 debit, 2 credit, 0 anything else
+_TYPE_CODES = {'Debit': 1, 'Credit': 2}
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("Columnar analytics need NumPy; install it with 'pip install numpy'")
+
+def _digits(buf, starts, field):
+    """Return (values, valid) for a numeric field of the records starting at starts."""
+    values = np.zeros(len(starts), dtype=np.int64)
+    valid = np.ones(len(starts), dtype=bool)
+    # One column of the field at a time, so each step is a flat gather
+    for position in range(field.start, field.stop):
+        digit = buf[starts + position] - np.uint8(ord('0'))
+        valid &= digit <= 9
+        values = values * 10 + digit
+    return values, valid
+
+def _line_bounds(buf, data):
+    """Return the (starts, ends) byte offsets of every line, ends excluding the newline.
+
+    A blocked file (see nacha.is_blocked) is cut into 94-byte records instead.
+    """
+    size = len(buf)
+    if is_blocked(data[:BLOCKED_PROBE_SIZE], size <= BLOCKED_PROBE_SIZE):
+        end = size
+        while end and buf[end - 1] in (ord('\n'), ord('\r')):
+            end -= 1
+        starts = np.arange(0, end, NACHA_RECORD_LENGTH, dtype=np.int64)
+        return starts, np.minimum(starts + NACHA_RECORD_LENGTH, end)
+    newline_count = data.count(b'\n')
+    first = data.find(b'\n')
+    if first >= 0:
+        # Fast path: when every line is as wide as the first, the newlines sit at
+        # fixed positions and the line offsets need no scan
+        width = first + 1
+        positions = buf[width - 1::width]
+        if len(positions) == newline_count and (positions == ord('\n')).all():
+            starts = np.arange(0, size, width, dtype=np.int64)
+            return starts, np.minimum(starts + width - 1, size)
+    newlines = np.flatnonzero(buf == ord('\n'))
+    starts = np.concatenate(([0], newlines + 1)).astype(np.int64)
+    ends = np.concatenate((newlines, [size])).astype(np.int64)
+    return starts, ends
+
+def load_entry_columns(data):
+    """Load the Entry Detail fields of a NACHA file (bytes or a binary file-like object) into arrays.
+
+    Returns a dict of equal-length arrays: 'amount_cents', 'transaction_code',
+    'rdfi', 'batch_index' and 'line' (1-based line numbers), 'entry_starts'
+    (byte offsets into 'buffer', the file as a uint8 array), 'batches', the
+    Batch Header fields for each batch index, 'invalid_lines', the line
+    numbers of Entry Detail records that are too short or have non-numeric
+    amounts, codes or RDFIs, and 'outside_batch_lines', the line numbers of
+    Entry Detail records outside any batch. Those are skipped, as the parser
+    skips them: an entry is in a batch when the last Batch Header or Batch
+    Control record before it is a Batch Header.
+    """
+    _require_numpy()
+    if hasattr(data, 'read'):
+        data = data.read()
+    buf = np.frombuffer(data, dtype=np.uint8)
+    starts, ends = _line_bounds(buf, data)
+    keep = starts < len(buf)
+    starts, ends, line_numbers = starts[keep], ends[keep], np.flatnonzero(keep) + 1
+    record_types = buf[starts]
+
+    batch_mask = record_types == ord('5')
+    batch_starts = starts[batch_mask]
+    batches = []
+    for start in batch_starts.tolist():
+        record = bytes(buf[start:start + NACHA_RECORD_LENGTH]).decode('utf-8', 'replace')
+        batches.append({
+            'batch_number': record[_BATCH_FIELDS['batch_number']].strip(),
+            'company_identification': record[_BATCH_FIELDS['company_identification']].strip(),
+            'company_name': record[_BATCH_FIELDS['company_name']].strip(),
+            'effective_entry_date': record[_BATCH_FIELDS['effective_entry_date']].strip()
+        })
+
+    entry_mask = record_types == ord('6')
+    # An entry is in a batch when the latest Batch Header/Control before it is a header
+    boundary_mask = batch_mask | (record_types == ord('8'))
+    latest_boundary = np.cumsum(boundary_mask) - 1
+    opens_batch = np.concatenate((batch_mask[boundary_mask], [False]))
+    in_batch = opens_batch[latest_boundary]
+    outside_batch_lines = line_numbers[entry_mask & ~in_batch]
+    entry_mask &= in_batch
+
+    # A line ending in \r\n still holds the full record
+    complete = ends - starts >= NACHA_RECORD_LENGTH
+    invalid_lines = line_numbers[entry_mask & ~complete]
+    entry_starts = starts[entry_mask & complete]
+    entry_lines = line_numbers[entry_mask & complete]
+
+    amounts, amounts_valid = _digits(buf, entry_starts, _ENTRY_FIELDS['amount'])
+    codes, codes_valid = _digits(buf, entry_starts, _ENTRY_FIELDS['transaction_code'])
+    rdfis, rdfis_valid = _digits(buf, entry_starts, _ENTRY_FIELDS['receiving_dfi_identification'])
+    valid = amounts_valid & codes_valid & rdfis_valid
+    invalid_lines = np.sort(np.concatenate((invalid_lines, entry_lines[~valid])))
+
+    return {
+        'amount_cents': amounts[valid],
+        'transaction_code': codes[valid],
+        'rdfi': rdfis[valid],
+        'batch_index': np.searchsorted(batch_starts, entry_starts[valid]) - 1,
+        'line': entry_lines[valid],
+        'entry_starts': entry_starts[valid],
+        'buffer': buf,
+        'batches': batches,
+        'invalid_lines': invalid_lines,
+        'outside_batch_lines': outside_batch_lines
+    }
+
+def _type_table():
+    table = np.zeros(100, dtype=np.int8)
+    for code, (transaction_type, _) in TRANSACTION_TYPES.items():
+        table[int(code)] = _TYPE_CODES.get(transaction_type, 0)
+    return table
+
+def _group_sums(groups, values, size):
+    sums = np.zeros(size, dtype=np.int64)
+    np.add.at(sums, groups, values)
+    return sums
+
+def _histogram(amounts, bins):
+    if not len(amounts):
+        return {'edges_cents': [], 'counts': []}
+    edges = np.unique(np.linspace(amounts.min(), amounts.max() + 1, bins + 1).astype(np.int64))
+    counts, _ = np.histogram(amounts, bins=edges)
+    return {'edges_cents': edges.tolist(), 'counts': counts.tolist()}
+
+def _outliers(columns, threshold, max_reported):
+    amounts = columns['amount_cents']
+    if not len(amounts):
+        return {'median_cents': None, 'mad_cents': None, 'count': 0, 'entries': []}
+    median = np.median(amounts)
+    mad = np.median(np.abs(amounts - median))
+    if mad:
+        flagged = np.flatnonzero(np.abs(amounts - median) > threshold * _MAD_SCALE * mad)
+    else:
+        # More than half the amounts are identical; anything else stands out
+        flagged = np.flatnonzero(amounts != median)
+    buf = columns['buffer']
+    trace = _ENTRY_FIELDS['trace_number']
+    entries = []
+    for i in flagged[:max_reported].tolist():
+        start = int(columns['entry_starts'][i])
+        entries.append({
+            'line': int(columns['line'][i]),
+            'batch_index': int(columns['batch_index'][i]),
+            'trace_number': bytes(buf[start + trace.start:start + trace.stop]).decode('utf-8', 'replace').strip(),
+            'amount_cents': int(amounts[i])
+        })
+    return {'median_cents': int(median), 'mad_cents': int(mad), 'count': int(len(flagged)), 'entries': entries}
+
+def analyze_columns(columns, histogram_bins=DEFAULT_HISTOGRAM_BINS, outlier_threshold=DEFAULT_OUTLIER_THRESHOLD,
+                    max_outliers=MAX_REPORTED_OUTLIERS):
+    """Compute batch/file totals, entry hashes, per-code totals, a histogram and outliers from load_entry_columns."""
+    _require_numpy()
+    amounts = columns['amount_cents']
+    codes = columns['transaction_code']
+    groups = columns['batch_index']
+    batches = columns['batches']
+    size = len(batches)
+
+    types = _type_table()[codes]
+    debits = np.where(types == 1, amounts, 0)
+    credits = np.where(types == 2, amounts, 0)
+
+    entry_counts = np.bincount(groups, minlength=size)
+    batch_debits = _group_sums(groups, debits, size)
+    batch_credits = _group_sums(groups, credits, size)
+    batch_hashes = _group_sums(groups, columns['rdfi'], size)
+
+    by_code = {}
+    code_counts = np.bincount(codes, minlength=100)
+    code_sums = _group_sums(codes, amounts, 100)
+    for code in np.flatnonzero(code_counts).tolist():
+        key = f"{code:02d}"
+        transaction_type, entry_class = TRANSACTION_TYPES[key]
+        by_code[key] = {'entry_count': int(code_counts[code]), 'amount_cents': int(code_sums[code]),
+                        'transaction_type': transaction_type, 'entry_class': entry_class}
+
+    return {
+        'totals': {
+            'entry_count': int(len(amounts)),
+            'debit_cents': int(debits.sum()),
+            'credit_cents': int(credits.sum()),
+            'entry_hash': int(columns['rdfi'].sum()) % ENTRY_HASH_MODULUS,
+            'invalid_count': int(len(columns['invalid_lines'])),
+            'outside_batch_count': int(len(columns['outside_batch_lines']))
+        },
+        'batches': [
+            dict(batch, entry_count=int(entry_counts[i]), debit_cents=int(batch_debits[i]), credit_cents=int(batch_credits[i]),
+                 entry_hash=int(batch_hashes[i]) % ENTRY_HASH_MODULUS)
+            for i, batch in enumerate(batches)
+        ],
+        'by_transaction_code': by_code,
+        'histogram': _histogram(amounts, histogram_bins),
+        'outliers': _outliers(columns, outlier_threshold, max_outliers),
+        'invalid_lines': columns['invalid_lines'][:max_outliers].tolist(),
+        'outside_batch_lines': columns['outside_batch_lines'][:max_outliers].tolist()
+    }
+
+def analyze_nacha(data, **options):
+    """Load a NACHA file (bytes or a binary file-like object) into columns and analyze it."""
+    return analyze_columns(load_entry_columns(data), **options)
@@ -0,0 +1,68 @@
+"""Bounded, aggregated parse diagnostics.
+
+ParseDiagnostics collects the parser's warnings and errors grouped by kind
+(short line, orphan addenda, parse exception, ...). Each kind keeps a count,
+its first message and the line numbers of its first few occurrences, and
+only a fixed number of kinds are tracked, so memory stays the same however
+many bad lines a file has. Its add method has the on_message(category,
+message) signature used by group_nacha_records.
+
+With max_errors set, the diagnostics are marked as stopped once that many
+errors have been seen and iter_nacha_records stops reading the file.
+"""
+DEFAULT_SAMPLE_LINES = 10
+DEFAULT_MAX_KINDS = 50
+OTHER_KIND = 'other'
+
+class ParseDiagnostics:
+    """Warning and error counts per kind, with the first line numbers of each."""
+
+    def __init__(self, max_errors=None, sample_lines=DEFAULT_SAMPLE_LINES, max_kinds=DEFAULT_MAX_KINDS):
+        self.max_errors = max_errors
+        self.sample_lines = sample_lines
+        self.max_kinds = max_kinds
+        self.kinds = {}
+        self.warning_count = 0
+        self.error_count = 0
+        self.stopped_at = None
+
+    @property
+    def stopped(self):
+        return self.stopped_at is not None
+
+    def add(self, category, message):
+        """Record one message; messages from the parser carry .kind and .line_number."""
+        kind = getattr(message, 'kind', None) or f"parse_{category}"
+        line_number = getattr(message, 'line_number', None)
+        if category == 'error':
+            self.error_count += 1
+        else:
+            self.warning_count += 1
+
+        group = self.kinds.get(kind)
+        if group is None:
+            if len(self.kinds) >= self.max_kinds:
+                kind = OTHER_KIND
+                group = self.kinds.get(kind)
+            if group is None:
+                group = self.kinds[kind] = {'kind': kind, 'category': category, 'count': 0, 'lines': [], 'message': str(message)}
+        group['count'] += 1
+        if category == 'error':
+            group['category'] = 'error'
+        if line_number is not None and len(group['lines']) < self.sample_lines:
+            group['lines'].append(line_number)
+
+        if category == 'error' and self.max_errors and self.error_count >= self.max_errors and self.stopped_at is None:
+            self.stopped_at = line_number or 0
+
+    def report(self):
+        """Return the diagnostics as a plain dict, kinds ordered by count."""
+        return {
+            'warning_count': self.warning_count,
+            'error_count': self.error_count,
+            'stopped_early': self.stopped,
+            'stopped_at_line': self.stopped_at,
+            'max_errors': self.max_errors,
+            'kinds': sorted((dict(group, lines=list(group['lines'])) for group in self.kinds.values()),
+                            key=lambda group: -group['count'])
+        }
@@ -0,0 +1,224 @@
+"""Entry-level diff of two NACHA files, keyed on batch number and trace number.
+
+Both files are streamed through iter_nacha_records. The original's entries
+go into a hash index keyed on (batch number, trace number); the corrected
+file is then matched against it in one pass, so the diff is O(n). Entries
+only in the corrected file are 'added', entries left in the index are
+'removed' and matched entries whose fields (or addenda) differ are
+'changed'. Entry counts and debit/credit totals are kept per batch for both
+files to report the per-batch deltas.
+
+Files estimated to have more entries than max_memory_entries are first
+partitioned by trace number into spill files on disk, and each partition is
+diffed on its own, which bounds the size of the index.
+"""
+import math
+import os
+import pickle
+import tempfile
+import zlib
+
+from nacha import NACHA_RECORD_LENGTH, ParseMessage, determine_transaction_type, format_cents, iter_nacha_records
+
+DEFAULT_MAX_MEMORY_ENTRIES = 500000
+MAX_REPORTED_ERRORS = 100
+
+DIFF_FIELDS = (
+    'transaction_code', 'receiving_dfi_identification', 'check_digit', 'dfi_account_number', 'amount',
+    'individual_identification_number', 'individual_name', 'discretionary_data', 'addenda_record_indicator', 'addenda'
+)
+_AMOUNT = DIFF_FIELDS.index('amount')
+
+def iter_keyed_entries(stream, on_message=None):
+    """Yield (batch_number, trace_number, fields, line_number) for every entry of a NACHA file.
+
+    fields follows DIFF_FIELDS, with the amount in integer cents and the
+    addenda as a tuple of their payment related information. Entries outside
+    a batch are skipped with a warning, as group_nacha_records skips them;
+    warnings and errors go to on_message(category, message) when given.
+    """
+    batch_number = None
+    pending = None
+    for event, line_number, record in iter_nacha_records(stream, compact=True):
+        if event == 'addenda':
+            if pending is not None:
+                pending[4].append(record['payment_related_info'])
+            continue
+        if pending is not None:
+            yield pending[0], pending[1], pending[2] + (tuple(pending[4]),), pending[3]
+            pending = None
+        if event == 'entry':
+            if batch_number is None:
+                if on_message:
+                    on_message('warning', ParseMessage(f"Warning: Entry Detail record (line {line_number}) found outside a batch. Skipping.",
+                                                       'entry_outside_batch', line_number))
+                continue
+            fields = (record.transaction_code, record.receiving_dfi_identification, record.check_digit,
+                      record.dfi_account_number, record.amount_cents, record.individual_identification_number,
+                      record.individual_name, record.discretionary_data, record.addenda_record_indicator)
+            pending = (batch_number, record.trace_number, fields, line_number, [])
+        elif event == 'batch_header':
+            batch_number = record['batch_number'].lstrip('0') or '0'
+        elif event == 'batch_control':
+            batch_number = None
+        elif event in ('warning', 'error') and on_message:
+            on_message(event, record)
+    if pending is not None:
+        yield pending[0], pending[1], pending[2] + (tuple(pending[4]),), pending[3]
+
+def _display(name, value):
+    if name == 'amount':
+        return format_cents(value)
+    if name == 'addenda':
+        return list(value)
+    return value
+
+def _entry_item(kind, batch_number, trace_number, fields, line_number):
+    item = {'type': kind, 'batch': batch_number, 'trace_number': trace_number, 'line': line_number}
+    item.update((name, _display(name, value)) for name, value in zip(DIFF_FIELDS, fields))
+    return item
+
+def _count(batches, batch_number, side, fields):
+    totals = batches.setdefault(batch_number, {
+        'old': {'entry_count': 0, 'debit_cents': 0, 'credit_cents': 0},
+        'new': {'entry_count': 0, 'debit_cents': 0, 'credit_cents': 0}
+    })[side]
+    totals['entry_count'] += 1
+    transaction_type, _ = determine_transaction_type(fields[0])
+    if transaction_type == 'Debit':
+        totals['debit_cents'] += fields[_AMOUNT]
+    elif transaction_type == 'Credit':
+        totals['credit_cents'] += fields[_AMOUNT]
+
+def _diff_entries(old_entries, new_entries, batches):
+    index = {}
+    for batch_number, trace_number, fields, line_number in old_entries:
+        _count(batches, batch_number, 'old', fields)
+        # A list per key, so repeated trace numbers are matched in file order
+        index.setdefault((batch_number, trace_number), []).append((fields, line_number))
+
+    for batch_number, trace_number, fields, line_number in new_entries:
+        _count(batches, batch_number, 'new', fields)
+        key = (batch_number, trace_number)
+        matches = index.get(key)
+        if not matches:
+            yield _entry_item('added', batch_number, trace_number, fields, line_number)
+            continue
+        old_fields, old_line = matches.pop(0)
+        if not matches:
+            del index[key]
+        if old_fields != fields:
+            yield {
+                'type': 'changed',
+                'batch': batch_number,
+                'trace_number': trace_number,
+                'old_line': old_line,
+                'line': line_number,
+                'changes': {
+                    name: [_display(name, old), _display(name, new)]
+                    for name, old, new in zip(DIFF_FIELDS, old_fields, fields) if old != new
+                }
+            }
+
+    for (batch_number, trace_number), matches in index.items():
+        for fields, line_number in matches:
+            yield _entry_item('removed', batch_number, trace_number, fields, line_number)
+
+class _ErrorCollector:
+    """Keeps the first MAX_REPORTED_ERRORS parser errors of one file as diff items and counts the rest."""
+
+    def __init__(self, side):
+        self.side = side
+        self.count = 0
+        self.items = []
+
+    def __call__(self, category, message):
+        if category != 'error':
+            return
+        self.count += 1
+        if len(self.items) < MAX_REPORTED_ERRORS:
+            self.items.append({'type': 'error', 'file': self.side, 'line': getattr(message, 'line_number', None),
+                               'message': str(message)})
+
+def _spill(path, directory, prefix, partitions, on_message=None):
+    """Write a file's keyed entries into `partitions` pickle streams, split by trace number."""
+    outputs = [open(os.path.join(directory, f"{prefix}.{i}"), 'wb') for i in range(partitions)]
+    try:
+        with open(path, 'rb') as f:
+            for entry in iter_keyed_entries(f, on_message):
+                pickle.dump(entry, outputs[zlib.crc32(entry[1].encode('utf-8')) % partitions], pickle.HIGHEST_PROTOCOL)
+    finally:
+        for out in outputs:
+            out.close()
+
+def _load_spilled(path):
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+def _batch_item(batch_number, sides):
+    old, new = sides['old'], sides['new']
+    return {
+        'type': 'batch',
+        'batch': batch_number,
+        'old_entry_count': old['entry_count'],
+        'new_entry_count': new['entry_count'],
+        'entry_count_delta': new['entry_count'] - old['entry_count'],
+        'old_total_debit': format_cents(old['debit_cents']),
+        'new_total_debit': format_cents(new['debit_cents']),
+        'debit_delta': format_cents(new['debit_cents'] - old['debit_cents']),
+        'old_total_credit': format_cents(old['credit_cents']),
+        'new_total_credit': format_cents(new['credit_cents']),
+        'credit_delta': format_cents(new['credit_cents'] - old['credit_cents'])
+    }
+
+def _batch_sort_key(batch_number):
+    return (0, int(batch_number), '') if batch_number.isdigit() else (1, 0, batch_number)
+
+def iter_nacha_diff(old_path, new_path, max_memory_entries=DEFAULT_MAX_MEMORY_ENTRIES, spill_dir=None):
+    """Diff two NACHA files on disk, yielding 'added', 'removed' and 'changed' items,
+    then one 'batch' item per batch with the count and amount deltas, then a 'summary'.
+
+    Parser errors in either file (a garbled line is otherwise just a missing
+    entry) follow the entry items as 'error' items with the 'file' ('original'
+    or 'corrected'), 'line' and 'message'; the summary's 'error_count' counts
+    them all, although only the first MAX_REPORTED_ERRORS per file are listed.
+    """
+    batches = {}
+    counts = {'added': 0, 'removed': 0, 'changed': 0}
+    old_errors = _ErrorCollector('original')
+    new_errors = _ErrorCollector('corrected')
+    estimated_entries = max(os.path.getsize(old_path), os.path.getsize(new_path)) // (NACHA_RECORD_LENGTH + 1)
+    partitions = math.ceil(estimated_entries / max_memory_entries) if max_memory_entries else 1
+
+    if partitions <= 1:
+        with open(old_path, 'rb') as old, open(new_path, 'rb') as new:
+            for item in _diff_entries(iter_keyed_entries(old, old_errors), iter_keyed_entries(new, new_errors), batches):
+                counts[item['type']] += 1
+                yield item
+    else:
+        with tempfile.TemporaryDirectory(prefix='nacha_diff_', dir=spill_dir) as directory:
+            _spill(old_path, directory, 'old', partitions, old_errors)
+            _spill(new_path, directory, 'new', partitions, new_errors)
+            for i in range(partitions):
+                old_entries = _load_spilled(os.path.join(directory, f"old.{i}"))
+                new_entries = _load_spilled(os.path.join(directory, f"new.{i}"))
+                for item in _diff_entries(old_entries, new_entries, batches):
+                    counts[item['type']] += 1
+                    yield item
+
+    yield from old_errors.items
+    yield from new_errors.items
+
+    changed_batches = 0
+    for batch_number in sorted(batches, key=_batch_sort_key):
+        item = _batch_item(batch_number, batches[batch_number])
+        if item['old_entry_count'] != item['new_entry_count'] or item['debit_delta'] != '0.00' or item['credit_delta'] != '0.00':
+            changed_batches += 1
+        yield item
+
+    yield dict(counts, type='summary', batch_count=len(batches), changed_batch_count=changed_batches,
+               error_count=old_errors.count + new_errors.count, partitions=max(partitions, 1))
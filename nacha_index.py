@@ -0,0 +1,261 @@
+"""Persistent byte-offset index over a NACHA file for random access.
+
+build_index scans a file once and writes a sidecar next to the other indexes,
+named after the SHA-256 of the file content. The sidecar holds two sorted
+tables of fixed-size records:
+
+    batches: batch number, Batch Header offset, Batch Control offset
+    entries: trace number, Entry Detail offset, Batch Header offset
+
+Offsets are stored plus one so that 0 means "none". NachaIndex binary-searches
+the memory-mapped sidecar and seeks straight to the record in the data file,
+so a lookup reads a handful of records instead of parsing the whole file.
+Lookups refresh the modification time of both files, and cleanup_index_dir
+removes indexes that have not been used for longer than a TTL.
+"""
+import bisect
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import time
+
+from nacha import NACHA_RECORD_LENGTH, RECORD_LAYOUTS, NachaDecodeError, parse_entry_detail
+from nacha_mmap import MappedNachaFile
+
+logger = logging.getLogger(__name__)
+
+INDEX_MAGIC = b'NACHAIDX'
+INDEX_VERSION = 1
+_HEADER = struct.Struct('<8sIQQ')
+_ROW = struct.Struct('<QQQ')
+# Longest line we expect to read back when following a record to its addenda
+_MAX_LINE_LENGTH = 4096
+# The file is checked to be UTF-8 in pieces of about this size, cut at line or record boundaries
+_CHECK_CHUNK_SIZE = NACHA_RECORD_LENGTH * 10000
+
+def file_sha256(path):
+    """Return the hex SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def index_path(index_dir, file_hash):
+    return os.path.join(index_dir, f"{file_hash}.idx")
+
+def touch_index(data_path, index_dir, file_hash):
+    """Mark an indexed file as just used, so cleanup_index_dir keeps it."""
+    for path in (index_path(index_dir, file_hash), data_path):
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+def cleanup_index_dir(index_dir, ttl_seconds):
+    """Remove indexed files, their sidecars and stray uploads unused for longer than ttl_seconds."""
+    cutoff = time.time() - ttl_seconds
+    try:
+        with os.scandir(index_dir) as it:
+            entries = [(entry.name, entry.path) for entry in it if entry.is_file()]
+    except FileNotFoundError:
+        return
+    for name, path in entries:
+        try:
+            expired = os.path.getmtime(path) < cutoff
+        except FileNotFoundError:
+            continue
+        if not expired:
+            continue
+        if name.endswith('.idx'):
+            # The sidecar goes first: lookups treat a hash without one as unknown
+            _remove(path)
+            _remove(os.path.join(index_dir, name[:-len('.idx')] + '.ach'))
+        elif name.endswith('.ach'):
+            # A data file expires with its sidecar, or on its own if it has none
+            if os.path.exists(os.path.join(index_dir, name[:-len('.ach')] + '.idx')):
+                continue
+            _remove(path)
+        elif name.endswith(('.upload', '.tmp')):
+            _remove(path)
+        else:
+            continue
+        logger.debug(f"Removed expired index file {name}")
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def _check_utf8(nacha_file):
+    """Raise NachaDecodeError for the first line of a mapped file that is not valid UTF-8."""
+    buf = nacha_file.buffer
+    size = len(buf)
+    start = 0
+    while start < size:
+        chunk = bytes(buf[start:start + _CHECK_CHUNK_SIZE])
+        if start + len(chunk) < size and not nacha_file.blocked:
+            # Cut after a line break, so no character is split between pieces
+            chunk = chunk[:chunk.rfind(b'\n') + 1] or chunk
+        try:
+            chunk.decode('utf-8')
+        except UnicodeDecodeError as e:
+            offset = start + e.start
+            if nacha_file.blocked:
+                line_start = offset - offset % NACHA_RECORD_LENGTH
+                line_number = line_start // NACHA_RECORD_LENGTH + 1
+                line = bytes(buf[line_start:line_start + NACHA_RECORD_LENGTH])
+            else:
+                head = bytes(buf[:offset])
+                line_start = head.rfind(b'\n') + 1
+                line_number = head.count(b'\n') + 1
+                line = bytes(buf[line_start:offset + _MAX_LINE_LENGTH]).split(b'\n', 1)[0]
+            raise NachaDecodeError(line_number, UnicodeDecodeError(
+                'utf-8', line, offset - line_start, offset - line_start + 1, e.reason)) from None
+        start += len(chunk)
+
+def build_index(path, index_dir, file_hash=None):
+    """Index the batches and entries of a NACHA file and return its content hash.
+
+    An existing sidecar for the same content is reused.
+    """
+    batches = []
+    entries = []
+    with MappedNachaFile(path) as nacha_file:
+        if file_hash is None:
+            file_hash = hashlib.sha256(nacha_file.buffer).hexdigest()
+        sidecar = index_path(index_dir, file_hash)
+        if os.path.exists(sidecar):
+            return file_hash
+        _check_utf8(nacha_file)
+
+        current_batch = None
+        for view in nacha_file:
+            record_type = view.record_type
+            if record_type == '6':
+                trace_number = view.trace_number
+                if not trace_number.isdigit():
+                    logger.warning(f"Line {view.line_number}: trace number {trace_number!r} is not numeric, not indexed")
+                    continue
+                batch_offset = current_batch[1] if current_batch else 0
+                entries.append((int(trace_number), view.offset + 1, batch_offset))
+            elif record_type == '5':
+                batch_number = view['batch_number']
+                current_batch = [int(batch_number) if batch_number.isdigit() else 0, view.offset + 1, 0]
+                batches.append(current_batch)
+            elif record_type == '8' and current_batch:
+                current_batch[2] = view.offset + 1
+                current_batch = None
+
+    batches.sort()
+    entries.sort()
+    os.makedirs(index_dir, exist_ok=True)
+    tmp_path = f"{sidecar}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as out:
+        out.write(_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(batches), len(entries)))
+        for row in batches:
+            out.write(_ROW.pack(*row))
+        for row in entries:
+            out.write(_ROW.pack(*row))
+    os.replace(tmp_path, sidecar)
+    logger.debug(f"Indexed {len(batches)} batches and {len(entries)} entries of {path}")
+    return file_hash
+
+class _RowKeys:
+    """Sequence of the first column of a packed row table, for bisect."""
+
+    def __init__(self, buf, start, count):
+        self._buf = buf
+        self._start = start
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        return _ROW.unpack_from(self._buf, self._start + i * _ROW.size)[0]
+
+    def row(self, i):
+        return _ROW.unpack_from(self._buf, self._start + i * _ROW.size)
+
+class NachaIndex:
+    """Random access to the batches and entries of an indexed NACHA file."""
+
+    def __init__(self, data_path, sidecar_path):
+        self._data = open(data_path, 'rb')
+        with open(sidecar_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, batch_count, entry_count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            self.close()
+            raise ValueError(f"{sidecar_path} is not a version {INDEX_VERSION} NACHA index")
+        self.batch_count = batch_count
+        self.entry_count = entry_count
+        self._batches = _RowKeys(self._mmap, _HEADER.size, batch_count)
+        self._entries = _RowKeys(self._mmap, _HEADER.size + batch_count * _ROW.size, entry_count)
+
+    @classmethod
+    def open(cls, data_path, index_dir, file_hash):
+        return cls(data_path, index_path(index_dir, file_hash))
+
+    def _matches(self, table, key):
+        i = bisect.bisect_left(table, key)
+        while i < len(table) and table[i] == key:
+            yield table.row(i)
+            i += 1
+
+    def _read_line(self, offset):
+        self._data.seek(offset)
+        raw = self._data.readline(_MAX_LINE_LENGTH)
+        if not raw.endswith(b'\n'):
+            # Unterminated (blocked) file: records are back to back
+            raw = raw[:NACHA_RECORD_LENGTH]
+        line = raw.rstrip(b'\r\n')[:NACHA_RECORD_LENGTH].decode('utf-8')
+        return line, offset + len(raw)
+
+    def _read_batch_records(self, header_offset, control_offset):
+        header_line, _ = self._read_line(header_offset - 1)
+        batch = {'Batch Header': RECORD_LAYOUTS['5'].decode(header_line), 'Batch Control': {}}
+        if control_offset:
+            control_line, _ = self._read_line(control_offset - 1)
+            batch['Batch Control'] = RECORD_LAYOUTS['8'].decode(control_line)
+        return batch
+
+    def find_entries(self, trace_number):
+        """Return every entry with this trace number, with its addenda and batch header."""
+        results = []
+        for _, entry_offset, batch_offset in self._matches(self._entries, int(trace_number)):
+            line, next_offset = self._read_line(entry_offset - 1)
+            entry = parse_entry_detail(line)
+            while True:
+                line, following = self._read_line(next_offset)
+                if not line.startswith('7'):
+                    break
+                entry.setdefault('Addenda', []).append(RECORD_LAYOUTS['7'].decode(line))
+                next_offset = following
+            result = {'Entry': entry, 'offset': entry_offset - 1}
+            if batch_offset:
+                header_line, _ = self._read_line(batch_offset - 1)
+                result['Batch Header'] = RECORD_LAYOUTS['5'].decode(header_line)
+            results.append(result)
+        return results
+
+    def find_batches(self, batch_number):
+        """Return the header and control records of every batch with this batch number."""
+        return [
+            dict(self._read_batch_records(header_offset, control_offset), offset=header_offset - 1)
+            for _, header_offset, control_offset in self._matches(self._batches, int(batch_number))
+        ]
+
+    def close(self):
+        self._mmap.close()
+        self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
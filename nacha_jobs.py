@@ -0,0 +1,203 @@
+"""Background parsing of large uploads with progress polling.
+
+An upload is spooled to disk under the jobs directory and handed to a
+bounded pool of worker threads; the caller gets a job id straight away.
+Each job keeps its state in a small status file next to the spooled upload,
+so any gunicorn worker on the host can report progress:
+
+    <jobs_dir>/<job_id>/status.json    state, bytes/records processed
+    <jobs_dir>/<job_id>/upload.ach     the spooled upload (removed once parsed)
+    <jobs_dir>/<job_id>/result.pickle  grouped parse result, validation report and diagnostics
+
+Finished and failed jobs are removed once they are older than the TTL, and
+so are queued or running jobs whose status has not changed for a whole TTL,
+e.g. because the process running them was restarted or killed.
+"""
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from nacha import CountingReader, group_nacha_records, iter_nacha_records
+from nacha_diagnostics import ParseDiagnostics
+from nacha_validate import NachaValidator, validate_events
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 8
+DEFAULT_TTL_SECONDS = 3600
+# Status files are rewritten at most this often while a job runs
+PROGRESS_INTERVAL_RECORDS = 10000
+SPOOL_CHUNK_SIZE = 1024 * 1024
+FINISHED_STATES = ('done', 'failed')
+
+class JobQueueFull(Exception):
+    """Raised when the queue already holds its maximum number of pending jobs."""
+
+class JobQueue:
+    """Bounded pool of background parse jobs backed by a jobs directory."""
+
+    def __init__(self, directory, workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING,
+                 ttl_seconds=DEFAULT_TTL_SECONDS, compact=False, max_errors=None):
+        self.directory = directory
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self.compact = compact
+        self.max_errors = max_errors
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='nacha-job')
+        self._pending = 0
+        # Jobs queued or running in this process, never removed as stale
+        self._active = set()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _job_dir(self, job_id):
+        return os.path.join(self.directory, job_id)
+
+    def _write_status(self, job_id, status):
+        status['updated'] = time.time()
+        job_dir = self._job_dir(job_id)
+        fd, tmp_path = tempfile.mkstemp(dir=job_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(status, f)
+        os.replace(tmp_path, os.path.join(job_dir, 'status.json'))
+
+    def status(self, job_id):
+        """Return a job's status dict, or None if there is no such job."""
+        try:
+            with open(os.path.join(self._job_dir(job_id), 'status.json')) as f:
+                status = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        status['progress'] = round(status['bytes_processed'] / status['total_bytes'], 4) if status['total_bytes'] else None
+        return status
+
+    def result(self, job_id):
+        """Return the stored result of a finished job, or None if it has been removed."""
+        try:
+            with open(os.path.join(self._job_dir(job_id), 'result.pickle'), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+    def submit(self, stream, filename):
+        """Spool an upload to disk and queue it for parsing; return the job id."""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFull(f"{self._pending} jobs are already waiting")
+            self._pending += 1
+            self._active.add(job_id)
+
+        try:
+            self.cleanup_expired()
+            job_dir = self._job_dir(job_id)
+            os.makedirs(job_dir)
+            digest = hashlib.sha256()
+            total_bytes = 0
+            with open(os.path.join(job_dir, 'upload.ach'), 'wb') as out:
+                for chunk in iter(lambda: stream.read(SPOOL_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    out.write(chunk)
+                    total_bytes += len(chunk)
+            self._write_status(job_id, {
+                'id': job_id,
+                'state': 'queued',
+                'filename': filename,
+                'file_hash': digest.hexdigest(),
+                'total_bytes': total_bytes,
+                'bytes_processed': 0,
+                'records_processed': 0,
+                'created': time.time()
+            })
+            self._executor.submit(self._run, job_id)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+                self._active.discard(job_id)
+            raise
+        logger.info(f"Queued parse job {job_id} for {filename} ({total_bytes} bytes)")
+        return job_id
+
+    def _run(self, job_id):
+        job_dir = self._job_dir(job_id)
+        status = self.status(job_id)
+        status['state'] = 'running'
+        status['started'] = time.time()
+        self._write_status(job_id, status)
+        upload_path = os.path.join(job_dir, 'upload.ach')
+
+        def track_progress(events, reader):
+            count = 0
+            for item in events:
+                count += 1
+                if count % PROGRESS_INTERVAL_RECORDS == 0:
+                    status['records_processed'] = count
+                    status['bytes_processed'] = reader.bytes_read
+                    self._write_status(job_id, status)
+                yield item
+            status['records_processed'] = count
+
+        try:
+            validator = NachaValidator()
+            diagnostics = ParseDiagnostics(max_errors=self.max_errors)
+            with open(upload_path, 'rb') as f:
+                reader = CountingReader(f)
+                events = validate_events(iter_nacha_records(reader, compact=self.compact, diagnostics=diagnostics), validator)
+                data = group_nacha_records(track_progress(events, reader), on_message=diagnostics.add)
+            data['Validation'] = validator.report(truncated=diagnostics.stopped)
+            data['Diagnostics'] = diagnostics.report()
+            with open(os.path.join(job_dir, 'result.pickle'), 'wb') as out:
+                pickle.dump({'data': data}, out, protocol=pickle.HIGHEST_PROTOCOL)
+            status['state'] = 'done'
+            status['bytes_processed'] = status['total_bytes']
+        except Exception as e:
+            logger.error(f"Parse job {job_id} failed: {e}", exc_info=True)
+            status['state'] = 'failed'
+            status['error'] = str(e)
+        finally:
+            status['finished'] = time.time()
+            self._write_status(job_id, status)
+            try:
+                os.remove(upload_path)
+            except FileNotFoundError:
+                pass
+            with self._lock:
+                self._pending -= 1
+                self._active.discard(job_id)
+
+    def cleanup_expired(self):
+        """Remove jobs whose status has not changed for longer than the TTL.
+
+        Finished jobs expire after the TTL. Queued and running jobs of this
+        process are kept; those of other processes expire the same way, since
+        a running job updates its status as it makes progress.
+        """
+        cutoff = time.time() - self.ttl_seconds
+        with os.scandir(self.directory) as it:
+            job_ids = [entry.name for entry in it if entry.is_dir()]
+        with self._lock:
+            job_ids = [job_id for job_id in job_ids if job_id not in self._active]
+        for job_id in job_ids:
+            status = self.status(job_id)
+            if status is None:
+                # Half-created or unreadable job: judge it by the directory's age
+                try:
+                    expired = os.path.getmtime(self._job_dir(job_id)) < cutoff
+                except FileNotFoundError:
+                    continue
+            else:
+                expired = status['updated'] < cutoff
+                if expired and status['state'] not in FINISHED_STATES:
+                    logger.warning(f"Removing parse job {job_id}, {status['state']} without progress since {time.ctime(status['updated'])}")
+            if expired:
+                shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+                logger.debug(f"Removed expired parse job {job_id}")
@@ -0,0 +1,80 @@
+"""JSON / NDJSON output of parsed NACHA records.
+
+iter_json_records turns the iter_nacha_records event stream into plain
+JSON-ready dicts, one per record, ending with a summary object that carries
+the file totals and the parse throughput. Nothing is accumulated apart from
+running totals, so memory does not grow with the size of the file.
+"""
+import json
+import time
+
+from nacha import DEFAULT_CHUNK_SIZE, CountingReader, entry_amount_cents, format_cents, iter_nacha_records
+
+SUMMARY_EVENTS = frozenset(['file_header', 'batch_header', 'batch_control', 'file_control', 'warning', 'error'])
+
+def iter_json_records(stream, summary=False, chunk_size=DEFAULT_CHUNK_SIZE, diagnostics=None):
+    """Yield one dict per record of a NACHA file, then a final 'summary' dict.
+
+    Record dicts look like {'type': 'entry', 'line': 3, 'batch': 0, 'data': {...}};
+    warnings and errors carry 'message' instead of 'data'. With summary=True
+    only headers, controls, warnings/errors and the summary are yielded.
+    With a ParseDiagnostics as diagnostics, warnings and errors are collected
+    there instead of yielded and the summary carries its report.
+    """
+    reader = CountingReader(stream)
+    started = time.perf_counter()
+    batch_index = -1
+    batch_count = 0
+    entry_count = 0
+    addenda_count = 0
+    total_debit_cents = 0
+    total_credit_cents = 0
+
+    for event, line_number, record in iter_nacha_records(reader, chunk_size, diagnostics=diagnostics):
+        if event == 'entry':
+            entry_count += 1
+            if record['transaction_type'] == 'Debit':
+                total_debit_cents += entry_amount_cents(record)
+            else:
+                total_credit_cents += entry_amount_cents(record)
+        elif event == 'addenda':
+            addenda_count += 1
+        elif event == 'batch_header':
+            batch_index += 1
+            batch_count += 1
+        elif event == 'padding':
+            continue
+        elif event in ('warning', 'error') and diagnostics is not None:
+            diagnostics.add(event, record)
+            continue
+
+        if summary and event not in SUMMARY_EVENTS:
+            continue
+        item = {'type': event, 'line': line_number}
+        if event in ('entry', 'addenda', 'batch_header', 'batch_control'):
+            item['batch'] = batch_index
+        if event in ('warning', 'error'):
+            item['message'] = record
+        else:
+            item['data'] = record
+        yield item
+
+    elapsed = time.perf_counter() - started
+    result = {
+        'type': 'summary',
+        'batch_count': batch_count,
+        'entry_count': entry_count,
+        'addenda_count': addenda_count,
+        'total_debit_amount': format_cents(total_debit_cents),
+        'total_credit_amount': format_cents(total_credit_cents),
+        'bytes': reader.bytes_read,
+        'elapsed_seconds': round(elapsed, 6),
+        'mb_per_s': round(reader.bytes_read / elapsed / 1e6, 3) if elapsed > 0 else None
+    }
+    if diagnostics is not None:
+        result['diagnostics'] = diagnostics.report()
+    yield result
+
+def to_ndjson(item):
+    """Encode one record dict as an NDJSON line."""
+    return (json.dumps(item, separators=(',', ':')) + '\n').encode('utf-8')
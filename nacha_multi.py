@@ -0,0 +1,106 @@
+"""Totals across many NACHA files, parsed in parallel.
+
+Each uploaded file, or each member of an uploaded ZIP archive, is summarized
+in its own worker process with aggregate_nacha, one streaming pass that
+keeps only entry counts and debit/credit totals (integer cents) by company,
+SEC code and transaction type. ZIP members are read straight from the
+archive on disk, so neither an archive nor its files are held in memory.
+Summaries come back as each file finishes and merge_summary folds them into
+the combined totals.
+"""
+import logging
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from nacha_summary import aggregate_nacha
+
+logger = logging.getLogger(__name__)
+
+def _merge_totals(target, source):
+    for key, value in source.items():
+        if key in ('entry_count', 'debit_cents', 'credit_cents'):
+            target[key] += value
+        else:
+            target.setdefault(key, value)
+
+def summarize_nacha(stream, name=''):
+    """Summarize one NACHA file from a binary file-like object in a single streaming pass."""
+    summary = aggregate_nacha(stream)
+    summary['name'] = name
+    return summary
+
+def merge_summary(combined, summary):
+    """Add one file summary into a combined summary (as made by new_combined_summary)."""
+    combined['file_count'] += 1
+    if 'error' in summary:
+        combined['failed_count'] += 1
+        return
+    for key in ('batch_count', 'warning_count', 'error_count'):
+        combined[key] += summary[key]
+    _merge_totals(combined['totals'], summary['totals'])
+    for group in ('by_company', 'by_sec_code', 'by_transaction_type'):
+        for key, totals in summary[group].items():
+            _merge_totals(combined[group].setdefault(key, dict(totals, entry_count=0, debit_cents=0, credit_cents=0)), totals)
+
+def new_combined_summary():
+    return {
+        'name': 'All files',
+        'file_count': 0,
+        'failed_count': 0,
+        'batch_count': 0,
+        'warning_count': 0,
+        'error_count': 0,
+        'totals': {'entry_count': 0, 'debit_cents': 0, 'credit_cents': 0},
+        'by_company': {},
+        'by_sec_code': {},
+        'by_transaction_type': {}
+    }
+
+def expand_sources(saved_files):
+    """Turn [(filename, path)] uploads into [(name, path, zip_member)] sources, one per NACHA file.
+
+    ZIP archives contribute one source per file member; unreadable archives
+    are returned as (name, path, None) and reported when summarized.
+    """
+    sources = []
+    for filename, path in saved_files:
+        if not filename.lower().endswith('.zip'):
+            sources.append((filename, path, None))
+            continue
+        try:
+            with zipfile.ZipFile(path) as archive:
+                members = [info.filename for info in archive.infolist() if not info.is_dir()]
+        except zipfile.BadZipFile:
+            logger.warning(f"{filename} is not a valid ZIP archive")
+            sources.append((filename, path, None))
+            continue
+        sources.extend((f"{filename}/{member}", path, member) for member in members)
+    return sources
+
+def _summarize_source(name, path, member):
+    try:
+        if member is None:
+            with open(path, 'rb') as f:
+                return summarize_nacha(f, name)
+        with zipfile.ZipFile(path) as archive, archive.open(member) as f:
+            return summarize_nacha(f, name)
+    except Exception as e:
+        return {'name': name, 'error': str(e)}
+
+# Workers are started from a clean server process rather than forked from the caller, which in the web
+# app may have JobQueue threads holding locks (logging's, for one) that a forked child would inherit held
+_MP_CONTEXT = multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+def iter_file_summaries(sources, workers=None):
+    """Summarize each (name, path, zip_member) source across a process pool, yielding summaries as they finish."""
+    workers = min(workers or os.cpu_count() or 1, max(len(sources), 1))
+    if workers == 1:
+        for source in sources:
+            yield _summarize_source(*source)
+        return
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_MP_CONTEXT) as pool:
+        futures = [pool.submit(_summarize_source, *source) for source in sources]
+        for future in as_completed(futures):
+            yield future.result()
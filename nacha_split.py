@@ -0,0 +1,181 @@
+"""Streaming split and merge of NACHA files.
+
+Files are read batch by batch with iter_batches and written back through
+write_nacha_file, which recomputes every Batch Control and File Control
+record (counts, entry hashes, debit/credit totals), the block count and the
+'9' padding. Only the batch being moved is held in memory, never a whole
+file.
+
+split_nacha cuts a file into several files by entry count, total amount or
+one batch per file; a batch that does not fit is continued in the next file
+under the same Batch Header. merge_nacha appends the batches of several files
+under one File Header and renumbers them from 1.
+"""
+import logging
+import os
+
+from nacha import ParseMessage, entry_amount_cents, iter_nacha_records, write_nacha_file
+
+logger = logging.getLogger(__name__)
+
+# File ID modifiers in the order they are used for files sent on the same day
+FILE_ID_MODIFIERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+
+def iter_batches(stream, on_message=None):
+    """Yield (file_header, {'batch_header', 'entries'}) for each batch of a NACHA file.
+
+    Entries are parsed entries with their addenda under 'Addenda'. Entries
+    outside any batch are skipped, as group_nacha_records skips them, and
+    reported to on_message(category, message) with the parser's warnings and
+    errors.
+    """
+    file_header = {}
+    batch = None
+    entries = None
+    for event, line_number, record in iter_nacha_records(stream, compact=True):
+        if event == 'entry':
+            if batch is None:
+                if on_message:
+                    on_message('warning', ParseMessage(f"Warning: Entry Detail record (line {line_number}) found outside a batch. Skipping.",
+                                                       'entry_outside_batch', line_number))
+                entries = None
+                continue
+            entries = batch['entries']
+            entries.append(record)
+        elif event == 'addenda':
+            if entries:
+                if entries[-1].addenda is None:
+                    entries[-1].addenda = []
+                entries[-1].addenda.append(record)
+        elif event == 'batch_header':
+            if batch is not None:
+                yield file_header, batch
+            batch = {'batch_header': record, 'entries': []}
+            entries = None
+        elif event == 'batch_control':
+            yield file_header, batch
+            batch = None
+            entries = None
+        elif event == 'file_header':
+            file_header = record
+        elif event in ('warning', 'error') and on_message:
+            on_message(event, record)
+    if batch is not None:
+        if on_message:
+            on_message('warning', "Warning: Last batch found without a Batch Control Record.")
+        yield file_header, batch
+
+def _file_id_modifier(first, index):
+    start = FILE_ID_MODIFIERS.find(first.upper())
+    return FILE_ID_MODIFIERS[(max(start, 0) + index) % len(FILE_ID_MODIFIERS)]
+
+def _iter_split_pieces(batches, max_entries, max_amount_cents, by_batch):
+    """Yield (starts_new_file, batch) pieces, cutting batches where a file would exceed the limits."""
+    file_entries = 0
+    file_cents = 0
+    starts_new_file = True
+    for _, batch in batches:
+        if by_batch and (file_entries or not starts_new_file):
+            starts_new_file = True
+            file_entries = file_cents = 0
+        piece = []
+        for entry in batch['entries']:
+            cents = entry_amount_cents(entry)
+            if file_entries and ((max_entries and file_entries + 1 > max_entries) or
+                                 (max_amount_cents and file_cents + cents > max_amount_cents)):
+                if piece:
+                    yield starts_new_file, {'batch_header': batch['batch_header'], 'entries': piece}
+                    piece = []
+                starts_new_file = True
+                file_entries = file_cents = 0
+            if max_amount_cents and cents > max_amount_cents:
+                logger.warning(f"Entry {entry['trace_number']} alone exceeds the amount limit; written to a file of its own")
+            piece.append(entry)
+            file_entries += 1
+            file_cents += cents
+        if piece or not batch['entries']:
+            yield starts_new_file, {'batch_header': batch['batch_header'], 'entries': piece}
+            starts_new_file = False
+
+def split_nacha(stream, output_dir, prefix='split', max_entries=None, max_amount_cents=None, by_batch=False,
+                on_message=None):
+    """Split a NACHA file into files of at most max_entries entries and max_amount_cents
+    (debits plus credits), or one file per batch with by_batch=True.
+
+    Every output keeps the original File Header with the File ID Modifier
+    advanced per file (A, B, C, ...). Returns [{'path', 'batch_count',
+    'entry_count', 'amount_cents', 'bytes'}] for the written files.
+    """
+    batches = iter_batches(stream, on_message)
+    first = next(batches, None)
+    if first is None:
+        return []
+    file_header = first[0]
+
+    def all_batches():
+        yield first
+        yield from batches
+
+    pieces = _iter_split_pieces(all_batches(), max_entries, max_amount_cents, by_batch)
+    pending = next(pieces, None)
+    outputs = []
+
+    while pending is not None:
+        stats = {'batch_count': 0, 'entry_count': 0, 'amount_cents': 0}
+
+        def file_batches():
+            nonlocal pending
+            piece = pending[1]
+            while True:
+                stats['batch_count'] += 1
+                stats['entry_count'] += len(piece['entries'])
+                stats['amount_cents'] += sum(entry_amount_cents(entry) for entry in piece['entries'])
+                yield piece
+                pending = next(pieces, None)
+                if pending is None or pending[0]:
+                    return
+                piece = pending[1]
+
+        index = len(outputs)
+        if index == len(FILE_ID_MODIFIERS):
+            logger.warning(f"More than {len(FILE_ID_MODIFIERS)} output files; File ID Modifiers will repeat")
+        path = os.path.join(output_dir, f"{prefix}_{index + 1:03d}.ach")
+        header = dict(file_header, file_id_modifier=_file_id_modifier(file_header.get('file_id_modifier', 'A'), index))
+        with open(path, 'wb') as out:
+            written = write_nacha_file(header, file_batches(), out)
+        outputs.append(dict(stats, path=path, bytes=written))
+        logger.info(f"Wrote {path}: {stats['entry_count']} entries in {stats['batch_count']} batches")
+    return outputs
+
+def read_file_header(path):
+    """Return the File Header record of a NACHA file on disk, or {} if it has none."""
+    with open(path, 'rb') as f:
+        for event, _, record in iter_nacha_records(f, compact=True):
+            if event == 'file_header':
+                return record
+            if event in ('batch_header', 'entry'):
+                break
+    return {}
+
+def merge_nacha(paths, out, file_header=None, on_message=None):
+    """Merge the batches of several NACHA files on disk into one file written to out.
+
+    The File Header is file_header, or the first file's. Batches are
+    renumbered from 1 in merge order. Returns {'batch_count', 'entry_count',
+    'bytes'}.
+    """
+    stats = {'batch_count': 0, 'entry_count': 0}
+
+    def merged_batches():
+        for path in paths:
+            with open(path, 'rb') as f:
+                for _, batch in iter_batches(f, on_message):
+                    stats['batch_count'] += 1
+                    stats['entry_count'] += len(batch['entries'])
+                    batch['batch_header'] = dict(batch['batch_header'], batch_number=str(stats['batch_count']).zfill(7))
+                    yield batch
+
+    if file_header is None:
+        file_header = read_file_header(paths[0]) if paths else {}
+    written = write_nacha_file(file_header, merged_batches(), out)
+    return dict(stats, bytes=written)
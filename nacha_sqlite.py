@@ -0,0 +1,254 @@
+"""Export of parsed NACHA files into an indexed SQLite database.
+
+Each file is streamed through iter_nacha_records and its headers, entries and
+addenda are inserted with executemany in groups of INSERT_BATCH_ROWS, all in
+one transaction per file, so a file is either fully loaded or not at all.
+Files are recorded with the SHA-256 of their content and a file that is
+already in the database is skipped. Amounts are stored in integer cents.
+Entries outside a batch are skipped and counted as warnings, so the file
+totals match aggregate_nacha and /api/summary.
+
+    files    (id, sha256, name, size, loaded_at, file header fields, control totals)
+    batches  (id, file_id, batch_index, batch header fields, control totals)
+    entries  (id, file_id, batch_id, line, entry detail fields, amount_cents, transaction_type)
+    addenda  (entry_id, line, type_code, payment_related_info, sequence numbers)
+
+Example: every entry for one company ID over a quarter
+
+    SELECT e.* FROM entries e JOIN batches b ON b.id = e.batch_id
+    WHERE b.company_identification = ? AND b.effective_entry_date BETWEEN '240101' AND '240331'
+"""
+import datetime
+import logging
+import os
+import sqlite3
+
+from nacha import determine_transaction_type, iter_nacha_records
+from nacha_index import file_sha256
+
+logger = logging.getLogger(__name__)
+
+INSERT_BATCH_ROWS = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    sha256 TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    loaded_at TEXT NOT NULL,
+    immediate_destination TEXT,
+    immediate_origin TEXT,
+    immediate_destination_name TEXT,
+    immediate_origin_name TEXT,
+    file_creation_date TEXT,
+    file_creation_time TEXT,
+    file_id_modifier TEXT,
+    batch_count INTEGER,
+    entry_count INTEGER,
+    addenda_count INTEGER,
+    total_debit_cents INTEGER,
+    total_credit_cents INTEGER,
+    warning_count INTEGER,
+    error_count INTEGER
+);
+CREATE TABLE IF NOT EXISTS batches (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    batch_index INTEGER NOT NULL,
+    batch_number TEXT,
+    service_class_code TEXT,
+    company_name TEXT,
+    company_discretionary_data TEXT,
+    company_identification TEXT,
+    standard_entry_class_code TEXT,
+    company_entry_description TEXT,
+    descriptive_date TEXT,
+    effective_entry_date TEXT,
+    settlement_date TEXT,
+    originating_dfi_identification TEXT,
+    entry_count INTEGER,
+    addenda_count INTEGER,
+    total_debit_cents INTEGER,
+    total_credit_cents INTEGER
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    batch_id INTEGER REFERENCES batches(id),
+    line INTEGER NOT NULL,
+    transaction_code TEXT,
+    transaction_type TEXT,
+    receiving_dfi_identification TEXT,
+    check_digit TEXT,
+    dfi_account_number TEXT,
+    amount_cents INTEGER,
+    individual_identification_number TEXT,
+    individual_name TEXT,
+    discretionary_data TEXT,
+    addenda_record_indicator TEXT,
+    trace_number TEXT
+);
+CREATE TABLE IF NOT EXISTS addenda (
+    entry_id INTEGER NOT NULL REFERENCES entries(id),
+    line INTEGER NOT NULL,
+    type_code TEXT,
+    payment_related_info TEXT,
+    addenda_sequence_number TEXT,
+    entry_detail_sequence_number TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_trace_number ON entries (trace_number);
+CREATE INDEX IF NOT EXISTS entries_account_number ON entries (dfi_account_number);
+CREATE INDEX IF NOT EXISTS entries_batch_id ON entries (batch_id);
+CREATE INDEX IF NOT EXISTS addenda_entry_id ON addenda (entry_id);
+CREATE INDEX IF NOT EXISTS batches_company_identification ON batches (company_identification);
+CREATE INDEX IF NOT EXISTS batches_effective_entry_date ON batches (effective_entry_date);
+CREATE INDEX IF NOT EXISTS batches_file_id ON batches (file_id);
+"""
+
+BATCH_COLUMNS = (
+    'batch_number', 'service_class_code', 'company_name', 'company_discretionary_data', 'company_identification',
+    'standard_entry_class_code', 'company_entry_description', 'descriptive_date', 'effective_entry_date',
+    'settlement_date', 'originating_dfi_identification'
+)
+FILE_HEADER_COLUMNS = (
+    'immediate_destination', 'immediate_origin', 'immediate_destination_name', 'immediate_origin_name',
+    'file_creation_date', 'file_creation_time', 'file_id_modifier'
+)
+
+_INSERT_ENTRY = ("INSERT INTO entries (id, file_id, batch_id, line, transaction_code, transaction_type, "
+                 "receiving_dfi_identification, check_digit, dfi_account_number, amount_cents, "
+                 "individual_identification_number, individual_name, discretionary_data, "
+                 "addenda_record_indicator, trace_number) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+_INSERT_ADDENDA = ("INSERT INTO addenda (entry_id, line, type_code, payment_related_info, addenda_sequence_number, "
+                   "entry_detail_sequence_number) VALUES (?, ?, ?, ?, ?, ?)")
+_INSERT_BATCH = (f"INSERT INTO batches (id, file_id, batch_index, {', '.join(BATCH_COLUMNS)}) "
+                 f"VALUES ({', '.join('?' * (len(BATCH_COLUMNS) + 3))})")
+_UPDATE_BATCH = ("UPDATE batches SET entry_count = ?, addenda_count = ?, total_debit_cents = ?, total_credit_cents = ? "
+                 "WHERE id = ?")
+
+def connect(db_path):
+    """Open (creating if needed) an export database with its tables and indexes."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def _next_id(conn, table):
+    return conn.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}").fetchone()[0]
+
+def _new_totals():
+    return {'entry_count': 0, 'addenda_count': 0, 'debit_cents': 0, 'credit_cents': 0}
+
+def _load_records(conn, file_id, stream):
+    """Insert the batches, entries and addenda of one file; return the file totals."""
+    entry_id = _next_id(conn, 'entries') - 1
+    batch_id = _next_id(conn, 'batches') - 1
+    batch_index = -1
+    current_batch = None
+    current_totals = None
+    batch_totals = []
+    entries = []
+    addenda = []
+    header = {}
+    totals = dict(_new_totals(), batch_count=0, warning_count=0, error_count=0)
+
+    def flush():
+        conn.executemany(_INSERT_ENTRY, entries)
+        conn.executemany(_INSERT_ADDENDA, addenda)
+        entries.clear()
+        addenda.clear()
+
+    # Set while the addenda of a skipped entry follow it
+    skipping = False
+    for event, line_number, record in iter_nacha_records(stream, compact=True):
+        if event == 'entry':
+            skipping = current_batch is None
+            if skipping:
+                totals['warning_count'] += 1
+                continue
+            entry_id += 1
+            transaction_type, _ = determine_transaction_type(record.transaction_code)
+            entries.append((
+                entry_id, file_id, current_batch, line_number, record.transaction_code, transaction_type,
+                record.receiving_dfi_identification, record.check_digit, record.dfi_account_number, record.amount_cents,
+                record.individual_identification_number, record.individual_name, record.discretionary_data,
+                record.addenda_record_indicator, record.trace_number
+            ))
+            for scope in (totals, current_totals):
+                scope['entry_count'] += 1
+                if transaction_type == 'Debit':
+                    scope['debit_cents'] += record.amount_cents
+                elif transaction_type == 'Credit':
+                    scope['credit_cents'] += record.amount_cents
+            if len(entries) >= INSERT_BATCH_ROWS:
+                flush()
+
+        elif event == 'addenda':
+            if skipping:
+                continue
+            addenda.append((entry_id, line_number, record['type_code'], record['payment_related_info'],
+                            record['addenda_sequence_number'], record['entry_detail_sequence_number']))
+            totals['addenda_count'] += 1
+            if current_totals is not None:
+                current_totals['addenda_count'] += 1
+            if len(addenda) >= INSERT_BATCH_ROWS:
+                flush()
+
+        elif event == 'batch_header':
+            batch_id += 1
+            batch_index += 1
+            current_batch = batch_id
+            current_totals = _new_totals()
+            totals['batch_count'] += 1
+            batch_totals.append((batch_id, current_totals))
+            conn.execute(_INSERT_BATCH, (batch_id, file_id, batch_index) + tuple(record.get(c) for c in BATCH_COLUMNS))
+
+        elif event == 'batch_control':
+            current_batch = None
+            current_totals = None
+
+        elif event == 'file_header':
+            header = record
+
+        elif event == 'warning':
+            totals['warning_count'] += 1
+        elif event == 'error':
+            totals['error_count'] += 1
+
+    flush()
+    conn.executemany(_UPDATE_BATCH, [
+        (t['entry_count'], t['addenda_count'], t['debit_cents'], t['credit_cents'], bid) for bid, t in batch_totals
+    ])
+    return header, totals
+
+def export_nacha_file(conn, path, name=None):
+    """Load one NACHA file into the database in a single transaction.
+
+    Returns a result dict with 'status' 'loaded' (plus the file totals) or
+    'skipped' when a file with the same content is already loaded.
+    """
+    name = name or os.path.basename(path)
+    file_hash = file_sha256(path)
+    existing = conn.execute("SELECT id FROM files WHERE sha256 = ?", (file_hash,)).fetchone()
+    if existing:
+        logger.info(f"{name} is already loaded as file {existing[0]}; skipping")
+        return {'file': name, 'status': 'skipped', 'file_id': existing[0], 'sha256': file_hash}
+
+    with conn, open(path, 'rb') as f:
+        file_id = conn.execute(
+            "INSERT INTO files (sha256, name, size, loaded_at) VALUES (?, ?, ?, ?)",
+            (file_hash, name, os.path.getsize(path), datetime.datetime.now().isoformat(timespec='seconds'))
+        ).lastrowid
+        header, totals = _load_records(conn, file_id, f)
+        conn.execute(
+            f"UPDATE files SET {', '.join(f'{c} = ?' for c in FILE_HEADER_COLUMNS)}, batch_count = ?, entry_count = ?, "
+            f"addenda_count = ?, total_debit_cents = ?, total_credit_cents = ?, warning_count = ?, error_count = ? WHERE id = ?",
+            tuple(header.get(c) for c in FILE_HEADER_COLUMNS) + (
+                totals['batch_count'], totals['entry_count'], totals['addenda_count'], totals['debit_cents'],
+                totals['credit_cents'], totals['warning_count'], totals['error_count'], file_id
+            )
+        )
+    logger.info(f"Loaded {name} as file {file_id}: {totals['entry_count']} entries in {totals['batch_count']} batches")
+    return dict(totals, file=name, status='loaded', file_id=file_id, sha256=file_hash)
@@ -0,0 +1,128 @@
+"""Summary-only aggregation of a NACHA file.
+
+aggregate_nacha makes one pass over the raw record lines and never builds
+entry dicts or objects: an Entry Detail line contributes only its
+transaction code and amount, sliced straight from the bytes and counted per
+transaction code for the current batch. When a batch closes its per-code
+counts are folded into the batch, company, SEC code, transaction code and
+debit/credit totals, using the precomputed TRANSACTION_TYPES table. Amounts
+are integer cents.
+"""
+from nacha import DEFAULT_CHUNK_SIZE, NACHA_RECORD_LENGTH, RECORD_LAYOUTS, TRANSACTION_TYPES, iter_raw_lines
+
+_BYTE_TRANSACTION_TYPES = {code.encode('ascii'): types for code, types in TRANSACTION_TYPES.items()}
+_UNKNOWN_TRANSACTION = ('Unknown', 'Unknown')
+_ENTRY_AMOUNT = RECORD_LAYOUTS['6'].slices['amount']
+_ENTRY_CODE = RECORD_LAYOUTS['6'].slices['transaction_code']
+
+def _new_totals():
+    return {'entry_count': 0, 'debit_cents': 0, 'credit_cents': 0}
+
+def _add(totals, transaction_type, count, cents):
+    totals['entry_count'] += count
+    if transaction_type == 'Debit':
+        totals['debit_cents'] += cents
+    elif transaction_type == 'Credit':
+        totals['credit_cents'] += cents
+
+def _new_batch(header):
+    return {
+        'batch_number': header.get('batch_number', ''),
+        'company_identification': header.get('company_identification', ''),
+        'company_name': header.get('company_name', ''),
+        'standard_entry_class_code': header.get('standard_entry_class_code', ''),
+        'service_class_code': header.get('service_class_code', ''),
+        'addenda_count': 0,
+        'totals': _new_totals()
+    }
+
+def aggregate_nacha(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Count and total the entries of a NACHA file per batch, company ID, SEC code and transaction code.
+
+    The result has 'batches' (a list, in file order), 'by_company',
+    'by_sec_code', 'by_transaction_code' and 'by_transaction_type' dicts of
+    {'entry_count', 'debit_cents', 'credit_cents'} totals, the file 'totals',
+    and 'warning_count' / 'error_count' for records the full parser would
+    warn about or fail on.
+    """
+    summary = {
+        'batch_count': 0,
+        'warning_count': 0,
+        'error_count': 0,
+        'totals': _new_totals(),
+        'batches': [],
+        'by_company': {},
+        'by_sec_code': {},
+        'by_transaction_code': {},
+        'by_transaction_type': {}
+    }
+    batch = None
+    batch_codes = {}
+    entries_in_scope = 0
+
+    def close_batch():
+        company = summary['by_company'].setdefault(batch['company_identification'],
+                                                   dict(_new_totals(), company_name=batch['company_name']))
+        sec_code = summary['by_sec_code'].setdefault(batch['standard_entry_class_code'], _new_totals())
+        for code, (count, cents) in batch_codes.items():
+            transaction_type, entry_class = _BYTE_TRANSACTION_TYPES.get(code, _UNKNOWN_TRANSACTION)
+            code = code.decode('utf-8', 'replace')
+            by_code = summary['by_transaction_code'].setdefault(
+                code, dict(_new_totals(), transaction_type=transaction_type, entry_class=entry_class))
+            by_type = summary['by_transaction_type'].setdefault(transaction_type, _new_totals())
+            for totals in (batch['totals'], company, sec_code, by_code, by_type, summary['totals']):
+                _add(totals, transaction_type, count, cents)
+        summary['batches'].append(batch)
+        summary['batch_count'] += 1
+        batch_codes.clear()
+
+    for line_number, line in iter_raw_lines(stream, chunk_size):
+        record_type = line[:1]
+        if record_type == b'6':
+            if batch is None:
+                # Entries outside any batch are skipped with a warning, as the parser skips them
+                summary['warning_count'] += 1
+                entries_in_scope += 1
+                continue
+            code = line[_ENTRY_CODE]
+            try:
+                cents = int(line[_ENTRY_AMOUNT])
+            except ValueError:
+                summary['error_count'] += 1
+                continue
+            counter = batch_codes.get(code)
+            if counter is None:
+                batch_codes[code] = [1, cents]
+            else:
+                counter[0] += 1
+                counter[1] += cents
+            entries_in_scope += 1
+
+        elif record_type == b'7':
+            if entries_in_scope:
+                if batch is not None:
+                    batch['addenda_count'] += 1
+            else:
+                summary['warning_count'] += 1
+
+        elif record_type == b'5':
+            if batch is not None:
+                close_batch()
+            try:
+                batch = _new_batch(RECORD_LAYOUTS['5'].decode(line[:NACHA_RECORD_LENGTH].decode('utf-8')))
+            except UnicodeDecodeError:
+                summary['error_count'] += 1
+                batch = _new_batch({})
+            entries_in_scope = 0
+
+        elif record_type == b'8':
+            if batch is None:
+                summary['warning_count'] += 1
+            else:
+                close_batch()
+                batch = None
+            entries_in_scope = 0
+
+    if batch is not None:
+        close_batch()
+    return summary
@@ -0,0 +1,260 @@
+"""Single-pass validation of NACHA control records.
+
+NachaValidator consumes the iter_nacha_records event stream and checks, as
+the records go by:
+
+    entries        RDFI routing check digit, known transaction code
+    batch control  entry/addenda count, entry hash, debit and credit totals,
+                   service class, company ID and batch number vs. the header
+    file control   batch count, entry/addenda count, entry hash, debit and
+                   credit totals, block count
+    structure      missing file header/control, batches without a control,
+                   record count not a multiple of the blocking factor
+
+Only running totals are kept (amounts in integer cents), so memory does not
+grow with the file; the list of reported issues is capped. Use
+validate_events() to check a file while it is being parsed for display, or
+validate_nacha() to only validate.
+"""
+from nacha import DEFAULT_CHUNK_SIZE, determine_transaction_type, entry_amount_cents, format_cents, iter_nacha_records
+
+MAX_REPORTED_ISSUES = 1000
+ENTRY_HASH_MODULUS = 10 ** 10
+_ROUTING_WEIGHTS = (3, 7, 1, 3, 7, 1, 3, 7)
+
+def routing_check_digit(routing_prefix):
+    """Return the check digit for the first 8 digits of a routing number."""
+    total = sum(int(digit) * weight for digit, weight in zip(routing_prefix, _ROUTING_WEIGHTS))
+    return (10 - total % 10) % 10
+
+def _declared_int(value):
+    value = value.strip()
+    return int(value) if value.isdigit() else None
+
+def _declared_cents(value):
+    digits = value.replace('.', '')
+    return int(digits) if digits.isdigit() else None
+
+class _Totals:
+    """Running counts and sums for one batch or the whole file."""
+
+    def __init__(self):
+        self.entry_count = 0
+        self.addenda_count = 0
+        self.entry_hash = 0
+        self.debit_cents = 0
+        self.credit_cents = 0
+
+    def add_entry(self, entry):
+        self.entry_count += 1
+        rdfi = entry['receiving_dfi_identification']
+        if rdfi.isdigit():
+            self.entry_hash += int(rdfi)
+        transaction_type, _ = determine_transaction_type(entry['transaction_code'])
+        if transaction_type == 'Debit':
+            self.debit_cents += entry_amount_cents(entry)
+        elif transaction_type == 'Credit':
+            self.credit_cents += entry_amount_cents(entry)
+
+    def add(self, other):
+        self.entry_count += other.entry_count
+        self.addenda_count += other.addenda_count
+        self.entry_hash += other.entry_hash
+        self.debit_cents += other.debit_cents
+        self.credit_cents += other.credit_cents
+
+class NachaValidator:
+    """Check a NACHA file's records against its declared control totals."""
+
+    def __init__(self, max_issues=MAX_REPORTED_ISSUES):
+        self.max_issues = max_issues
+        self.issues = []
+        self.error_count = 0
+        self.warning_count = 0
+        self.record_count = 0
+        self.batch_count = 0
+        self.blocking_factor = None
+        self.file_control = None
+        self.file_control_line = None
+        self.file_totals = _Totals()
+        self._batch = None
+        self._batch_header = None
+        self._batch_index = -1
+        self._seen_file_header = False
+
+    def _issue(self, severity, code, line_number, message, expected=None, found=None):
+        if severity == 'error':
+            self.error_count += 1
+        else:
+            self.warning_count += 1
+        if len(self.issues) >= self.max_issues:
+            return
+        issue = {'severity': severity, 'code': code, 'line': line_number, 'message': message}
+        if self._batch is not None or code.startswith('batch_'):
+            issue['batch'] = self._batch_index
+        if expected is not None:
+            issue['expected'] = expected
+            issue['found'] = found
+        self.issues.append(issue)
+
+    def _compare(self, code, line_number, label, declared, computed, formatter=str):
+        if declared is None:
+            self._issue('error', code, line_number, f"{label} is not numeric")
+        elif declared != computed:
+            self._issue('error', code, line_number, f"{label} is {formatter(declared)}, records add up to {formatter(computed)}",
+                        expected=formatter(computed), found=formatter(declared))
+
+    def feed(self, event, line_number, record):
+        """Check one (event, line_number, record) tuple from iter_nacha_records."""
+        self.record_count += 1
+
+        if event == 'entry':
+            if self._batch is None:
+                self._issue('error', 'entry_outside_batch', line_number, "Entry Detail record outside a batch")
+                return
+            self._batch.add_entry(record)
+            rdfi = record['receiving_dfi_identification']
+            check_digit = record['check_digit']
+            if not rdfi.isdigit():
+                self._issue('error', 'entry_rdfi', line_number, f"Receiving DFI Identification {rdfi!r} is not numeric")
+            elif not check_digit.isdigit() or int(check_digit) != routing_check_digit(rdfi):
+                self._issue('error', 'entry_check_digit', line_number,
+                            f"Check digit {check_digit!r} does not match routing number {rdfi}",
+                            expected=str(routing_check_digit(rdfi)), found=check_digit)
+            if record['transaction_type'] == 'Unknown':
+                self._issue('warning', 'entry_transaction_code', line_number,
+                            f"Unknown transaction code {record['transaction_code']!r}")
+
+        elif event == 'addenda':
+            if self._batch is not None:
+                self._batch.addenda_count += 1
+
+        elif event == 'batch_header':
+            if self._batch is not None:
+                self._issue('error', 'batch_missing_control', line_number, "Batch Header found before the previous batch's Batch Control")
+                self._close_batch()
+            self._batch_index += 1
+            self._batch = _Totals()
+            self._batch_header = record
+
+        elif event == 'batch_control':
+            if self._batch is None:
+                self._issue('error', 'batch_control_without_header', line_number, "Batch Control record without a Batch Header")
+                return
+            self._check_batch_control(line_number, record)
+            self._close_batch()
+
+        elif event == 'file_header':
+            self._seen_file_header = True
+            self.blocking_factor = _declared_int(record['blocking_factor'])
+            if not self.blocking_factor:
+                self._issue('error', 'file_blocking_factor', line_number, f"Blocking factor {record['blocking_factor']!r} is not a positive number")
+
+        elif event == 'file_control':
+            if self._batch is not None:
+                self._issue('error', 'batch_missing_control', line_number, "File Control found before the last batch's Batch Control")
+                self._close_batch()
+            # Checked in report(), once the padding records are counted; keep the values as declared
+            self.file_control = dict(record)
+            self.file_control_line = line_number
+
+        elif event in ('warning', 'error'):
+            self._issue(event, f"parse_{event}", line_number, record)
+
+    def _close_batch(self):
+        self.file_totals.add(self._batch)
+        self.batch_count += 1
+        self._batch = None
+        self._batch_header = None
+
+    def _check_batch_control(self, line_number, control):
+        batch = self._batch
+        header = self._batch_header
+        self._compare('batch_entry_addenda_count', line_number, "Batch entry/addenda count",
+                      _declared_int(control['entry_addenda_count']), batch.entry_count + batch.addenda_count)
+        self._compare('batch_entry_hash', line_number, "Batch entry hash",
+                      _declared_int(control['entry_hash']), batch.entry_hash % ENTRY_HASH_MODULUS)
+        self._compare('batch_debit_total', line_number, "Batch total debit amount",
+                      _declared_cents(control['total_debit_amount']), batch.debit_cents, format_cents)
+        self._compare('batch_credit_total', line_number, "Batch total credit amount",
+                      _declared_cents(control['total_credit_amount']), batch.credit_cents, format_cents)
+        for name, label in (('service_class_code', 'Service class code'),
+                            ('company_identification', 'Company identification'),
+                            ('batch_number', 'Batch number')):
+            if control[name] != header[name]:
+                self._issue('error', f"batch_{name}", line_number,
+                            f"{label} {control[name]!r} does not match the Batch Header ({header[name]!r})",
+                            expected=header[name], found=control[name])
+
+    def report(self, truncated=False):
+        """Finish validation and return the structured report.
+
+        With truncated=True the records stopped before the end of the file (the
+        parser gave up after too many errors), so the missing-control and
+        blocking checks are skipped and the report is marked 'truncated' and
+        not valid.
+        """
+        if self._batch is not None:
+            if not truncated:
+                self._issue('error', 'batch_missing_control', None, "Last batch has no Batch Control record")
+            self._close_batch()
+        if not self._seen_file_header:
+            self._issue('error', 'file_missing_header', None, "File Header record not found")
+
+        totals = self.file_totals
+        block_count = None
+        if self.blocking_factor:
+            block_count = -(-self.record_count // self.blocking_factor)
+            if self.record_count % self.blocking_factor and not truncated:
+                self._issue('warning', 'file_blocking', None,
+                            f"{self.record_count} records is not a multiple of the blocking factor {self.blocking_factor}")
+
+        control = self.file_control
+        if control is None:
+            if not truncated:
+                self._issue('error', 'file_missing_control', None, "File Control record not found")
+        else:
+            line_number = self.file_control_line
+            self._compare('file_batch_count', line_number, "File batch count", _declared_int(control['batch_count']), self.batch_count)
+            if block_count is not None:
+                self._compare('file_block_count', line_number, "File block count", _declared_int(control['block_count']), block_count)
+            self._compare('file_entry_addenda_count', line_number, "File entry/addenda count",
+                          _declared_int(control['entry_addenda_count']), totals.entry_count + totals.addenda_count)
+            self._compare('file_entry_hash', line_number, "File entry hash",
+                          _declared_int(control['entry_hash']), totals.entry_hash % ENTRY_HASH_MODULUS)
+            self._compare('file_debit_total', line_number, "File total debit amount",
+                          _declared_cents(control['total_debit_amount']), totals.debit_cents, format_cents)
+            self._compare('file_credit_total', line_number, "File total credit amount",
+                          _declared_cents(control['total_credit_amount']), totals.credit_cents, format_cents)
+
+        return {
+            'valid': self.error_count == 0 and not truncated,
+            'truncated': truncated,
+            'error_count': self.error_count,
+            'warning_count': self.warning_count,
+            'issues': self.issues,
+            'issues_truncated': self.error_count + self.warning_count > len(self.issues),
+            'totals': {
+                'record_count': self.record_count,
+                'block_count': block_count,
+                'batch_count': self.batch_count,
+                'entry_count': totals.entry_count,
+                'addenda_count': totals.addenda_count,
+                'entry_hash': totals.entry_hash % ENTRY_HASH_MODULUS,
+                'total_debit_amount': format_cents(totals.debit_cents),
+                'total_credit_amount': format_cents(totals.credit_cents)
+            }
+        }
+
+def validate_events(events, validator):
+    """Pass iter_nacha_records events through unchanged while feeding them to validator."""
+    for item in events:
+        validator.feed(*item)
+        yield item
+
+def validate_nacha(stream, chunk_size=DEFAULT_CHUNK_SIZE, max_issues=MAX_REPORTED_ISSUES):
+    """Validate a NACHA file from a binary file-like object without building the parsed structure."""
+    validator = NachaValidator(max_issues)
+    for event, line_number, record in iter_nacha_records(stream, chunk_size, compact=True):
+        validator.feed(event, line_number, record)
+    return validator.report()
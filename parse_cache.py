@@ -0,0 +1,179 @@
+"""Content-hash keyed cache for parse results, with LRU eviction.
+
+Two backends share the same interface (get/set/stats):
+
+    MemoryCache  in-process, for a single worker
+    FileCache    a directory of pickled values, shared by every gunicorn
+                 worker on the host
+
+Both are bounded by entry count and by approximate size in bytes, evicting
+the least recently used entries first. Hit/miss/eviction counters are kept
+per process.
+"""
+import logging
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 32
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+class _Counters:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def as_dict(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+class MemoryCache:
+    """In-process LRU cache bounded by entry count and total size."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = _Counters()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self._counters.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self._counters.hits += 1
+            return item[0]
+
+    def set(self, key, value, size):
+        """Store value under key; size is its approximate footprint in bytes.
+
+        Returns False, storing nothing, if the value is larger than the whole cache.
+        """
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._items[key] = (value, size)
+            self._bytes += size
+            while len(self._items) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._items.popitem(last=False)
+                self._bytes -= evicted_size
+                self._counters.evictions += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters.as_dict(), backend='memory', entries=len(self._items),
+                        bytes=self._bytes, max_entries=self.max_entries, max_bytes=self.max_bytes)
+
+class FileCache:
+    """LRU cache stored as one pickle file per key in a shared directory.
+
+    Recency is tracked through file modification times, so every process
+    using the directory sees the same LRU order.
+    """
+
+    SUFFIX = '.cache'
+
+    def __init__(self, directory, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._counters = _Counters()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(path)
+        except FileNotFoundError:
+            self._counters.misses += 1
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logger.warning(f"Dropping unreadable cache entry {path}: {e}")
+            self._remove(path)
+            self._counters.misses += 1
+            return None
+        self._counters.hits += 1
+        return value
+
+    def set(self, key, value, size=None):
+        """Store value under key; its size is taken from the pickled file.
+
+        Returns False, storing nothing, if the value is larger than the whole cache.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        if os.path.getsize(tmp_path) > self.max_bytes:
+            self._remove(tmp_path)
+            return False
+        os.replace(tmp_path, self._path(key))
+        self._evict()
+        return True
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(self.SUFFIX):
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_entries or total > self.max_bytes):
+            _, size, path = entries.pop(0)
+            self._remove(path)
+            total -= size
+            self._counters.evictions += 1
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for _, _, path in self._entries():
+            self._remove(path)
+
+    def stats(self):
+        entries = self._entries()
+        return dict(self._counters.as_dict(), backend='file', entries=len(entries),
+                    bytes=sum(size for _, size, _ in entries),
+                    max_entries=self.max_entries, max_bytes=self.max_bytes)
+
+def cache_from_env(environ=os.environ):
+    """Build the cache configured by NACHA_CACHE_DIR / NACHA_CACHE_MAX_ENTRIES / NACHA_CACHE_MAX_BYTES."""
+    max_entries = int(environ.get('NACHA_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+    max_bytes = int(environ.get('NACHA_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+    directory = environ.get('NACHA_CACHE_DIR')
+    if directory:
+        return FileCache(directory, max_entries, max_bytes)
+    return MemoryCache(max_entries, max_bytes)
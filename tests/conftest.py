@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The app reads its configuration from the environment on import
+_scratch = tempfile.mkdtemp(prefix='nacha_tests_')
+os.environ.setdefault('NACHA_LOG_LEVEL', 'WARNING')
+os.environ.setdefault('NACHA_JOBS_DIR', os.path.join(_scratch, 'jobs'))
+os.environ.setdefault('NACHA_INDEX_DIR', os.path.join(_scratch, 'index'))
+
+from benchmarks.synthetic import synthetic_batches, synthetic_file_header
+from nacha import RECORD_LAYOUTS, generate_nacha_file
+
+def nacha_file(batches=2, entries=5, seed=0):
+    """Return a generated NACHA file with consistent control records as (bytes, file_header, batches)."""
+    file_header = synthetic_file_header()
+    all_batches = synthetic_batches(batches, entries, seed=seed)
+    return generate_nacha_file(file_header, all_batches).encode('utf-8'), file_header, all_batches
+
+def tamper_file_control(content):
+    """Return content with its File Control debit and credit totals changed."""
+    lines = content.split(b'\n')
+    i = next(i for i, line in enumerate(lines) if line.startswith(b'9') and line != b'9' * 94)
+    control = RECORD_LAYOUTS['9'].decode(lines[i].decode('utf-8'))
+    control.update(total_debit_amount=123, total_credit_amount=456)
+    lines[i] = RECORD_LAYOUTS['9'].encode(control).encode('utf-8')
+    return b'\n'.join(lines)
+
+@pytest.fixture
+def app():
+    import app as nacha_app
+    nacha_app.app.config['TESTING'] = True
+    nacha_app.parse_cache.clear()
+    yield nacha_app
+    nacha_app.parse_cache.clear()
+
+@pytest.fixture
+def client(app):
+    return app.app.test_client()
@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+from io import BytesIO
+
+import pytest
+
+from nacha_bulk import BATCH_HEADER_COLUMNS
+from nacha_summary import aggregate_nacha
+from nacha_validate import validate_nacha
+from conftest import nacha_file
+
+def _generate(client, name, payload, **form):
+    return client.post('/api/generate', data=dict(form, bulk_file=(BytesIO(payload), name)))
+
+def _json_payload(file_header, batches):
+    return json.dumps({'file_header': file_header, 'batches': batches}).encode('utf-8')
+
+def _csv_payload(batches):
+    out = io.StringIO()
+    columns = list(BATCH_HEADER_COLUMNS) + list(batches[0]['entries'][0])
+    writer = csv.DictWriter(out, columns)
+    writer.writeheader()
+    for batch in batches:
+        for entry in batch['entries']:
+            writer.writerow(dict(batch['batch_header'], **entry))
+    return out.getvalue().encode('utf-8')
+
+def _check_generated(response, batches):
+    assert response.status_code == 200
+    assert validate_nacha(BytesIO(response.data))['valid']
+    summary = aggregate_nacha(BytesIO(response.data))
+    assert summary['batch_count'] == len(batches)
+    assert summary['totals']['entry_count'] == sum(len(batch['entries']) for batch in batches)
+
+def test_bulk_json_generates_a_valid_file(client):
+    _, file_header, batches = nacha_file(batches=2, entries=3)
+    _check_generated(_generate(client, 'bulk.json', _json_payload(file_header, batches)), batches)
+
+def test_bulk_csv_takes_the_file_header_from_the_form(client):
+    _, file_header, batches = nacha_file(batches=2, entries=3)
+    response = _generate(client, 'bulk.csv', _csv_payload(batches), **file_header)
+    _check_generated(response, batches)
+    assert response.data.startswith(b'101 ' + file_header['immediate_destination'].encode())
+
+def test_bulk_errors_are_collected_together(client):
+    _, file_header, batches = nacha_file(batches=2, entries=3)
+    batches[0]['entries'][1]['amount'] = 'abc'
+    batches[1]['entries'][2]['amount'] = '-1.00'
+    batches[1]['batch_header']['originating_dfi_identification'] = '123'
+    response = _generate(client, 'bulk.json', _json_payload(file_header, batches))
+    assert response.status_code == 400
+    errors = response.get_json()['errors']
+    assert len(errors) == 3
+    assert errors[0].startswith('Batch 1, Entry 2: Amount must be')
+    assert errors[1] == 'Batch 2: Originating DFI Identification must be 8 digits.'
+    assert errors[2].startswith('Batch 2, Entry 3: Amount must be')
+
+@pytest.mark.parametrize('payload', [
+    {'file_header': 'oops', 'batches': []},
+    {'batches': [{'batch_header': ['oops'], 'entries': [{}]}]},
+])
+def test_bulk_json_rejects_headers_that_are_not_objects(client, payload):
+    response = _generate(client, 'bulk.json', json.dumps(payload).encode('utf-8'))
+    assert response.status_code == 400
+    assert 'must be an object' in response.get_json()['error']
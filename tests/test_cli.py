@@ -0,0 +1,96 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import nacha_cli
+from nacha_cli import EXIT_INVALID, EXIT_OK
+from conftest import nacha_file, tamper_file_control
+
+def _run(capsys, *argv):
+    """Run the CLI; return (exit status, the JSON lines it wrote to stdout)."""
+    status = nacha_cli.main(list(argv))
+    return status, [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+@pytest.fixture
+def ach_file(tmp_path):
+    path = tmp_path / 'file.ach'
+    path.write_bytes(nacha_file(batches=3, entries=4)[0])
+    return str(path)
+
+def test_validate_reports_tampered_file_control(capsys, tmp_path, ach_file):
+    status, [result] = _run(capsys, 'validate', ach_file)
+    assert status == EXIT_OK and result['report']['valid']
+
+    tampered = tmp_path / 'tampered.ach'
+    with open(ach_file, 'rb') as f:
+        tampered.write_bytes(tamper_file_control(f.read()))
+    status, [result] = _run(capsys, 'validate', str(tampered))
+    assert status == EXIT_INVALID
+    assert {'file_debit_total', 'file_credit_total'} <= {issue['code'] for issue in result['report']['issues']}
+
+def test_parse_totals_the_parsed_entries(capsys, tmp_path, ach_file):
+    tampered = tmp_path / 'tampered.ach'
+    with open(ach_file, 'rb') as f:
+        tampered.write_bytes(tamper_file_control(f.read()))
+    _, [expected] = _run(capsys, 'parse', ach_file)
+    _, [result] = _run(capsys, 'parse', str(tampered))
+    assert result['data']['File Control']['total_debit_amount'] == expected['data']['File Control']['total_debit_amount']
+    assert result['data']['File Control']['total_credit_amount'] == expected['data']['File Control']['total_credit_amount']
+
+@pytest.mark.parametrize('amount', ['NaN', 'Infinity', '-1.00', '1e400', '99999999999'])
+def test_generate_rejects_bad_amounts(capsys, tmp_path, amount):
+    _, file_header, batches = nacha_file(batches=1, entries=2)
+    batches[0]['entries'][1]['amount'] = amount
+    source = tmp_path / 'bulk.json'
+    source.write_text(json.dumps({'file_header': file_header, 'batches': batches}))
+    output = tmp_path / 'out.ach'
+    status, [result] = _run(capsys, 'generate', str(source), '-o', str(output))
+    assert status == EXIT_INVALID
+    assert result['errors'] and result['errors'][0].startswith('Batch 1, Entry 2: Amount must be')
+    assert not output.exists()
+
+def test_export_sqlite_skips_files_already_loaded(capsys, tmp_path, ach_file):
+    import sqlite3
+    db = str(tmp_path / 'nacha.db')
+    status, [first] = _run(capsys, 'export', '--sqlite', db, ach_file)
+    assert status == EXIT_OK and first['status'] == 'loaded'
+    status, [second] = _run(capsys, 'export', '--sqlite', db, ach_file)
+    assert status == EXIT_OK and second['status'] == 'skipped'
+    assert second['file_id'] == first['file_id']
+
+    conn = sqlite3.connect(db)
+    try:
+        counts = [conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in ('files', 'batches', 'entries')]
+    finally:
+        conn.close()
+    assert counts == [1, 3, 12]
+
+def test_analyze_matches_summarize(capsys, ach_file):
+    pytest.importorskip('numpy')
+    _, [summary, _] = _run(capsys, 'summarize', ach_file)
+    _, [analysis] = _run(capsys, 'analyze', ach_file)
+    for key in ('entry_count', 'debit_cents', 'credit_cents'):
+        assert analysis['totals'][key] == summary['totals'][key]
+    assert [b['entry_count'] for b in analysis['batches']] == [b['totals']['entry_count'] for b in summary['batches']]
+
+def test_cli_does_not_import_numpy_until_analyze():
+    code = "import sys, nacha_cli; print('numpy' in sys.modules)"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.stdout.strip() == 'False'
+
+@pytest.mark.parametrize('amount', ['abc', 'nan', '-5', '0'])
+def test_split_rejects_bad_max_amount_as_usage_error(capsys, tmp_path, ach_file, amount):
+    with pytest.raises(SystemExit) as exc:
+        nacha_cli.main(['split', ach_file, '-o', str(tmp_path / 'out'), '--max-amount', amount])
+    assert exc.value.code == 2
+    assert '--max-amount' in capsys.readouterr().err
+
+def test_split_by_max_amount(capsys, tmp_path, ach_file):
+    status, [result] = _run(capsys, 'split', ach_file, '-o', str(tmp_path / 'out'), '--max-amount', '200000')
+    assert status == EXIT_OK
+    assert all(output['amount_cents'] <= 20000000 for output in result['outputs'])
+    assert sum(output['entry_count'] for output in result['outputs']) == 12
@@ -0,0 +1,81 @@
+from io import BytesIO
+
+import pytest
+
+from nacha_diff import iter_nacha_diff
+from conftest import nacha_file
+
+def _write(tmp_path, name, lines):
+    path = tmp_path / name
+    path.write_bytes(b'\n'.join(lines))
+    return str(path)
+
+def _diff(tmp_path, old_lines, new_lines, max_memory_entries):
+    items = list(iter_nacha_diff(_write(tmp_path, 'old.ach', old_lines), _write(tmp_path, 'new.ach', new_lines),
+                                 max_memory_entries=max_memory_entries, spill_dir=str(tmp_path)))
+    summary = items.pop()
+    assert summary['type'] == 'summary'
+    return items, summary
+
+def _entry_lines(lines):
+    return [i for i, line in enumerate(lines) if line.startswith(b'6')]
+
+def _sorted(items, kind):
+    return sorted((item for item in items if item['type'] == kind), key=lambda item: (item['batch'], item.get('trace_number', '')))
+
+@pytest.fixture
+def lines():
+    content, _, _ = nacha_file(batches=3, entries=10)
+    return content.split(b'\n')
+
+def _corrected(lines):
+    new = list(lines)
+    entries = _entry_lines(new)
+    # Change an amount, drop one entry and duplicate another under a new trace number
+    changed = new[entries[3]]
+    new[entries[3]] = changed[:29] + b'0000000042' + changed[39:]
+    added = new[entries[15]][:79] + b'999999999999999'
+    del new[entries[20]]
+    new.insert(entries[15] + 1, added)
+    return new
+
+def test_spilled_diff_matches_in_memory_diff(tmp_path, lines):
+    new = _corrected(lines)
+    in_memory, summary = _diff(tmp_path, lines, new, max_memory_entries=0)
+    spilled, spilled_summary = _diff(tmp_path, lines, new, max_memory_entries=5)
+
+    assert summary['partitions'] == 1 and spilled_summary['partitions'] > 1
+    assert (summary['added'], summary['removed'], summary['changed']) == (1, 1, 1)
+    for kind in ('added', 'removed', 'changed', 'batch'):
+        assert _sorted(spilled, kind) == _sorted(in_memory, kind)
+    [changed] = _sorted(in_memory, 'changed')
+    assert list(changed['changes']) == ['amount'] and changed['changes']['amount'][1] == '0.42'
+
+@pytest.mark.parametrize('max_memory_entries', [0, 5])
+def test_entry_outside_batch_is_not_keyed_under_previous_batch(tmp_path, lines, max_memory_entries):
+    new = list(lines)
+    first_control = next(i for i, line in enumerate(new) if line.startswith(b'8'))
+    new.insert(first_control + 1, new[_entry_lines(new)[0]][:79] + b'888888888888888')
+    items, summary = _diff(tmp_path, lines, new, max_memory_entries)
+    assert (summary['added'], summary['removed'], summary['changed']) == (0, 0, 0)
+    assert summary['error_count'] == 0
+
+@pytest.mark.parametrize('max_memory_entries', [0, 5])
+def test_garbled_line_is_reported_as_an_error(tmp_path, lines, max_memory_entries):
+    new = list(lines)
+    garbled = _entry_lines(new)[4]
+    new[garbled] = new[garbled][:29] + b'ABCDEFGHIJ' + new[garbled][39:]
+    items, summary = _diff(tmp_path, lines, new, max_memory_entries)
+    assert summary['removed'] == 1
+    assert summary['error_count'] == 1
+    [error] = [item for item in items if item['type'] == 'error']
+    assert (error['file'], error['line']) == ('corrected', garbled + 1)
+
+def test_diff_page_shows_parse_errors(client, lines):
+    new = list(lines)
+    garbled = _entry_lines(new)[4]
+    new[garbled] = new[garbled][:29] + b'ABCDEFGHIJ' + new[garbled][39:]
+    response = client.post('/diff', data={'original_file': (BytesIO(b'\n'.join(lines)), 'old.ach'),
+                                          'corrected_file': (BytesIO(b'\n'.join(new)), 'new.ach')})
+    assert response.status_code == 200
+    assert f'Corrected file: Error parsing line {garbled + 1}'.encode() in response.data
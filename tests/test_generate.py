@@ -0,0 +1,56 @@
+from io import BytesIO
+
+import pytest
+
+from benchmarks.synthetic import synthetic_batches, synthetic_file_header
+from nacha import build_entry, generate_nacha_file, validate_entry
+from nacha_validate import validate_nacha
+
+BAD_AMOUNTS = ['nan', 'inf', '-inf', '-12.34', '100000000.00', '1e400', 'abc', '']
+
+def _form(batches, amount=None):
+    form = dict(synthetic_file_header(), num_batches=str(len(batches)))
+    for b, batch in enumerate(batches):
+        form[f'num_entries_batch_{b}'] = str(len(batch['entries']))
+        for key, value in batch['batch_header'].items():
+            form[f'batch_{b}_{key}'] = value
+        for e, entry in enumerate(batch['entries']):
+            for key, value in entry.items():
+                form[f'entry_{b}_{e}_{key}'] = value
+    if amount is not None:
+        form['entry_0_1_amount'] = amount
+    return form
+
+@pytest.mark.parametrize('amount', BAD_AMOUNTS)
+def test_validate_entry_rejects_bad_amounts(amount):
+    entry = dict(synthetic_batches(1, 1)[0]['entries'][0], amount=amount)
+    assert validate_entry(build_entry(entry.get)).startswith('Amount must be')
+
+@pytest.mark.parametrize('amount', ['0', '0.00', '12.345', '99999999.99'])
+def test_validate_entry_accepts_amounts(amount):
+    entry = dict(synthetic_batches(1, 1)[0]['entries'][0], amount=amount)
+    assert validate_entry(build_entry(entry.get)) is None
+
+@pytest.mark.parametrize('amount', BAD_AMOUNTS)
+def test_generator_writes_zero_for_bad_amounts(amount):
+    batches = synthetic_batches(2, 3)
+    batches[0]['entries'][1]['amount'] = amount
+    content = generate_nacha_file(synthetic_file_header(), batches)
+    assert content.split('\n')[3][29:39] == '0' * 10
+    report = validate_nacha(BytesIO(content.encode('utf-8')))
+    assert report['valid'], report['issues']
+
+@pytest.mark.parametrize('amount', ['nan', 'inf', '-12.34'])
+def test_generate_form_rejects_bad_amounts_before_streaming(client, amount):
+    response = client.post('/generate', data=_form(synthetic_batches(1, 3), amount))
+    assert response.status_code == 302
+    with client.session_transaction() as session:
+        assert session['_flashes'][0][1].startswith('Batch 1, Entry 2: Amount must be')
+
+def test_generate_form_streams_a_valid_file(client):
+    response = client.post('/generate', data=_form(synthetic_batches(2, 3)))
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'].startswith('attachment')
+    report = validate_nacha(BytesIO(response.data))
+    assert report['valid'], report['issues']
+    assert report['totals']['entry_count'] == 6
@@ -0,0 +1,49 @@
+import os
+import time
+from io import BytesIO
+
+import pytest
+
+from conftest import nacha_file
+
+@pytest.fixture
+def index_dir(app, tmp_path):
+    app.app.config['INDEX_DIR'] = str(tmp_path)
+    return tmp_path
+
+def _upload(client, content):
+    return client.post('/api/index', data={'nacha_file': (BytesIO(content), 'file.ach')})
+
+def test_index_and_lookup(client, index_dir):
+    content, _, batches = nacha_file()
+    response = _upload(client, content)
+    assert response.status_code == 200
+    file_hash = response.get_json()['file_hash']
+    assert response.get_json()['entry_count'] == 10
+
+    trace_number = batches[1]['entries'][2]['trace_number']
+    response = client.get(f'/api/lookup/{file_hash}?trace_number={trace_number}')
+    assert response.status_code == 200
+    assert response.get_json()['results'][0]['Entry']['trace_number'] == trace_number
+
+def test_non_utf8_upload_is_rejected(client, index_dir):
+    content, _, _ = nacha_file()
+    lines = content.split(b'\n')
+    lines[2] = lines[2][:40] + b'\xff' + lines[2][41:]
+    response = _upload(client, b'\n'.join(lines))
+    assert response.status_code == 400
+    assert 'line 3' in response.get_json()['error']
+    assert not [name for name in os.listdir(index_dir) if name.endswith(('.ach', '.upload'))]
+
+def test_unused_indexes_expire(app, client, index_dir):
+    content, _, _ = nacha_file()
+    file_hash = _upload(client, content).get_json()['file_hash']
+    stale = time.time() - app.app.config['INDEX_TTL_SECONDS'] - 60
+    for name in os.listdir(index_dir):
+        os.utime(index_dir / name, (stale, stale))
+
+    other, _, _ = nacha_file(seed=1)
+    assert _upload(client, other).status_code == 200
+    assert not [name for name in os.listdir(index_dir) if name.startswith(file_hash)]
+    response = client.get(f'/api/lookup/{file_hash}?batch_number=1')
+    assert response.status_code == 404
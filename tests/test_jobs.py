@@ -0,0 +1,75 @@
+import json
+import os
+import time
+from io import BytesIO
+
+import pytest
+
+from nacha_jobs import JobQueue
+from conftest import nacha_file
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path), workers=1, ttl_seconds=60)
+
+def _wait(queue, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = queue.status(job_id)
+        if status['state'] in ('done', 'failed'):
+            return status
+        time.sleep(0.02)
+    pytest.fail(f"job {job_id} did not finish")
+
+def _age_status(queue, job_id, state, seconds):
+    """Rewrite a job's status as if it had been left in state seconds ago."""
+    path = os.path.join(queue.directory, job_id, 'status.json')
+    with open(path) as f:
+        status = json.load(f)
+    status.update(state=state, updated=time.time() - seconds)
+    with open(path, 'w') as f:
+        json.dump(status, f)
+
+def test_job_parses_upload(queue):
+    content, _, _ = nacha_file()
+    job_id = queue.submit(BytesIO(content), 'f.ach')
+    assert _wait(queue, job_id)['state'] == 'done'
+    data = queue.result(job_id)['data']
+    assert sum(len(batch['Entries']) for batch in data['Batches']) == 10
+    assert data['Validation']['valid']
+    assert not os.path.exists(os.path.join(queue.directory, job_id, 'upload.ach'))
+
+@pytest.mark.parametrize('state', ['queued', 'running', 'done', 'failed'])
+def test_stale_jobs_are_removed(queue, state):
+    # A job left behind by a process that was restarted or killed
+    job_dir = os.path.join(queue.directory, 'a' * 32)
+    os.makedirs(job_dir)
+    with open(os.path.join(job_dir, 'upload.ach'), 'wb') as f:
+        f.write(b'x')
+    with open(os.path.join(job_dir, 'status.json'), 'w') as f:
+        json.dump({'state': state, 'total_bytes': 1, 'bytes_processed': 0}, f)
+    _age_status(queue, 'a' * 32, state, 30)
+    queue.cleanup_expired()
+    assert os.path.exists(job_dir)
+
+    _age_status(queue, 'a' * 32, state, 120)
+    queue.cleanup_expired()
+    assert not os.path.exists(job_dir)
+    assert queue.status('a' * 32) is None
+    assert queue.result('a' * 32) is None
+
+def test_result_of_removed_job_is_404(app, client):
+    content, _, _ = nacha_file()
+    job_id = client.post('/api/jobs', data={'nacha_file': (BytesIO(content), 'f.txt')}).get_json()['job_id']
+    _wait(app.job_queue, job_id)
+    os.remove(os.path.join(app.job_queue.directory, job_id, 'result.pickle'))
+    response = client.get(f'/api/jobs/{job_id}/result')
+    assert response.status_code == 404
+    assert 'error' in response.get_json()
+
+def test_result_without_file_header_is_json(app, client):
+    job_id = client.post('/api/jobs', data={'nacha_file': (BytesIO(b'not a nacha file\n'), 'f.txt')}).get_json()['job_id']
+    _wait(app.job_queue, job_id)
+    response = client.get(f'/api/jobs/{job_id}/result')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Invalid or unsupported NACHA file format detected.'
@@ -0,0 +1,27 @@
+import pytest
+
+from nacha_mmap import MappedNachaFile
+from conftest import nacha_file
+
+def _scan(path):
+    with MappedNachaFile(path) as mapped:
+        records = [(view.line_number, view.record_type, view.raw()) for view in mapped]
+        return mapped.blocked, records
+
+@pytest.mark.parametrize('layout', ['lines', 'padded', 'blocked'])
+def test_mapped_file_reads_every_record(tmp_path, layout):
+    content, _, _ = nacha_file(batches=2, entries=30)
+    lines = content.split(b'\n')
+    if layout == 'lines':
+        data = content + b'\n'
+    elif layout == 'padded':
+        data = b'\n'.join(line.ljust(96) for line in lines) + b'\n'
+    else:
+        data = b''.join(lines)
+    path = tmp_path / 'file.ach'
+    path.write_bytes(data)
+
+    blocked, records = _scan(str(path))
+    assert blocked == (layout == 'blocked')
+    assert sum(1 for _, record_type, _ in records if record_type == '6') == 60
+    assert [raw[:94] for _, _, raw in records] == lines
@@ -0,0 +1,29 @@
+from io import BytesIO
+
+import nacha_multi
+from nacha_multi import iter_file_summaries
+from nacha_summary import aggregate_nacha
+from conftest import nacha_file
+
+def test_pool_does_not_fork_the_caller():
+    assert nacha_multi._MP_CONTEXT.get_start_method() in ('forkserver', 'spawn')
+
+def test_summaries_across_workers_match_aggregate(tmp_path):
+    sources = []
+    expected = {}
+    for seed in range(3):
+        content, _, _ = nacha_file(batches=2, entries=4, seed=seed)
+        path = tmp_path / f'{seed}.ach'
+        path.write_bytes(content)
+        sources.append((path.name, str(path), None))
+        expected[path.name] = aggregate_nacha(BytesIO(content))['totals']
+    summaries = {summary['name']: summary['totals'] for summary in iter_file_summaries(sources, workers=2)}
+    assert summaries == expected
+
+def test_parse_multi_page_summarizes_every_file(app, client, monkeypatch):
+    monkeypatch.setitem(app.app.config, 'PARSE_WORKERS', 2)
+    files = [(BytesIO(nacha_file(seed=seed)[0]), f'file{seed}.ach') for seed in range(2)]
+    response = client.post('/parse-multi', data={'nacha_files': files})
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert 'file0.ach' in body and 'file1.ach' in body
@@ -0,0 +1,52 @@
+from io import BytesIO
+
+import pytest
+
+from nacha import BLOCKED_PROBE_SIZE, NACHA_RECORD_LENGTH, iter_nacha_records, iter_raw_lines
+from nacha_summary import aggregate_nacha
+from conftest import nacha_file
+
+@pytest.mark.parametrize('newline', [b'\n', b'\r\n', b'\r'])
+@pytest.mark.parametrize('chunk_size', [1, 7, 95, 4096])
+def test_iter_raw_lines_line_endings(newline, chunk_size):
+    content, _, _ = nacha_file()
+    lines = content.split(b'\n')
+    stream = BytesIO(newline.join(lines) + newline)
+    assert list(iter_raw_lines(stream, chunk_size)) == list(enumerate(lines, 1))
+
+def test_iter_raw_lines_unterminated_last_line():
+    assert list(iter_raw_lines(BytesIO(b'first\nsecond'), 3, first_line=10)) == [(10, b'first'), (11, b'second')]
+
+def test_iter_raw_lines_blocked_file():
+    content, _, _ = nacha_file()
+    lines = content.split(b'\n')
+    blocked = b''.join(lines)
+    assert len(blocked) == NACHA_RECORD_LENGTH * len(lines)
+    assert list(iter_raw_lines(BytesIO(blocked), 1000)) == list(enumerate(lines, 1))
+    assert list(iter_raw_lines(BytesIO(blocked + b'\n'), 1000)) == list(enumerate(lines, 1))
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+def test_iter_raw_lines_padded_lines_are_not_blocked(chunk_size):
+    content, _, _ = nacha_file()
+    lines = [line + b'  ' for line in content.split(b'\n')]
+    stream = BytesIO(b'\n'.join(lines) + b'\n')
+    assert list(iter_raw_lines(stream, chunk_size)) == list(enumerate(lines, 1))
+
+def test_iter_raw_lines_padded_single_line_is_not_blocked():
+    line = b'1' * (NACHA_RECORD_LENGTH + 3)
+    assert list(iter_raw_lines(BytesIO(line))) == [(1, line)]
+
+def test_padded_lines_parse_like_the_original():
+    content, _, _ = nacha_file(batches=2, entries=30)
+    padded = b'\n'.join(line.ljust(96) for line in content.split(b'\n'))
+    events = [event for event, _, _ in iter_nacha_records(BytesIO(padded)) if event not in ('warning', 'error')]
+    assert events == [event for event, _, _ in iter_nacha_records(BytesIO(content))]
+    summary = aggregate_nacha(BytesIO(padded))
+    assert (summary['batch_count'], summary['totals']) == (2, aggregate_nacha(BytesIO(content))['totals'])
+
+def test_iter_raw_lines_blocked_file_longer_than_probe():
+    content, _, _ = nacha_file(batches=5, entries=20)
+    lines = content.split(b'\n')
+    blocked = b''.join(lines)
+    assert len(blocked) > BLOCKED_PROBE_SIZE
+    assert list(iter_raw_lines(BytesIO(blocked), 1000)) == list(enumerate(lines, 1))
@@ -0,0 +1,67 @@
+from io import BytesIO
+
+import pytest
+
+import nacha_parallel
+from nacha import group_nacha_records, iter_nacha_records
+from nacha_parallel import parse_nacha_parallel, plan_segments
+from conftest import nacha_file
+
+def _lines(batches=12, entries=6):
+    return nacha_file(batches=batches, entries=entries)[0].split(b'\n')
+
+def _without_batch_control(lines, n):
+    """Drop the n-th Batch Control, leaving its batch open at the next Batch Header."""
+    controls = [i for i, line in enumerate(lines) if line.startswith(b'8')]
+    return lines[:controls[n]] + lines[controls[n] + 1:]
+
+def _with_entry_outside_batch(lines, n):
+    controls = [i for i, line in enumerate(lines) if line.startswith(b'8')]
+    entry = next(line for line in lines if line.startswith(b'6'))
+    return lines[:controls[n] + 1] + [entry] + lines[controls[n] + 1:]
+
+def _with_bad_amounts(lines):
+    return [line[:29] + b'ABCDEFGHIJ' + line[39:] if line.startswith(b'6') and i % 5 == 0 else line
+            for i, line in enumerate(lines)]
+
+def _with_padding(lines):
+    return [line.ljust(96) for line in lines]
+
+def _with_short_batch_header(lines, n):
+    headers = [i for i, line in enumerate(lines) if line.startswith(b'5')]
+    return lines[:headers[n]] + [lines[headers[n]][:40]] + lines[headers[n] + 1:]
+
+CASES = {
+    'clean': lambda lines: lines,
+    'open_batches': lambda lines: _without_batch_control(_without_batch_control(lines, 3), 7),
+    'last_batch_open': lambda lines: _without_batch_control(lines, 11),
+    'entry_outside_batch': lambda lines: _with_entry_outside_batch(lines, 5),
+    'bad_amounts': _with_bad_amounts,
+    'padded_lines': _with_padding,
+    'short_batch_header': lambda lines: _with_short_batch_header(lines, 6),
+}
+
+def _plain(data):
+    """Return data with compact EntryDetail objects replaced by the dicts a non-compact parse produces."""
+    for batch in data['Batches']:
+        batch['Entries'] = [entry if isinstance(entry, dict) else entry.to_dict() for entry in batch['Entries']]
+    return data
+
+def _grouped(parse):
+    messages = []
+    data = parse(lambda category, message: messages.append((category, str(message), message.kind, message.line_number)))
+    return _plain(data), messages
+
+@pytest.mark.parametrize('compact', [False, True])
+@pytest.mark.parametrize('case', sorted(CASES))
+def test_parallel_parse_matches_sequential(tmp_path, monkeypatch, case, compact):
+    monkeypatch.setattr(nacha_parallel, 'MIN_PARALLEL_SIZE', 0)
+    path = tmp_path / 'file.ach'
+    path.write_bytes(b'\n'.join(CASES[case](_lines())))
+    assert len(plan_segments(str(path), 2 * nacha_parallel.SEGMENTS_PER_WORKER)) > 2
+
+    expected = _grouped(lambda on_message: group_nacha_records(
+        iter_nacha_records(BytesIO(path.read_bytes()), compact=compact), on_message=on_message))
+    result = _grouped(lambda on_message: parse_nacha_parallel(str(path), workers=2, compact=compact, on_message=on_message))
+    assert result == expected
+    assert list(result[0]) == list(expected[0])
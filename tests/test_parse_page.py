@@ -0,0 +1,88 @@
+import hashlib
+from io import BytesIO
+
+import pytest
+
+from conftest import nacha_file
+from parse_cache import MemoryCache
+
+def _parse(client, content):
+    return client.post('/parse', data={'nacha_file': (BytesIO(content), 'file.txt')})
+
+def test_cached_page_does_not_carry_other_clients_flashes(app):
+    content, _, _ = nacha_file()
+    first = app.app.test_client()
+    with first.session_transaction() as session:
+        session['_flashes'] = [('success', 'NACHA file generated successfully!')]
+    response = _parse(first, content)
+    assert response.status_code == 200
+    assert b'NACHA file generated successfully!' in response.data
+
+    second = app.app.test_client()
+    response = _parse(second, content)
+    assert response.status_code == 200
+    assert app.parse_cache.stats()['hits'] >= 1
+    assert b'NACHA file generated successfully!' not in response.data
+    assert b'File Control (Record Type 9' in response.data
+
+@pytest.fixture
+def paged(app, monkeypatch):
+    monkeypatch.setitem(app.app.config, 'PAGINATE_ENTRIES_OVER', 10)
+    monkeypatch.setitem(app.app.config, 'ENTRY_PAGE_SIZE', 4)
+    return app
+
+def _entry_page(client, file_hash, batch_index, page=1):
+    return client.get(f'/parse/{file_hash}/batches/{batch_index}/entries?page={page}')
+
+def test_large_file_pages_entries_from_cached_data(paged, client):
+    content, _, batches = nacha_file(batches=2, entries=10)
+    response = _parse(client, content)
+    assert response.status_code == 200
+    assert b'lazy-entries' in response.data
+    file_hash = hashlib.sha256(content).hexdigest()
+
+    page = _entry_page(client, file_hash, 1, page=3)
+    assert page.status_code == 200
+    result = page.get_json()
+    assert (result['page'], result['pages'], result['total']) == (3, 3, 10)
+    assert batches[1]['entries'][8]['trace_number'] in result['html']
+
+def test_data_too_large_for_cache_lists_every_entry(paged, client, monkeypatch):
+    content, _, batches = nacha_file(batches=2, entries=10)
+    monkeypatch.setattr(paged, 'parse_cache', MemoryCache(max_bytes=len(content) * 2))
+    for _ in range(2):
+        response = _parse(client, content)
+        assert response.status_code == 200
+        assert b'lazy-entries' not in response.data
+        for batch in batches:
+            for entry in batch['entries']:
+                assert entry['trace_number'].encode() in response.data
+
+def test_evicted_data_is_parsed_again(paged, client, monkeypatch):
+    monkeypatch.setattr(paged, 'parse_cache', MemoryCache(max_entries=1))
+    content, _, _ = nacha_file(batches=2, entries=10)
+    file_hash = hashlib.sha256(content).hexdigest()
+    assert b'lazy-entries' in _parse(client, content).data
+    assert _entry_page(client, file_hash, 0).status_code == 200
+
+    paged.parse_cache.clear()
+    assert _entry_page(client, file_hash, 0).status_code == 404
+    assert b'lazy-entries' in _parse(client, content).data
+    assert _entry_page(client, file_hash, 0).status_code == 200
+
+def _with_bad_entries(content, count):
+    """Return content with count entries whose amount is not numeric inserted before the first entry."""
+    lines = content.split(b'\n')
+    i = next(i for i, line in enumerate(lines) if line.startswith(b'6'))
+    lines[i:i] = [lines[i][:29] + b'ABCDEFGHIJ' + lines[i][39:]] * count
+    return b'\n'.join(lines)
+
+def test_parse_stopped_early_shows_diagnostics(app, client, monkeypatch):
+    monkeypatch.setitem(app.app.config, 'MAX_PARSE_ERRORS', 100)
+    content, _, _ = nacha_file(batches=1, entries=2)
+    response = _parse(client, _with_bad_entries(content, 3000))
+    assert response.status_code == 200
+    assert b'Parse Diagnostics (100 errors' in response.data
+    assert b'before the File Control record' in response.data
+    assert b'Validation (Incomplete' in response.data
+    assert b'File Control record not found' not in response.data
@@ -0,0 +1,30 @@
+from io import BytesIO
+
+from nacha import group_nacha_records, iter_nacha_records
+from nacha_split import merge_nacha, split_nacha
+from nacha_validate import validate_nacha
+from conftest import nacha_file
+
+def _entries(content):
+    data = group_nacha_records(iter_nacha_records(BytesIO(content)))
+    return [entry for batch in data['Batches'] for entry in batch['Entries']], data['File Control']
+
+def test_split_then_merge_round_trip(tmp_path):
+    content, _, _ = nacha_file(batches=3, entries=5)
+    outputs = split_nacha(BytesIO(content), str(tmp_path), max_entries=4)
+    assert len(outputs) == 4
+    assert [output['entry_count'] for output in outputs] == [4, 4, 4, 3]
+    for output in outputs:
+        with open(output['path'], 'rb') as f:
+            assert validate_nacha(f)['valid']
+
+    merged = BytesIO()
+    result = merge_nacha([output['path'] for output in outputs], merged)
+    assert result['entry_count'] == 15
+    assert validate_nacha(BytesIO(merged.getvalue()))['valid']
+
+    entries, control = _entries(merged.getvalue())
+    expected_entries, expected_control = _entries(content)
+    assert entries == expected_entries
+    for key in ('entry_hash', 'total_debit_amount', 'total_credit_amount'):
+        assert control[key] == expected_control[key]
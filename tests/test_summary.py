@@ -0,0 +1,93 @@
+from io import BytesIO
+
+import pytest
+
+from nacha import format_cents, group_nacha_records, iter_nacha_records
+from nacha_summary import aggregate_nacha
+from conftest import nacha_file
+
+def _with_entry_outside_batch(content):
+    """Return content with a copy of its first entry placed between the first Batch Control and the next Batch Header."""
+    lines = content.split(b'\n')
+    entry = next(line for line in lines if line.startswith(b'6'))
+    i = next(i for i, line in enumerate(lines) if line.startswith(b'8'))
+    lines.insert(i + 1, entry)
+    return b'\n'.join(lines), i + 2
+
+def _grouped(content):
+    messages = []
+    data = group_nacha_records(iter_nacha_records(BytesIO(content)), on_message=lambda *m: messages.append(m))
+    return data, messages
+
+def test_entry_outside_batch_is_skipped_with_warning():
+    content, _, _ = nacha_file(batches=2, entries=3)
+    orphan, line_number = _with_entry_outside_batch(content)
+    expected, _ = _grouped(content)
+    data, messages = _grouped(orphan)
+
+    assert len(data['Batches']) == 2
+    assert data['File Control'] == expected['File Control']
+    assert [(category, message.kind, message.line_number) for category, message in messages] == \
+        [('warning', 'entry_outside_batch', line_number)]
+
+def test_summary_matches_parser_for_entry_outside_batch():
+    content, _, _ = nacha_file(batches=2, entries=3)
+    orphan, _ = _with_entry_outside_batch(content)
+    data, _ = _grouped(orphan)
+    summary = aggregate_nacha(BytesIO(orphan))
+
+    assert summary['batch_count'] == len(data['Batches']) == 2
+    assert summary['warning_count'] == 1
+    assert format_cents(summary['totals']['debit_cents']) == data['File Control']['total_debit_amount']
+    assert format_cents(summary['totals']['credit_cents']) == data['File Control']['total_credit_amount']
+    assert summary['totals']['entry_count'] == sum(len(batch['Entries']) for batch in data['Batches'])
+
+def test_columnar_matches_summary_for_entry_outside_batch():
+    pytest.importorskip('numpy')
+    from nacha_columnar import analyze_nacha
+
+    content, _, _ = nacha_file(batches=2, entries=3)
+    orphan, line_number = _with_entry_outside_batch(content)
+    summary = aggregate_nacha(BytesIO(orphan))
+    analysis = analyze_nacha(orphan)
+
+    assert len(analysis['batches']) == summary['batch_count']
+    assert [b['entry_count'] for b in analysis['batches']] == [b['totals']['entry_count'] for b in summary['batches']]
+    assert analysis['totals']['entry_count'] == summary['totals']['entry_count']
+    assert analysis['totals']['debit_cents'] == summary['totals']['debit_cents']
+    assert analysis['totals']['credit_cents'] == summary['totals']['credit_cents']
+    assert analysis['outside_batch_lines'] == [line_number]
+
+@pytest.mark.parametrize('trailer', [b'', b'\n'])
+def test_columnar_reads_blocked_files(trailer):
+    pytest.importorskip('numpy')
+    from nacha_columnar import analyze_nacha
+
+    content, _, _ = nacha_file(batches=2, entries=30)
+    blocked = b''.join(content.split(b'\n')) + trailer
+    summary = aggregate_nacha(BytesIO(blocked))
+    analysis = analyze_nacha(blocked)
+    assert analysis['totals']['entry_count'] == summary['totals']['entry_count'] == 60
+    assert analysis['totals']['debit_cents'] == summary['totals']['debit_cents']
+    assert analysis['totals']['credit_cents'] == summary['totals']['credit_cents']
+    assert analysis['totals']['invalid_count'] == 0
+
+def test_sqlite_export_matches_summary_for_entry_outside_batch(tmp_path):
+    from nacha_sqlite import connect, export_nacha_file
+
+    content, _, _ = nacha_file(batches=2, entries=3)
+    orphan, _ = _with_entry_outside_batch(content)
+    path = tmp_path / 'orphan.ach'
+    path.write_bytes(orphan)
+    summary = aggregate_nacha(BytesIO(orphan))
+
+    conn = connect(str(tmp_path / 'nacha.db'))
+    try:
+        result = export_nacha_file(conn, str(path))
+        row = conn.execute("SELECT entry_count, total_debit_cents, total_credit_cents, warning_count FROM files").fetchone()
+        orphan_rows = conn.execute("SELECT COUNT(*) FROM entries WHERE batch_id IS NULL").fetchone()[0]
+    finally:
+        conn.close()
+    assert result['entry_count'] == summary['totals']['entry_count']
+    assert row == (summary['totals']['entry_count'], summary['totals']['debit_cents'], summary['totals']['credit_cents'], 1)
+    assert orphan_rows == 0
@@ -0,0 +1,94 @@
+import time
+from io import BytesIO
+
+import pytest
+
+from nacha import iter_nacha_records
+from nacha_validate import validate_nacha
+from conftest import nacha_file, tamper_file_control
+
+def _issue_codes(report):
+    return {issue['code'] for issue in report['issues']}
+
+def test_generated_file_is_valid():
+    content, _, _ = nacha_file()
+    report = validate_nacha(BytesIO(content))
+    assert report['valid'], report['issues']
+
+def test_tampered_file_control_totals_fail_validation():
+    content, _, _ = nacha_file()
+    report = validate_nacha(BytesIO(tamper_file_control(content)))
+    assert not report['valid']
+    assert {'file_debit_total', 'file_credit_total'} <= _issue_codes(report)
+
+def test_api_validate_reports_tampered_totals(client):
+    content, _, _ = nacha_file()
+    response = client.post('/api/validate', data={'nacha_file': (BytesIO(tamper_file_control(content)), 'f.ach')})
+    assert {'file_debit_total', 'file_credit_total'} <= _issue_codes(response.get_json())
+
+def test_parse_page_reports_tampered_totals(client):
+    content, _, _ = nacha_file()
+    response = client.post('/parse', data={'nacha_file': (BytesIO(tamper_file_control(content)), 'f.txt')})
+    assert response.status_code == 200
+    assert b'Validation (Failed: 2 errors' in response.data
+    assert b'File total debit amount is 1.23' in response.data
+    assert b'File total credit amount is 4.56' in response.data
+
+def test_parse_page_passes_untouched_file(client):
+    content, _, _ = nacha_file()
+    response = client.post('/parse', data={'nacha_file': (BytesIO(content), 'f.txt')})
+    assert b'Validation (Passed: 0 errors' in response.data
+
+def _wait_for_job(client, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = client.get(f'/api/jobs/{job_id}').get_json()
+        if status['state'] in ('done', 'failed'):
+            return status
+        time.sleep(0.02)
+    pytest.fail(f"job {job_id} did not finish")
+
+def test_job_result_reports_tampered_totals(client):
+    content, _, _ = nacha_file()
+    response = client.post('/api/jobs', data={'nacha_file': (BytesIO(tamper_file_control(content)), 'f.txt')})
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+    assert _wait_for_job(client, job_id)['state'] == 'done'
+    response = client.get(f'/api/jobs/{job_id}/result')
+    assert response.status_code == 200
+    assert b'Validation (Failed: 2 errors' in response.data
+
+def _validate_first_lines(content, last_line, truncated):
+    from nacha_validate import NachaValidator
+    validator = NachaValidator()
+    for event, line_number, record in iter_nacha_records(BytesIO(content)):
+        if line_number > last_line:
+            break
+        validator.feed(event, line_number, record)
+    return validator.report(truncated=truncated)
+
+def test_truncated_report_skips_missing_control_checks():
+    content, _, _ = nacha_file()
+    # Stop partway through the first batch, as the parser does after too many errors
+    report = _validate_first_lines(content, 4, truncated=True)
+    assert report['truncated'] and not report['valid']
+    assert not _issue_codes(report) & {'batch_missing_control', 'file_missing_control', 'file_blocking'}
+    assert {'batch_missing_control', 'file_missing_control'} <= _issue_codes(_validate_first_lines(content, 4, truncated=False))
+
+def _batch_control_after_file_control(content):
+    lines = content.split(b'\n')
+    control = lines.pop(next(i for i, line in enumerate(lines) if line.startswith(b'8')))
+    lines.insert(next(i for i, line in enumerate(lines) if line.startswith(b'9')) + 1, control)
+    return b'\n'.join(lines)
+
+def test_batch_control_after_file_control_is_reported():
+    content, _, _ = nacha_file(batches=1, entries=2)
+    report = validate_nacha(BytesIO(_batch_control_after_file_control(content)))
+    assert not report['valid']
+    assert {'batch_missing_control', 'batch_control_without_header'} <= _issue_codes(report)
+
+def test_parse_page_reports_batch_control_after_file_control(client):
+    content, _, _ = nacha_file(batches=1, entries=2)
+    response = client.post('/parse', data={'nacha_file': (BytesIO(_batch_control_after_file_control(content)), 'f.txt')})
+    assert response.status_code == 200
+    assert b'Batch Control record without a Batch Header' in response.data